@@ -1,8 +1,114 @@
 # NadosApp/core/database.py
 import sqlite3
 import os
+import threading
 from collections import defaultdict
 
+import numpy as np
+
+from .id_lookup import fetch_by_ids
+from .query_cache import bump_generation
+
+# Tabelas, colunas e índices adicionados depois de setup_database_cm_detailed são criados só pelas migrações
+# (core/migrations.py, DDL congelado por versão); aqui ficam as colunas e expressões usadas em tempo de execução.
+
+# --- Parciais compactadas ---
+# Alternativa opcional a SplitCM: uma linha por resultado (tabela SplitPacked) com as parciais em arrays binários
+# (little-endian): distances uint16 por parcial, times_cs int32 por parcial (tempo ACUMULADO em centésimos, -1 = inválido).
+SPLIT_DISTANCE_DTYPE = np.dtype('<u2')
+SPLIT_TIME_DTYPE = np.dtype('<i4')
+
+# --- Ano de nascimento e idade na competição ---
+# AthleteMaster.birth_year (INTEGER indexado) substitui SUBSTR(birthdate, 1, 4) nos filtros e combos de ano;
+# Meet.age_date/age_date_type guardam o <AGEDATE> do LENEX, base de ResultFlat.age_at_meet.
+_YEAR_GLOB = "'[0-9][0-9][0-9][0-9]*'"
+_DATE_GLOB = "'[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'"
+
+def birth_year_from_date(birthdate):
+    """Ano (int) de uma data 'AAAA-MM-DD'. Retorna None se vazia ou fora do formato."""
+    if not birthdate or len(birthdate) < 4 or not birthdate[:4].isdigit() or not birthdate[:4].isascii(): return None
+    return int(birthdate[:4])
+
+def fetch_birth_years(conn):
+    """Anos de nascimento dos atletas (strings, do mais recente ao mais antigo) para os combos de filtro."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT birth_year FROM AthleteMaster WHERE birth_year IS NOT NULL ORDER BY birth_year DESC")
+    return [str(row[0]) for row in cursor.fetchall()]
+
+# --- Resultados desnormalizados ---
+# Cópia "larga" do join ResultCM -> AthleteMeetLink -> AthleteMaster -> Meet -> Event que todas as abas montavam.
+# Mantida pelo importador (refresh_result_flat por competição) e por update_meet_details; as abas consultam só ela.
+RESULT_FLAT_COLUMNS = ('result_id_lenex', 'meet_id', 'event_db_id', 'agegroup_db_id', 'license', 'athlete_name', 'gender', 'birth_year',
+                       'age_at_meet', 'age_min', 'age_max',
+                       'prova_desc', 'event_number', 'stroke', 'distance', 'relay_count', 'course', 'pool_size_desc',
+                       'meet_name', 'meet_city', 'start_date', 'swim_time', 'swim_time_cs', 'place', 'status', 'points')
+# Idade na competição pelas regras do AGEDATE do LENEX: 'DATE' = idade completa na data; 'YEAR' (e os demais
+# tipos, aproximados) = ano da data - ano de nascimento. Sem AGEDATE, usa o ano da competição.
+_AGE_AT_MEET_SQL = f"""CASE
+        WHEN am.birth_year IS NULL THEN NULL
+        WHEN m.age_date_type = 'DATE' AND m.age_date GLOB {_DATE_GLOB} AND am.birthdate GLOB {_DATE_GLOB}
+            THEN CAST(SUBSTR(m.age_date, 1, 4) AS INTEGER) - am.birth_year - (SUBSTR(m.age_date, 6, 5) < SUBSTR(am.birthdate, 6, 5))
+        WHEN m.age_date GLOB {_YEAR_GLOB} THEN CAST(SUBSTR(m.age_date, 1, 4) AS INTEGER) - am.birth_year
+        WHEN m.start_date GLOB {_YEAR_GLOB} THEN CAST(SUBSTR(m.start_date, 1, 4) AS INTEGER) - am.birth_year
+    END"""
+_RESULT_FLAT_SOURCE = f"""
+    SELECT r.result_id_lenex, r.meet_id, r.event_db_id, r.agegroup_db_id, am.license,
+           am.first_name || ' ' || am.last_name, am.gender, am.birth_year,
+           {_AGE_AT_MEET_SQL}, ag.age_min, ag.age_max,
+           e.prova_desc, e.number, e.stroke, e.distance, e.relay_count, m.course, m.pool_size_desc,
+           m.name, m.city, m.start_date, r.swim_time, r.swim_time_cs, r.place, r.status, r.points
+    FROM ResultCM r
+    JOIN AthleteMeetLink aml ON r.link_id = aml.link_id
+    JOIN AthleteMaster am ON aml.license = am.license
+    JOIN Meet m ON r.meet_id = m.meet_id
+    JOIN Event e ON r.event_db_id = e.event_db_id
+    LEFT JOIN AgeGroup ag ON r.agegroup_db_id = ag.agegroup_db_id
+"""
+
+# --- Melhores marcas ---
+# Melhor tempo de cada atleta por (estilo, distância, piscina): de toda a carreira (PersonalBest) e por temporada
+# (SeasonBest; temporada = ano da competição). Recalculadas por refresh_best_times a partir de ResultFlat, só para
+# os atletas da competição importada/editada. Só provas individuais com tempo válido (status vazio, OK ou OFFICIAL).
+_BEST_TIME_COLUMNS = ('license', 'stroke', 'distance', 'course', 'swim_time_cs', 'swim_time', 'result_id_lenex', 'meet_id', 'start_date',
+                      'athlete_name', 'gender', 'birth_year')
+_VALID_BEST_TIME = ("(status IS NULL OR status IN ('OK', 'OFFICIAL')) AND swim_time_cs IS NOT NULL AND stroke IS NOT NULL"
+                    " AND distance IS NOT NULL AND course IS NOT NULL AND COALESCE(relay_count, 1) <= 1")
+
+# --- Estilos ---
+# Códigos canônicos de SWIMSTYLE/@stroke gravados em Event.stroke (e copiados para ResultFlat/PersonalBest),
+# com o nome exibido nas abas, na ordem de exibição. Buscas por estilo usam Event.stroke pelo índice
+# idx_event_stroke (stroke, distance, relay_count) em vez de LIKE sobre prova_desc.
+STROKE_CODES = {'Livre': 'FREE', 'Costas': 'BACK', 'Peito': 'BREAST', 'Borboleta': 'FLY', 'Medley': 'MEDLEY'}
+STROKE_NAMES = {code: name for name, code in STROKE_CODES.items()}
+# Grafias alternativas (arquivos fora do padrão LENEX) -> código canônico
+STROKE_ALIASES = {'LIVRE': 'FREE', 'CRAWL': 'FREE', 'FREESTYLE': 'FREE', 'COSTAS': 'BACK', 'DORSO': 'BACK', 'BACKSTROKE': 'BACK',
+                  'PEITO': 'BREAST', 'BREASTSTROKE': 'BREAST', 'BORBOLETA': 'FLY', 'BUTTERFLY': 'FLY', 'IM': 'MEDLEY'}
+# Provas individuais de um estilo (busca pelo índice; relay_count vazio = individual, como no importador)
+INDIVIDUAL_STROKE_EVENTS_SQL = "SELECT event_db_id FROM Event WHERE stroke = ? AND (relay_count IS NULL OR relay_count <= 1)"
+
+def normalize_stroke_code(stroke):
+    """Código canônico de um estilo ('free', 'Livre', 'CRAWL' -> 'FREE'). Códigos desconhecidos voltam em maiúsculas."""
+    if stroke is None: return None
+    stroke = str(stroke).strip().upper()
+    if not stroke: return None
+    return STROKE_ALIASES.get(stroke, stroke)
+
+def fetch_stroke_event_descs(conn, stroke_code):
+    """Descrições (prova_desc) das provas individuais de um estilo, em ordem alfabética."""
+    cursor = conn.cursor()
+    cursor.execute("""SELECT DISTINCT prova_desc FROM Event
+                      WHERE stroke = ? AND (relay_count IS NULL OR relay_count <= 1) AND prova_desc IS NOT NULL
+                      ORDER BY prova_desc""", (stroke_code,))
+    return [row[0] for row in cursor.fetchall()]
+
+# --- Tempos em centésimos ---
+# Colunas *_cs (INTEGER) derivadas dos tempos LENEX (TEXT 'HH:MM:SS.hh') em ResultCM, SplitCM e Top3Result.
+def swimtime_to_centiseconds(time_str):
+    """Converte um tempo LENEX 'HH:MM:SS.hh' em centésimos (int). Retorna None se vazio ou fora do formato."""
+    if not time_str or len(time_str) != 11 or time_str[2] != ':' or time_str[5] != ':' or time_str[8] != '.': return None
+    try: return int(time_str[0:2]) * 360000 + int(time_str[3:5]) * 6000 + int(time_str[6:8]) * 100 + int(time_str[9:11])
+    except ValueError: return None
+
 # Função de setup MODIFICADA para adicionar hostclub
 def setup_database_cm_detailed(conn):
     """Cria as tabelas no banco de dados SQLite (estrutura normalizada CM + Top3).
@@ -74,6 +180,7 @@ def setup_database_cm_detailed(conn):
             lane INTEGER, reaction_time TEXT, comment TEXT, entry_time TEXT, entry_course TEXT,
             place INTEGER,
             agegroup_db_id INTEGER,
+            swim_time_cs INTEGER, entry_time_cs INTEGER, -- Tempos em centésimos (para MIN/ORDER BY/intervalos)
             FOREIGN KEY (link_id) REFERENCES AthleteMeetLink (link_id),
             FOREIGN KEY (event_db_id) REFERENCES Event (event_db_id),
             FOREIGN KEY (meet_id) REFERENCES Meet (meet_id),
@@ -86,6 +193,7 @@ def setup_database_cm_detailed(conn):
             split_id INTEGER PRIMARY KEY AUTOINCREMENT,
             result_id_lenex TEXT NOT NULL,
             distance INTEGER NOT NULL, swim_time TEXT,
+            swim_time_cs INTEGER,
             FOREIGN KEY (result_id_lenex) REFERENCES ResultCM (result_id_lenex),
             UNIQUE (result_id_lenex, distance)
         )''')
@@ -99,12 +207,13 @@ def setup_database_cm_detailed(conn):
             agegroup_db_id INTEGER,
             place INTEGER NOT NULL CHECK (place IN (1, 2, 3)),
             swim_time TEXT NOT NULL,
+            swim_time_cs INTEGER,
             FOREIGN KEY (meet_id) REFERENCES Meet (meet_id),
             FOREIGN KEY (event_db_id) REFERENCES Event (event_db_id),
             FOREIGN KEY (agegroup_db_id) REFERENCES AgeGroup (agegroup_db_id),
             UNIQUE (meet_id, event_db_id, agegroup_db_id, place)
         )''')
-    conn.commit()
+    conn.commit() # Tabelas/índices adicionados depois (ImportManifest, índices *_cs...) vêm das migrações (core/migrations.py)
     print("Banco de dados verificado/configurado com schema atualizado (inclui hostclub).")
 
 # Função get_pool_size_desc permanece a mesma
@@ -115,33 +224,233 @@ def get_pool_size_desc(course_code):
     elif course_code: return f"{course_code} (Código não padrão)"
     return "N/A"
 
-# Função get_db_connection permanece a mesma (ela chama setup_database_cm_detailed se necessário)
-def get_db_connection(db_path):
-    """Obtém uma conexão com o banco de dados, criando as tabelas se necessário."""
-    try:
-        conn = sqlite3.connect(db_path)
-        conn.execute("PRAGMA foreign_keys = ON;")
+# --- Conexões ---
+# As abas usam uma conexão de leitura por thread, aberta uma vez e reutilizada (mantém o cache de comandos
+# preparados e o cache de páginas entre cliques); o importador e a edição escrevem por uma conexão de escrita
+# dedicada. A verificação do schema (tabelas + migrações) roda uma vez por processo e por banco.
+STATEMENT_CACHE_SIZE = 512 # Comandos preparados guardados por conexão (padrão do sqlite3: 128)
+WRITER_LOCK_TIMEOUT = 5.0 # Segundos esperando a conexão de escrita antes de desistir (mesmo timeout do sqlite3)
+_schema_checked = set()
+_schema_lock = threading.RLock()
+_thread_connections = threading.local()
+_writer_connections = {}
+_writer_lock = threading.Lock()
+
+def _db_key(db_path):
+    """Chave do banco nos caches de conexão (None para bancos em memória, que não são compartilhados)."""
+    if not db_path or db_path == ':memory:' or str(db_path).startswith('file:'): return None
+    return os.path.abspath(db_path)
+
+def _connect(db_path, check_same_thread=True):
+    conn = sqlite3.connect(db_path, cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA foreign_keys = ON;")
+    return conn
+
+def ensure_schema(conn, db_path=None, migration_progress=None):
+    """Cria as tabelas e aplica as migrações pendentes; com `db_path`, só na primeira vez em cada processo."""
+    key = _db_key(db_path)
+    with _schema_lock:
+        if key is not None and key in _schema_checked: return
         cursor = conn.cursor()
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='ResultCM';")
         if not cursor.fetchone():
             print("Tabelas não encontradas. Configurando o banco de dados...")
             setup_database_cm_detailed(conn)
-        # Verifica se a coluna nova existe, se não, alerta (útil se o DB não for apagado)
-        else:
-             cursor.execute("PRAGMA table_info(Meet)")
-             columns = [info[1] for info in cursor.fetchall()]
-             if 'hostclub' not in columns:
-                 print("ALERTA: Coluna 'hostclub' não encontrada na tabela Meet. Recrie o banco ou altere a tabela manualmente.")
-                 # Poderia tentar adicionar com ALTER TABLE aqui, mas é mais seguro recriar
-                 # cursor.execute("ALTER TABLE Meet ADD COLUMN hostclub TEXT")
-                 # conn.commit()
-                 # print("Coluna 'hostclub' adicionada.")
+        # Aplica as migrações pendentes (PRAGMA user_version) - bancos novos e antigos chegam ao schema atual
+        from .migrations import apply_migrations
+        apply_migrations(conn, migration_progress)
+        if key is not None: _schema_checked.add(key)
 
+def get_db_connection(db_path, migration_progress=None):
+    """Abre uma conexão NOVA com o banco de dados (quem chama deve fechá-la), criando as tabelas e aplicando
+    migrações se ainda não foi feito neste processo.
+
+    `migration_progress(step, total, message)` é repassado a apply_migrations (padrão: print).
+    Nas abas, prefira get_read_connection (conexão compartilhada da thread).
+    """
+    try:
+        conn = _connect(db_path)
+        ensure_schema(conn, db_path, migration_progress)
         return conn
     except sqlite3.Error as e:
         print(f"Erro ao conectar ou configurar o banco de dados em '{db_path}': {e}")
         return None
 
+def get_read_connection(db_path):
+    """Conexão de leitura da thread atual para `db_path`, aberta na primeira chamada e reutilizada depois.
+
+    NÃO feche a conexão retornada (close_connections faz isso ao sair). Retorna None se não conseguir abrir.
+    """
+    key = _db_key(db_path)
+    if key is None: return get_db_connection(db_path) # Banco em memória: não há o que compartilhar
+    connections = getattr(_thread_connections, 'connections', None)
+    if connections is None: connections = _thread_connections.connections = {}
+    conn = connections.get(key)
+    if conn is None:
+        conn = get_db_connection(db_path)
+        if conn is not None: connections[key] = conn
+    elif conn.in_transaction:
+        conn.rollback() # Uma consulta anterior deixou transação aberta; não segura o lock do banco
+    return conn
+
+def acquire_writer_connection(db_path, timeout=WRITER_LOCK_TIMEOUT):
+    """Conexão de escrita dedicada a `db_path` (uma por processo, usada por uma thread de cada vez).
+
+    Devolva com release_writer_connection. Levanta sqlite3.OperationalError se outra escrita (p.ex. uma
+    importação) estiver usando a conexão por mais de `timeout` segundos (None = espera sem limite).
+    """
+    if not _writer_lock.acquire(timeout=-1 if timeout is None else timeout):
+        raise sqlite3.OperationalError("Banco de dados ocupado: outra operação de escrita está em andamento.")
+    try:
+        key = _db_key(db_path)
+        conn = _writer_connections.get(key) if key is not None else None
+        if conn is None:
+            conn = _connect(db_path, check_same_thread=False) # Protegida por _writer_lock
+            ensure_schema(conn, db_path)
+            if key is not None: _writer_connections[key] = conn
+        return conn
+    except BaseException:
+        _writer_lock.release(); raise
+
+def release_writer_connection(conn):
+    """Devolve a conexão de escrita (desfaz uma transação deixada aberta)."""
+    try:
+        if conn is not None and conn.in_transaction: conn.rollback()
+        if conn is not None and conn not in _writer_connections.values(): conn.close() # Banco em memória
+    finally:
+        _writer_lock.release()
+
+def close_read_connections():
+    """Fecha as conexões de leitura da thread atual (p.ex. ao final de um worker em QThread)."""
+    for conn in getattr(_thread_connections, 'connections', {}).values(): conn.close()
+    _thread_connections.connections = {}
+
+def close_connections():
+    """Fecha as conexões de leitura da thread atual e as conexões de escrita (ao encerrar o aplicativo)."""
+    close_read_connections()
+    if not _writer_lock.acquire(timeout=WRITER_LOCK_TIMEOUT): return # Importação em andamento: fecha ao terminar o processo
+    try:
+        for conn in _writer_connections.values(): conn.close()
+        _writer_connections.clear()
+    finally:
+        _writer_lock.release()
+
+# --- Manifesto de Importação ---
+def fetch_manifest_meet_id(conn, content_sha256=None, file_path=None, file_size=None, file_mtime=None):
+    """Retorna o lenex_meet_id registrado para um arquivo já importado, pelo hash ou por (caminho, tamanho, mtime)."""
+    cursor = conn.cursor()
+    if content_sha256:
+        cursor.execute("SELECT lenex_meet_id FROM ImportManifest WHERE content_sha256 = ?", (content_sha256,))
+    else:
+        cursor.execute("SELECT lenex_meet_id FROM ImportManifest WHERE file_path = ? AND file_size = ? AND file_mtime = ?", (file_path, file_size, file_mtime))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def record_manifest_entry(conn, content_sha256, file_path, file_size, file_mtime, lenex_meet_id):
+    """Registra (ou atualiza) um arquivo no manifesto. Não faz commit: participa da transação do arquivo."""
+    conn.execute('''INSERT OR REPLACE INTO ImportManifest (content_sha256, file_path, file_size, file_mtime, lenex_meet_id)
+                    VALUES (?, ?, ?, ?, ?)''', (content_sha256, file_path, file_size, file_mtime, lenex_meet_id))
+
+def forget_manifest_entries(conn, lenex_meet_id, keep_sha256=None):
+    """Remove do manifesto os arquivos de uma competição (exceto `keep_sha256`), p.ex. após mesclar um arquivo corrigido."""
+    conn.execute("DELETE FROM ImportManifest WHERE lenex_meet_id = ? AND content_sha256 IS NOT ?", (lenex_meet_id, keep_sha256))
+
+# --- Resultados desnormalizados: manutenção ---
+def refresh_result_flat(conn, meet_id=None):
+    """Refaz as linhas de ResultFlat de uma competição (ou de todas, com meet_id=None) a partir das tabelas
+    normalizadas. Não faz commit: participa da transação de quem chama (importação, migração)."""
+    insert = f"INSERT INTO ResultFlat ({', '.join(RESULT_FLAT_COLUMNS)}) {_RESULT_FLAT_SOURCE}"
+    if meet_id is None:
+        conn.execute("DELETE FROM ResultFlat"); conn.execute(insert)
+    else:
+        conn.execute("DELETE FROM ResultFlat WHERE meet_id = ?", (meet_id,))
+        conn.execute(insert + " WHERE r.meet_id = ?", (meet_id,))
+
+def refresh_best_times(conn, meet_id=None):
+    """Recalcula PersonalBest e SeasonBest dos atletas de uma competição (ou de todos, com meet_id=None).
+
+    Usa o histórico completo de cada atleta em ResultFlat (chame depois de refresh_result_flat), então resultados
+    removidos/alterados por uma mesclagem ou edição também são refletidos. Não faz commit.
+    """
+    if meet_id is None: scope, params = "1", ()
+    else: scope, params = "license IN (SELECT license FROM AthleteMeetLink WHERE meet_id = ?)", (meet_id,)
+    columns = ', '.join(_BEST_TIME_COLUMNS)
+    for table, season_column in (('PersonalBest', ''), ('SeasonBest', 'season, ')):
+        season_value = "CAST(SUBSTR(start_date, 1, 4) AS INTEGER)"
+        season_expr = f"{season_value} AS season, " if season_column else ""
+        season_partition = f"{season_value}, " if season_column else "" # A janela não enxerga o alias
+        season_filter = " AND LENGTH(start_date) >= 4" if season_column else ""
+        conn.execute(f"DELETE FROM {table} WHERE {scope}", params)
+        conn.execute(f"""
+            INSERT INTO {table} ({season_column}{columns})
+            SELECT {season_column}{columns} FROM (
+                SELECT {season_expr}{columns},
+                       ROW_NUMBER() OVER (PARTITION BY license, {season_partition}stroke, distance, course
+                                          ORDER BY swim_time_cs, start_date, result_id_lenex) AS position
+                FROM ResultFlat WHERE {scope} AND {_VALID_BEST_TIME}{season_filter}
+            ) WHERE position = 1""", params)
+
+# --- Parciais compactadas: escrita e leitura ---
+def pack_split_rows(split_rows):
+    """Agrupa linhas (result_id_lenex, distance, swim_time, swim_time_cs) em linhas de SplitPacked.
+
+    Retorna [(result_id_lenex, split_count, distances, times_cs)]; distâncias repetidas mantêm a primeira
+    ocorrência (como o INSERT OR IGNORE em SplitCM).
+    """
+    by_result = defaultdict(dict)
+    for result_id, distance, _, time_cs in split_rows: by_result[result_id].setdefault(distance, time_cs)
+    packed = []
+    for result_id, splits in by_result.items():
+        distances = sorted(splits)
+        times = [splits[d] if splits[d] is not None else -1 for d in distances]
+        packed.append((result_id, len(distances), np.asarray(distances, dtype=SPLIT_DISTANCE_DTYPE).tobytes(), np.asarray(times, dtype=SPLIT_TIME_DTYPE).tobytes()))
+    return packed
+
+def unpack_splits(distances_blob, times_blob):
+    """Arrays (distâncias, tempos acumulados em centésimos) de uma linha de SplitPacked (sem cópia)."""
+    return np.frombuffer(distances_blob, dtype=SPLIT_DISTANCE_DTYPE), np.frombuffer(times_blob, dtype=SPLIT_TIME_DTYPE)
+
+def _split_arrays(row_splits, packed_rows, as_seconds):
+    """Junta parciais de SplitCM (result_id, distance, cs) e de SplitPacked em arrays paralelos."""
+    result_ids = [row[0] for row in row_splits]
+    distances = [np.fromiter((row[1] for row in row_splits), dtype=np.int64, count=len(row_splits))]
+    times = [np.fromiter((-1 if row[2] is None else row[2] for row in row_splits), dtype=np.int64, count=len(row_splits))]
+    for result_id, distances_blob, times_blob in packed_rows:
+        packed_distances, packed_times = unpack_splits(distances_blob, times_blob)
+        result_ids.extend([result_id] * len(packed_times)); distances.append(packed_distances); times.append(packed_times)
+    distances = np.concatenate(distances).astype(np.int64); times = np.concatenate(times).astype(np.int64)
+    if as_seconds: times = np.where(times >= 0, times / 100.0, np.nan)
+    return result_ids, distances, times
+
+def fetch_split_arrays(conn, result_ids, as_seconds=False, strategy='auto'):
+    """Parciais (SplitCM e SplitPacked) dos resultados informados como arrays NumPy.
+
+    Retorna (ids, distâncias, tempos): `ids` é uma lista com o result_id_lenex de cada parcial, agrupada por
+    resultado e em ordem de distância; tempos acumulados em centésimos (int64, -1 = inválido) ou, com
+    `as_seconds`, em segundos (float64, NaN = inválido) - pronto para core.pacing.compute_pacing. `strategy` vai
+    para fetch_by_ids ('chunks' quando outra consulta da conexão ainda está sendo lida).
+    """
+    result_ids = list(result_ids)
+    if not result_ids: return _split_arrays([], [], as_seconds)
+    row_splits = fetch_by_ids(conn, "SELECT result_id_lenex, distance, swim_time_cs FROM SplitCM WHERE result_id_lenex IN ({ids}) ORDER BY result_id_lenex, distance", result_ids, strategy=strategy)
+    packed_rows = fetch_by_ids(conn, "SELECT result_id_lenex, distances, times_cs FROM SplitPacked WHERE result_id_lenex IN ({ids})", result_ids, strategy=strategy)
+    return _split_arrays(row_splits, packed_rows, as_seconds)
+
+def fetch_split_arrays_for_meet(conn, meet_id, as_seconds=False):
+    """Como fetch_split_arrays, para todos os resultados de uma competição."""
+    row_splits = conn.execute("""SELECT s.result_id_lenex, s.distance, s.swim_time_cs FROM ResultCM r
+                                 CROSS JOIN SplitCM s ON s.result_id_lenex = r.result_id_lenex
+                                 WHERE r.meet_id = ? ORDER BY s.result_id_lenex, s.distance""", (meet_id,)).fetchall()
+    packed_rows = conn.execute("""SELECT p.result_id_lenex, p.distances, p.times_cs FROM ResultCM r
+                                  CROSS JOIN SplitPacked p ON p.result_id_lenex = r.result_id_lenex WHERE r.meet_id = ?""", (meet_id,)).fetchall()
+    return _split_arrays(row_splits, packed_rows, as_seconds)
+
+def centiseconds_to_swimtime(time_cs):
+    """Inverso de swimtime_to_centiseconds: centésimos -> 'HH:MM:SS.hh' (None se inválido)."""
+    if time_cs is None or time_cs < 0: return None
+    hours, rest = divmod(int(time_cs), 360000); minutes, rest = divmod(rest, 6000); seconds, cents = divmod(rest, 100)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{cents:02d}"
+
 # --- Funções de Consulta ---
 # fetch_all_results_basic e fetch_athletes permanecem as mesmas
 
@@ -177,7 +486,10 @@ def update_meet_details(conn, meet_id, name, city, course, start_date, hostclub)
             SET name = ?, city = ?, course = ?, pool_size_desc = ?, start_date = ?, hostclub = ?
             WHERE meet_id = ?
         """, (name, city, course, pool_size_desc, start_date, hostclub, meet_id))
+        refresh_result_flat(conn, meet_id) # Mantém a tabela desnormalizada em dia (a data também muda a idade na competição)
+        refresh_best_times(conn, meet_id) # Piscina/data podem mudar a chave ou a temporada das marcas
         conn.commit()
+        bump_generation() # Resultados processados em cache nas abas ficaram desatualizados
         return True # Indica sucesso
     except sqlite3.Error as e:
         print(f"Erro ao atualizar meet ID {meet_id}: {e}")
@@ -190,21 +502,18 @@ def fetch_results_for_meet_summary(conn, meet_id):
     cursor = conn.cursor()
     query = """
         SELECT
-            r.result_id_lenex, -- <<< ADICIONADO
-            am.first_name || ' ' || am.last_name AS Atleta,
-            SUBSTR(am.birthdate, 1, 4) AS AnoNasc,
-            e.prova_desc AS Prova,
-            r.place AS Colocacao,
-            r.swim_time AS Tempo,
-            r.status AS Status,
-            r.event_db_id,
-            r.agegroup_db_id
-        FROM ResultCM r
-        JOIN AthleteMeetLink aml ON r.link_id = aml.link_id
-        JOIN AthleteMaster am ON aml.license = am.license
-        JOIN Event e ON r.event_db_id = e.event_db_id
-        WHERE r.meet_id = ?
-        ORDER BY Atleta, e.number;
+            f.result_id_lenex, -- <<< ADICIONADO
+            f.athlete_name AS Atleta,
+            CAST(f.birth_year AS TEXT) AS AnoNasc,
+            f.prova_desc AS Prova,
+            f.place AS Colocacao,
+            f.swim_time AS Tempo,
+            f.status AS Status,
+            f.event_db_id,
+            f.agegroup_db_id
+        FROM ResultFlat f
+        WHERE f.meet_id = ?
+        ORDER BY Atleta, f.event_number;
     """
     try:
         cursor.execute(query, (meet_id,))
@@ -215,6 +524,49 @@ def fetch_results_for_meet_summary(conn, meet_id):
         print(f"Erro ao buscar resultados para resumo do meet {meet_id}: {e}")
         return [], []
 
+def fetch_personal_bests(conn, license_id):
+    """Melhores marcas do atleta: [(estilo, distância, piscina, tempo, centésimos, data, meet_id, result_id_lenex)]."""
+    cursor = conn.cursor()
+    cursor.execute("""SELECT stroke, distance, course, swim_time, swim_time_cs, start_date, meet_id, result_id_lenex
+                      FROM PersonalBest WHERE license = ? ORDER BY stroke, distance, course""", (license_id,))
+    return cursor.fetchall()
+
+def fetch_season_bests(conn, license_id, season=None):
+    """Melhores marcas do atleta por temporada (todas ou só `season`), mais recentes primeiro."""
+    cursor = conn.cursor()
+    query = """SELECT season, stroke, distance, course, swim_time, swim_time_cs, start_date, meet_id, result_id_lenex
+               FROM SeasonBest WHERE license = ?"""
+    params = [license_id]
+    if season is not None: query += " AND season = ?"; params.append(season)
+    cursor.execute(query + " ORDER BY season DESC, stroke, distance, course", params)
+    return cursor.fetchall()
+
+def fetch_best_times_board(conn, stroke, distance, course=None, season=None, gender=None, start_year=None, end_year=None, limit=None):
+    """Ranking de melhores tempos (um por atleta) de uma prova individual, lido de PersonalBest ou, com `season`,
+    de SeasonBest. Sem `course`, vale a melhor marca entre as piscinas.
+
+    Retorna (headers, rows) com as colunas license, AthleteName, TimeCs, Time, Course, Date, em ordem de tempo.
+    """
+    table = 'SeasonBest' if season is not None else 'PersonalBest'
+    filters = ["stroke = ?", "distance = ?"]; params = [stroke, distance]
+    if course is not None: filters.append("course = ?"); params.append(course)
+    if season is not None: filters.append("season = ?"); params.append(season)
+    if gender is not None: filters.append("gender = ?"); params.append(gender)
+    if start_year is not None: filters.append("birth_year >= ?"); params.append(int(start_year))
+    if end_year is not None: filters.append("birth_year <= ?"); params.append(int(end_year))
+    # Colunas "soltas" junto com MIN() vêm da linha do mínimo (garantido pelo SQLite)
+    query = f"""SELECT license, athlete_name AS AthleteName, MIN(swim_time_cs) AS TimeCs, swim_time AS Time, course AS Course, start_date AS Date
+                FROM {table} WHERE {' AND '.join(filters)} GROUP BY license ORDER BY TimeCs, AthleteName"""
+    if limit is not None: query += " LIMIT ?"; params.append(int(limit))
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    return [d[0] for d in cursor.description], cursor.fetchall()
+
+def fetch_individual_event_key(conn, prova_desc):
+    """(estilo, distância) de uma prova individual pela descrição ('100m FREE'); None para revezamentos/desconhecidas."""
+    row = conn.execute("SELECT stroke, distance FROM Event WHERE prova_desc = ? AND COALESCE(relay_count, 1) <= 1 AND stroke IS NOT NULL AND distance IS NOT NULL LIMIT 1", (prova_desc,)).fetchone()
+    return tuple(row) if row else None
+
 def fetch_top3_for_meet(conn, meet_id):
     """Busca todos os resultados Top3 para um meet específico."""
     # ... (sem alterações) ...
@@ -227,20 +579,27 @@ def fetch_top3_for_meet(conn, meet_id):
 
 # --- NOVA FUNÇÃO para buscar parciais ---
 def fetch_splits_for_meet(conn, meet_id):
-    """Busca todas as parciais (SplitCM) para um determinado meet_id."""
+    """Busca todas as parciais (SplitCM e SplitPacked) para um determinado meet_id."""
     cursor = conn.cursor()
-    # Junta com ResultCM apenas para filtrar pelo meet_id
+    # Junta com ResultCM apenas para filtrar pelo meet_id.
+    # CROSS JOIN fixa a ordem (ResultCM pelo índice de meet_id -> SplitCM pelo UNIQUE), evitando SCAN em SplitCM.
     query = """
         SELECT s.result_id_lenex, s.distance, s.swim_time
-        FROM SplitCM s
-        JOIN ResultCM r ON s.result_id_lenex = r.result_id_lenex
+        FROM ResultCM r
+        CROSS JOIN SplitCM s ON s.result_id_lenex = r.result_id_lenex
         WHERE r.meet_id = ?
         ORDER BY s.result_id_lenex, s.distance;
     """
     try:
         cursor.execute(query, (meet_id,))
         # Retorna (result_id, distance, time_str)
-        return cursor.fetchall()
+        splits = cursor.fetchall()
+        cursor.execute("SELECT p.result_id_lenex, p.distances, p.times_cs FROM ResultCM r CROSS JOIN SplitPacked p ON p.result_id_lenex = r.result_id_lenex WHERE r.meet_id = ?", (meet_id,))
+        packed_rows = cursor.fetchall()
+        if not packed_rows: return splits
+        for result_id, distances_blob, times_blob in packed_rows: # Parciais compactadas (texto refeito a partir dos centésimos)
+            splits.extend((result_id, int(d), centiseconds_to_swimtime(int(t))) for d, t in zip(*unpack_splits(distances_blob, times_blob)))
+        return sorted(splits, key=lambda split: (split[0], split[1]))
     except sqlite3.Error as e:
         print(f"Erro ao buscar parciais para meet {meet_id}: {e}")
         return []
@@ -0,0 +1,112 @@
+# NadosApp/core/id_lookup.py
+"""Consultas com listas grandes de IDs (WHERE coluna IN (...)) sem estourar o limite de variáveis do SQLite.
+
+Duas estratégias para a mesma consulta, escrita com o marcador {ids} no lugar da lista:
+
+    fetch_by_ids(conn, "SELECT ... FROM SplitCM WHERE result_id_lenex IN ({ids})", result_ids)
+
+- 'chunks': executa a consulta em blocos de no máximo IN_CHUNK_SIZE placeholders (menos, se o limite de variáveis
+  da conexão não comportar o bloco mais os parâmetros adicionais) e junta as linhas;
+- 'temp': grava os IDs em uma tabela temporária indexada (PRIMARY KEY) e usa IN (SELECT id FROM ...).
+
+'auto' usa blocos até TEMP_TABLE_MIN_IDS IDs e a tabela temporária acima disso (valores medidos com
+benchmark_id_lookup; rode `python -m core.id_lookup banco.db` para medir em uma cópia do seu banco).
+Com 'chunks', um ORDER BY da consulta vale dentro de cada bloco; todas as linhas de um mesmo ID ficam no
+mesmo bloco. Parâmetros adicionais vão em `params_before` / `params_after` (antes/depois da lista).
+"""
+import itertools
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+
+IN_CHUNK_SIZE = 500          # Placeholders por consulta no modo 'chunks' (abaixo do limite antigo de 999)
+TEMP_TABLE_MIN_IDS = 5000    # A partir daqui 'auto' usa a tabela temporária (abaixo disso os blocos empatam ou ganham)
+_temp_table_counter = itertools.count(1)
+
+
+def max_variables(conn):
+    """Limite de parâmetros por comando desta conexão (999 em SQLite < 3.32)."""
+    try: return conn.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+    except AttributeError: return 999 # Python < 3.11 não expõe getlimit
+
+
+def iter_id_chunks(ids, chunk_size=IN_CHUNK_SIZE):
+    ids = list(ids)
+    for start in range(0, len(ids), chunk_size): yield ids[start:start + chunk_size]
+
+
+@contextmanager
+def temp_id_table(conn, ids):
+    """Carrega `ids` (sem repetição) em uma tabela temporária e devolve o nome dela; a tabela é removida na saída."""
+    table = f"temp._lookup_ids_{next(_temp_table_counter)}"
+    started_transaction = not conn.in_transaction
+    conn.execute(f"CREATE TABLE {table} (id PRIMARY KEY) WITHOUT ROWID")
+    try:
+        try: conn.execute(f"INSERT OR IGNORE INTO {table} (id) SELECT value FROM json_each(?)", (json.dumps(ids),)) # Um único parâmetro
+        except (sqlite3.OperationalError, TypeError): # SQLite sem JSON1 ou IDs não serializáveis
+            conn.executemany(f"INSERT OR IGNORE INTO {table} (id) VALUES (?)", ((i,) for i in ids))
+        yield table
+    finally:
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+        if started_transaction and conn.in_transaction: conn.commit() # Só a tabela temporária foi escrita
+
+
+def _choose_strategy(n_ids, strategy):
+    if strategy != 'auto': return strategy
+    return 'temp' if n_ids >= TEMP_TABLE_MIN_IDS else 'chunks'
+
+
+def fetch_by_ids(conn, sql, ids, params_before=(), params_after=(), strategy='auto', chunk_size=IN_CHUNK_SIZE):
+    """Executa `sql` (com o marcador {ids}) para todos os IDs e retorna a lista de linhas."""
+    ids = list(dict.fromkeys(ids)) # Remove repetidos mantendo a ordem
+    if not ids: return []
+    strategy = _choose_strategy(len(ids), strategy)
+    if strategy == 'temp':
+        with temp_id_table(conn, ids) as table:
+            return conn.execute(sql.format(ids=f"SELECT id FROM {table}"), (*params_before, *params_after)).fetchall()
+    if strategy != 'chunks': raise ValueError(f"Estratégia desconhecida: {strategy}")
+    chunk_size = min(chunk_size, max_variables(conn) - len(params_before) - len(params_after)) # Cada bloco cabe no limite de variáveis
+    if chunk_size < 1: raise ValueError("Parâmetros adicionais excedem o limite de variáveis do SQLite.")
+    rows = []
+    for chunk in iter_id_chunks(ids, chunk_size):
+        rows.extend(conn.execute(sql.format(ids=', '.join('?' * len(chunk))), (*params_before, *chunk, *params_after)).fetchall())
+    return rows
+
+
+def benchmark_id_lookup(conn, sql, ids, sizes=(100, 500, 1000, 2000, 5000, 20000, 50000), repeat=3):
+    """Mede 'chunks' x 'temp' (melhor de `repeat`, em ms) para cada tamanho de lista. Retorna [(n, ms_chunks, ms_temp, linhas)]."""
+    ids = list(dict.fromkeys(ids)); results = []
+    for n in sizes:
+        if n > len(ids): break
+        subset = ids[:n]; timings = {}
+        for strategy in ('chunks', 'temp'):
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter(); rows = fetch_by_ids(conn, sql, subset, strategy=strategy)
+                elapsed = (time.perf_counter() - start) * 1000.0
+                best = elapsed if best is None else min(best, elapsed)
+            timings[strategy] = best
+        results.append((n, timings['chunks'], timings['temp'], len(rows)))
+    return results
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from core.database import get_db_connection
+    if len(sys.argv) != 2 or not os.path.isfile(sys.argv[1]):
+        print("Uso: python -m core.id_lookup caminho/do/banco.db (use uma cópia: o banco recebe as migrações pendentes)")
+        sys.exit(2)
+    conn = get_db_connection(sys.argv[1])
+    if not conn: sys.exit(2)
+    all_ids = [row[0] for row in conn.execute("SELECT result_id_lenex FROM ResultCM")]
+    random.Random(0).shuffle(all_ids) # Amostras espalhadas pelo banco
+    split_sql = "SELECT result_id_lenex, distance, swim_time_cs FROM SplitCM WHERE result_id_lenex IN ({ids}) ORDER BY result_id_lenex, distance"
+    print(f"Limite de variáveis: {max_variables(conn)}; resultados no banco: {len(all_ids)}")
+    print(f"{'IDs':>8} {'blocos (ms)':>12} {'temp (ms)':>10} {'linhas':>8}")
+    for n, ms_chunks, ms_temp, n_rows in benchmark_id_lookup(conn, split_sql, all_ids, sizes=sorted({*(s for s in (100, 500, 1000, 2000, 5000, 20000, 50000) if s < len(all_ids)), len(all_ids)})):
+        print(f"{n:>8} {ms_chunks:>12.2f} {ms_temp:>10.2f} {n_rows:>8}")
+    conn.close()
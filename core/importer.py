@@ -2,23 +2,317 @@
 import xml.etree.ElementTree as ET
 import sqlite3
 import os
+import zipfile
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from collections import defaultdict
 import time
 from PySide6.QtCore import QObject, Signal
 
 # Importa funções auxiliares do database.py
-from .database import get_pool_size_desc # get_db_connection e setup_database_cm_detailed são usados indiretamente
+from .database import (get_pool_size_desc, fetch_manifest_meet_id, record_manifest_entry, forget_manifest_entries,
+                       swimtime_to_centiseconds, normalize_stroke_code, birth_year_from_date, pack_split_rows, refresh_result_flat, refresh_best_times,
+                       acquire_writer_connection, release_writer_connection)
+
+
+class LenexParseError(ValueError):
+    """Erro estrutural em um arquivo LENEX (ex: falta da tag <MEET> ou de um ID de competição)."""
+
+
+def _to_int(value, default=None):
+    """Converte atributos numéricos do LENEX, devolvendo `default` se vazio ou inválido."""
+    if not value: return default
+    try: return int(value)
+    except ValueError: return default
+
+
+@contextmanager
+def open_lenex_source(file_path):
+    """Abre um arquivo LENEX para leitura binária, seja .lef (XML puro) ou .lxf (ZIP com o .lef dentro).
+
+    No caso do .lxf o XML é descompactado em streaming direto do arquivo ZIP, sem extração para o disco.
+    A detecção é feita pelo conteúdo (assinatura ZIP), não pela extensão.
+    """
+    if not zipfile.is_zipfile(file_path):
+        with open(file_path, 'rb') as f: yield f
+        return
+    try:
+        with zipfile.ZipFile(file_path) as zf:
+            members = [info for info in zf.infolist() if not info.is_dir()]
+            lef_members = [info for info in members if info.filename.lower().endswith('.lef')]
+            if not members:
+                raise LenexParseError(f"Erro: Arquivo compactado '{os.path.basename(file_path)}' não contém nenhum arquivo .lef.")
+            member = (lef_members or members)[0]
+            with zf.open(member) as f: yield f
+    except zipfile.BadZipFile as e:
+        raise LenexParseError(f"Erro ao abrir o arquivo compactado '{os.path.basename(file_path)}': {e}") from e
+
+
+def _derive_lenex_meet_id(meet_attrs, first_session_date, file_name):
+    """ID LENEX da competição: atributo 'number' ou, na falta dele, o composto name_city_data da 1ª sessão.
+
+    Retorna (lenex_meet_id, aviso ou None). Levanta LenexParseError se nenhum dos dois for possível.
+    """
+    lenex_meet_id = meet_attrs.get('number')
+    if lenex_meet_id: return lenex_meet_id, None
+    m_name = meet_attrs.get('name', ''); m_city = meet_attrs.get('city', ''); m_date = first_session_date or ''
+    if not m_name or not m_city or not m_date:
+        raise LenexParseError(f"Erro: Não foi possível determinar um ID único (number ou name+city+date) para o MEET em '{file_name}'.")
+    lenex_meet_id = f"{m_name}_{m_city}_{m_date}"
+    return lenex_meet_id, f"AVISO: Usando ID composto '{lenex_meet_id}' para o MEET (atributo 'number' ausente)."
+
+
+def sniff_lenex_meet_id(xml_file_path):
+    """Lê apenas o cabeçalho do arquivo (até <MEET> e a data da primeira <SESSION>) e devolve o lenex_meet_id.
+
+    Usado para descartar competições já importadas sem fazer o parse completo.
+    Levanta LenexParseError se o cabeçalho não permitir determinar o ID.
+    """
+    file_name = os.path.basename(xml_file_path)
+    meet_attrs = None
+    try:
+        with open_lenex_source(xml_file_path) as source:
+            for event, elem in ET.iterparse(source, events=('start',)):
+                if elem.tag == 'MEET' and meet_attrs is None:
+                    meet_attrs = dict(elem.attrib)
+                    if meet_attrs.get('number'): break
+                elif elem.tag == 'SESSION' and meet_attrs is not None:
+                    return _derive_lenex_meet_id(meet_attrs, elem.get('date', ''), file_name)[0]
+    except ET.ParseError as e:
+        raise LenexParseError(f"Erro ao fazer o parse do XML '{file_name}': {e}") from e
+    if meet_attrs is None:
+        raise LenexParseError(f"Erro: Tag <MEET> não encontrada em '{file_name}'.")
+    return _derive_lenex_meet_id(meet_attrs, None, file_name)[0]
+
+
+def file_content_sha256(file_path, chunk_size=1 << 20):
+    """Hash SHA-256 do conteúdo do arquivo, lido em blocos."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''): digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_lenex_file(xml_file_path, target_club_name, is_known_meet=None):
+    """Lê um arquivo LENEX em uma única passagem (iterparse) e devolve as linhas prontas para inserção.
+
+    Os elementos <EVENT> e <ATHLETE> são processados assim que fecham e em seguida descartados,
+    de modo que a árvore completa nunca fica em memória. Todas as chaves são os IDs do LENEX;
+    a tradução para IDs do banco é feita em LenexImporter._store_parsed_meet.
+
+    `is_known_meet(lenex_meet_id)` é opcional: se devolver True, a leitura é interrompida logo após
+    o cabeçalho da competição e o dicionário volta com 'skipped' = True.
+    """
+    file_name = os.path.basename(xml_file_path)
+    parsed = {
+        'meet': None, 'skipped': False, 'warnings': [],
+        'events': [],                  # dicts com dados do Event e lista 'agegroups'
+        'athletes': [],                # (license, first, last, birthdate, birth_year, gender) - apenas clube alvo
+        'links': [],                   # (license, athlete_id_lenex) - apenas clube alvo
+        'results': [],                 # dicts por resultado do clube alvo
+        'splits': [],                  # (result_id_lenex, distance, swim_time, swim_time_cs)
+        'top3_candidates': defaultdict(list),  # (event_id_lenex, ag_id_lenex) -> [{'place', 'time'}]
+    }
+    meet_attrs = None
+    first_session_date = None
+    age_date_attrs = {}  # <AGEDATE> da competição (data/tipo de referência das idades)
+    in_first_meet = False
+    meets_seen = 0
+    seen_events = set()
+    accepted_events = set()
+    rankings_lookup = {}
+    tag_stack = []
+    club_stack = []  # (nome do clube, é clube alvo?) para cada <CLUB> aberto
+
+    def finalize_meet():
+        """Determina o ID LENEX da competição (number ou composto) assim que o cabeçalho é conhecido."""
+        lenex_meet_id, warning = _derive_lenex_meet_id(meet_attrs, first_session_date, file_name)
+        if warning: parsed['warnings'].append(warning)
+        meet_course = meet_attrs.get('course', 'N/A')
+        parsed['meet'] = {
+            'lenex_meet_id': lenex_meet_id,
+            'name': meet_attrs.get('name', 'N/A'),
+            'city': meet_attrs.get('city', 'N/A'),
+            'course': meet_course,
+            'pool_size_desc': get_pool_size_desc(meet_course),
+            'start_date': first_session_date or 'N/A',
+            'hostclub': meet_attrs.get('hostclub'),
+            'age_date': age_date_attrs.get('value'), 'age_date_type': age_date_attrs.get('type'),
+        }
+        return lenex_meet_id
+
+    def handle_event(event_tag):
+        event_id_lenex = event_tag.get('eventid')
+        if not event_id_lenex or event_id_lenex in seen_events: return
+        seen_events.add(event_id_lenex)
+        swimstyle_tag = event_tag.find('SWIMSTYLE')
+        if swimstyle_tag is None: return
+        accepted_events.add(event_id_lenex)
+        dist = swimstyle_tag.get('distance'); stroke = normalize_stroke_code(swimstyle_tag.get('stroke')) # Código canônico (FREE, BACK...)
+        relay_count = swimstyle_tag.get('relaycount', '1')
+        try: dist_int = int(dist) if dist else None; relay_int = int(relay_count) if relay_count else 1; number_int = int(event_tag.get('number')) if event_tag.get('number') else None
+        except ValueError: dist_int = None; relay_int = 1; number_int = None
+        prova_desc = f"{dist}m {stroke}" + (f" (Revezamento x{relay_int})" if relay_int > 1 else "")
+        # Categorias e rankings saem da mesma visita ao <EVENT>: caminhos diretos, sem busca no documento.
+        agegroups = []
+        for agegroup_tag in event_tag.findall('AGEGROUPS/AGEGROUP'):
+            ag_id_lenex = agegroup_tag.get('agegroupid')
+            if not ag_id_lenex: continue
+            ag_min_str = agegroup_tag.get('agemin'); ag_max_str = agegroup_tag.get('agemax')
+            ag_min = _to_int(ag_min_str) if ag_min_str != '-1' else None
+            ag_max = _to_int(ag_max_str) if ag_max_str != '-1' else None
+            agegroups.append((ag_id_lenex, ag_min, ag_max))
+            for ranking_tag in agegroup_tag.findall('RANKINGS/RANKING'):
+                result_id_lenex = ranking_tag.get('resultid'); place = _to_int(ranking_tag.get('place'))
+                if result_id_lenex and place is not None and place > 0:
+                    rankings_lookup[result_id_lenex] = {'place': place, 'ag_id': ag_id_lenex, 'event_id': event_id_lenex}
+        parsed['events'].append({
+            'event_id_lenex': event_id_lenex, 'number': number_int, 'gender': event_tag.get('gender'),
+            'distance': dist_int, 'stroke': stroke, 'relay_count': relay_int, 'round': event_tag.get('round'),
+            'daytime': event_tag.get('daytime'), 'prova_desc': prova_desc, 'agegroups': agegroups,
+        })
+
+    def handle_athlete(athlete_tag, is_target_club):
+        athlete_id_lenex = athlete_tag.get('athleteid'); license_id = athlete_tag.get('license')
+        if not athlete_id_lenex or not license_id: return
+        if is_target_club:
+            birthdate = athlete_tag.get('birthdate')
+            parsed['athletes'].append((license_id, athlete_tag.get('firstname', ''), athlete_tag.get('lastname', ''), birthdate, birth_year_from_date(birthdate), athlete_tag.get('gender')))
+            parsed['links'].append((license_id, athlete_id_lenex))
+        results_tag = athlete_tag.find('RESULTS')
+        if results_tag is None: return
+        for result_tag in results_tag.findall('RESULT'):
+            result_id_lenex = result_tag.get('resultid'); event_id_lenex_res = result_tag.get('eventid')
+            if not result_id_lenex or not event_id_lenex_res or event_id_lenex_res not in accepted_events: continue
+            swimtime = result_tag.get('swimtime'); status = result_tag.get('status')
+            ranking_info = rankings_lookup.get(result_id_lenex)
+            place = ranking_info['place'] if ranking_info else None; ag_id_lenex = ranking_info['ag_id'] if ranking_info else None
+            if swimtime and place and place > 0 and (status is None or status == 'OFFICIAL'):
+                parsed['top3_candidates'][(event_id_lenex_res, ag_id_lenex)].append({'place': place, 'time': swimtime})
+            if not is_target_club: continue
+            points_str = result_tag.get('points'); lane_str = result_tag.get('lane')
+            try: points = int(points_str) if points_str else None; lane = int(lane_str) if lane_str else None
+            except ValueError: points = None; lane = None
+            parsed['results'].append({
+                'result_id': result_id_lenex, 'athlete_id_lenex': athlete_id_lenex, 'event_id_lenex': event_id_lenex_res,
+                'swimtime': swimtime, 'status': status, 'points': points, 'heatid': result_tag.get('heatid'), 'lane': lane,
+                'reaction': result_tag.get('reactiontime'), 'comment': result_tag.get('comment'),
+                'entrytime': result_tag.get('entrytime'), 'entrycourse': result_tag.get('entrycourse'),
+                'place': place, 'ag_id_lenex': ag_id_lenex,
+                'swimtime_cs': swimtime_to_centiseconds(swimtime), 'entrytime_cs': swimtime_to_centiseconds(result_tag.get('entrytime')),
+            })
+            splits_tag = result_tag.find('SPLITS')
+            if splits_tag is not None:
+                for split_tag in splits_tag.findall('SPLIT'):
+                    split_dist = _to_int(split_tag.get('distance')); split_time = split_tag.get('swimtime')
+                    if split_dist is not None and split_time is not None: parsed['splits'].append((result_id_lenex, split_dist, split_time, swimtime_to_centiseconds(split_time)))
+
+    try:
+        with open_lenex_source(xml_file_path) as source:
+            for event, elem in ET.iterparse(source, events=('start', 'end')):
+                tag = elem.tag
+                if event == 'start':
+                    tag_stack.append(tag)
+                    if tag == 'MEET':
+                        meets_seen += 1
+                        in_first_meet = meets_seen == 1
+                        if in_first_meet: meet_attrs = dict(elem.attrib)
+                    elif tag == 'AGEDATE' and in_first_meet and tag_stack[-2] == 'MEET':
+                        age_date_attrs = dict(elem.attrib)
+                        if parsed['meet'] is not None: parsed['meet'].update(age_date=elem.get('value'), age_date_type=elem.get('type'))
+                    elif tag == 'SESSION' and in_first_meet and first_session_date is None:
+                        first_session_date = elem.get('date', '')
+                    elif tag == 'CLUB':
+                        club_name = elem.get('name'); club_stack.append((club_name, club_name == target_club_name))
+                    # O cabeçalho está completo ao abrir o primeiro bloco de conteúdo da competição
+                    if in_first_meet and parsed['meet'] is None and (tag == 'EVENTS' or (tag == 'CLUBS' and (meet_attrs.get('number') or first_session_date is not None))):
+                        lenex_meet_id = finalize_meet()
+                        if is_known_meet is not None and is_known_meet(lenex_meet_id):
+                            parsed['skipped'] = True
+                            return parsed
+                    continue
+
+                # event == 'end'
+                tag_stack.pop()
+                parent_tag = tag_stack[-1] if tag_stack else None
+                if tag == 'EVENT' and in_first_meet and 'SESSION' in tag_stack:
+                    handle_event(elem); elem.clear()
+                elif tag == 'ATHLETE' and parent_tag == 'ATHLETES' and len(tag_stack) >= 2 and tag_stack[-2] == 'CLUB':
+                    handle_athlete(elem, club_stack[-1][1]); elem.clear()
+                elif tag == 'CLUB':
+                    club_stack.pop(); elem.clear()
+                elif tag in ('SESSION', 'EVENTS', 'ATHLETES', 'CLUBS'):
+                    elem.clear()
+                elif tag == 'MEET' and in_first_meet:
+                    if parsed['meet'] is None:
+                        lenex_meet_id = finalize_meet()
+                        if is_known_meet is not None and is_known_meet(lenex_meet_id):
+                            parsed['skipped'] = True
+                            return parsed
+                    in_first_meet = False
+                    elem.clear()
+    except ET.ParseError as e:
+        raise LenexParseError(f"Erro ao fazer o parse do XML '{file_name}': {e}") from e
+
+    if meet_attrs is None:
+        raise LenexParseError(f"Erro: Tag <MEET> não encontrada em '{file_name}'.")
+
+    # --- Top 3 por (prova, categoria) ---
+    top3 = []
+    for (event_id_lenex, ag_id_lenex), results_list in parsed.pop('top3_candidates').items():
+        sorted_results = sorted(results_list, key=lambda x: (x['place'], x['time'])); places_added = set()
+        for res in sorted_results:
+            if len(places_added) >= 3: break
+            if res['place'] in (1, 2, 3) and res['place'] not in places_added:
+                top3.append((event_id_lenex, ag_id_lenex, res['place'], res['time'], swimtime_to_centiseconds(res['time']))); places_added.add(res['place'])
+    parsed['top3'] = top3
+    return parsed
+
+
+def _parse_file_worker(xml_file_path, target_club_name, known_meet_ids):
+    """Executado nos processos do pool (ou direto, no modo serial).
+
+    Retorna (parsed, None) em caso de sucesso ou (None, mensagem) em caso de erro, para que falhas de um
+    arquivo cheguem ao escritor como texto de log em vez de exceções atravessando processos.
+    """
+    start_time = time.time()
+    try:
+        parsed = parse_lenex_file(xml_file_path, target_club_name, is_known_meet=known_meet_ids.__contains__)
+        parsed['parse_seconds'] = time.time() - start_time
+        return parsed, None
+    except LenexParseError as e:
+        return None, str(e)
+    except Exception as e:
+        import traceback
+        return None, f"Erro proc arquivo LENEX '{os.path.basename(xml_file_path)}': {e}\n{traceback.format_exc()}"
+
+
+# Colunas de ResultCM na ordem usada pelas linhas montadas em _build_result_rows
+RESULT_COLUMNS = ('result_id_lenex', 'link_id', 'event_db_id', 'meet_id', 'swim_time', 'status', 'points', 'heat_id',
+                  'lane', 'reaction_time', 'comment', 'entry_time', 'entry_course', 'place', 'agegroup_db_id',
+                  'swim_time_cs', 'entry_time_cs')
+
 
 class LenexImporter(QObject):
     progress_update = Signal(int)
     log_message = Signal(str)
     finished = Signal(bool, str)
 
-    def __init__(self, db_path, target_club_name, parent=None): # Modificado para receber target_club_name
+    # Pragmas do modo de carga em lote (restaurados ao final do lote)
+    BULK_PRAGMAS = {'journal_mode': 'WAL', 'synchronous': 'OFF', 'cache_size': -65536} # cache_size negativo = KiB (64 MB)
+
+    def __init__(self, db_path, target_club_name, parent=None, bulk_mode=False, merge_mode=False, packed_splits=False): # Modificado para receber target_club_name
         super().__init__(parent)
         self.db_path = db_path
         self.target_club_name = target_club_name # Armazena o nome do clube
+        self.bulk_mode = bulk_mode # Lote inteiro em uma transação, um SAVEPOINT por arquivo
+        self.merge_mode = merge_mode # Competições já existentes são atualizadas (só as linhas alteradas) em vez de puladas
+        self.packed_splits = packed_splits # Parciais gravadas em SplitPacked (um BLOB por resultado) em vez de uma linha por parcial em SplitCM
         self.files_to_process = []
+        self.max_workers = None # None = um processo por núcleo (limitado ao número de arquivos)
         self._is_running = False
 
     def set_files(self, file_paths):
@@ -47,16 +341,15 @@ class LenexImporter(QObject):
         self.progress_update.emit(0)
 
         conn = None
+        saved_pragmas = None
         try:
-            # Usa get_db_connection que agora também verifica/cria o schema atualizado
-            from .database import get_db_connection # Importa aqui para garantir que use a versão atualizada
-            conn = get_db_connection(self.db_path)
-            if not conn:
-                 raise sqlite3.Error("Falha ao obter conexão com o banco de dados.")
+            # Conexão de escrita dedicada (compartilhada com a edição de competições; schema verificado uma vez)
+            conn = acquire_writer_connection(self.db_path)
+            if self.bulk_mode: saved_pragmas = self._begin_bulk_load(conn)
 
-            for i, xml_file in enumerate(self.files_to_process):
+            for i, (xml_file, parsed, error) in enumerate(self._iter_parsed_files(conn)):
                 self.log_message.emit(f"--- Processando arquivo: {os.path.basename(xml_file)} ---")
-                success = self._parse_and_store_single_file(xml_file, conn)
+                success = self._store_parsed_file(xml_file, parsed, error, conn)
 
                 if success is True: files_processed_count += 1
                 elif success is None: files_skipped_count += 1
@@ -68,6 +361,11 @@ class LenexImporter(QObject):
                 progress = int(((i + 1) / total_files) * 100)
                 self.progress_update.emit(progress)
 
+            if saved_pragmas is not None:
+                conn.execute("COMMIT")
+                self.log_message.emit("Lote gravado no banco (transação única).")
+            if files_processed_count: conn.execute("PRAGMA optimize") # Atualiza estatísticas dos índices se o volume mudou
+
         except sqlite3.Error as e:
             self.log_message.emit(f"Erro GERAL de banco de dados durante importação: {e}")
             overall_success = False
@@ -78,7 +376,8 @@ class LenexImporter(QObject):
             self.log_message.emit(traceback.format_exc())
         finally:
             if conn:
-                conn.close()
+                if saved_pragmas is not None: self._end_bulk_load(conn, saved_pragmas)
+                release_writer_connection(conn) # Continua aberta para a próxima importação
             self._is_running = False
 
         end_total_time = time.time()
@@ -91,237 +390,376 @@ class LenexImporter(QObject):
         self.finished.emit(overall_success, final_message)
 
 
-    def _parse_and_store_single_file(self, xml_file_path, conn):
-        """Processa um único arquivo LENEX e armazena no DB."""
-        start_time = time.time()
-        # ... (parse do XML igual) ...
-        try:
-            tree = ET.parse(xml_file_path)
-            root = tree.getroot()
-        except ET.ParseError as e:
-            self.log_message.emit(f"Erro ao fazer o parse do XML '{os.path.basename(xml_file_path)}': {e}")
-            return False
+    def _begin_bulk_load(self, conn):
+        """Ativa o modo de carga em lote e abre a transação do lote. Retorna os pragmas originais."""
+        saved = {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in self.BULK_PRAGMAS}
+        for name, value in self.BULK_PRAGMAS.items(): conn.execute(f"PRAGMA {name}={value}")
+        conn.isolation_level = None # Transações controladas manualmente (BEGIN/SAVEPOINT)
+        # FKs continuam imediatas (sem defer_foreign_keys): uma violação falha no próprio arquivo, que é desfeito
+        # sozinho pelo SAVEPOINT; adiadas, só apareceriam no COMMIT e derrubariam o lote inteiro
+        conn.execute("BEGIN")
+        self.log_message.emit("Modo de carga em lote ativado (WAL, synchronous=OFF, transação única).")
+        return saved
 
+    def _end_bulk_load(self, conn, saved_pragmas):
+        """Encerra o lote (desfaz se ainda houver transação aberta) e restaura os pragmas seguros."""
+        try:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+                self.log_message.emit("AVISO: Lote desfeito por erro geral; nenhum arquivo do lote foi gravado.")
+            if saved_pragmas['journal_mode'].lower() != 'wal': conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error as e:
+            self.log_message.emit(f"AVISO: Não foi possível encerrar o lote: {e}")
+        conn.isolation_level = "" # Volta ao controle de transações padrão (a conexão de escrita é reutilizada)
+        for name, value in saved_pragmas.items(): # Um por vez: um pragma que falhe não impede os demais
+            try: conn.execute(f"PRAGMA {name}={value}")
+            except sqlite3.Error as e:
+                # Sair do WAL exige que nenhuma outra conexão (p.ex. as de leitura das abas) esteja usando o banco
+                self.log_message.emit(f"AVISO: Não foi possível restaurar PRAGMA {name}={value} após o lote ({e}); mantido o valor do lote.")
+
+    def _finish_file(self, conn, commit):
+        """Confirma ou desfaz as alterações de um arquivo. No modo lote isso é feito pelo SAVEPOINT do arquivo."""
+        if self.bulk_mode: return
+        if commit: conn.commit()
+        else: conn.rollback()
+
+    def _prefilter_file(self, xml_file, conn, known_meet_ids, batch_meet_ids):
+        """Etapa rápida, antes de qualquer parse completo. Retorna (info do arquivo, mensagem de pulo ou None).
+
+        Ordem das verificações, da mais barata para a mais cara: (caminho, tamanho, mtime) no manifesto,
+        sem abrir o arquivo; hash SHA-256 do conteúdo no manifesto; leitura só do cabeçalho LENEX
+        para obter o lenex_meet_id e compará-lo com as competições já existentes.
+        """
+        file_name = os.path.basename(xml_file)
+        stat = os.stat(xml_file)
+        info = {'path': os.path.abspath(xml_file), 'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': None, 'lenex_meet_id': None}
+        manifest_meet_id = fetch_manifest_meet_id(conn, file_path=info['path'], file_size=info['size'], file_mtime=info['mtime'])
+        if manifest_meet_id in known_meet_ids:
+            return info, f"AVISO: Arquivo '{file_name}' já importado (competição {manifest_meet_id}, manifesto). Pulando sem abrir o arquivo."
+        info['sha256'] = file_content_sha256(xml_file)
+        manifest_meet_id = fetch_manifest_meet_id(conn, content_sha256=info['sha256'])
+        if manifest_meet_id in known_meet_ids:
+            info['lenex_meet_id'] = manifest_meet_id
+            return info, f"AVISO: Arquivo '{file_name}' idêntico a um arquivo já importado (competição {manifest_meet_id}). Pulando."
+        try: info['lenex_meet_id'] = sniff_lenex_meet_id(xml_file)
+        except LenexParseError: return info, None # O parse completo reporta o erro
+        if info['lenex_meet_id'] in known_meet_ids and not self.merge_mode:
+            return info, f"AVISO: Competição (ID LENEX: {info['lenex_meet_id']}) de '{file_name}' já existe. Pulando sem ler o arquivo inteiro."
+        if info['lenex_meet_id'] in batch_meet_ids:
+            return None, f"AVISO: Competição (ID LENEX: {info['lenex_meet_id']}) de '{file_name}' já está em outro arquivo deste lote. Pulando."
+        batch_meet_ids.add(info['lenex_meet_id'])
+        return info, None
+
+    def _iter_parsed_files(self, conn):
+        """Gera (arquivo, parsed, erro) na ordem de seleção.
+
+        Arquivos já importados são descartados pela etapa rápida (_prefilter_file). Com mais de um arquivo
+        restante o parse (CPU) roda em um pool de processos; esta thread continua sendo a única que escreve
+        no banco e consome os resultados na ordem original, então os IDs gerados e as mensagens de log não
+        dependem de qual processo terminou primeiro. Se o pool não puder ser criado, cai para o modo serial.
+        """
         cursor = conn.cursor()
-        meet_tag = root.find('.//MEET')
-        if meet_tag is None:
-            self.log_message.emit(f"Erro: Tag <MEET> não encontrada em '{os.path.basename(xml_file_path)}'.")
-            return False
+        cursor.execute("SELECT lenex_meet_id FROM Meet")
+        known_meet_ids = {row[0] for row in cursor.fetchall()}
+        batch_meet_ids = set()
+        skip_meet_ids = set() if self.merge_mode else known_meet_ids # No modo merge o parse não para no cabeçalho
+        files = list(self.files_to_process)
+        plan = [] # (arquivo, info, mensagem de pulo)
+        for xml_file in files:
+            try: info, skip_message = self._prefilter_file(xml_file, conn, known_meet_ids, batch_meet_ids)
+            except OSError as e: info, skip_message = None, None; self.log_message.emit(f"AVISO: Não foi possível verificar '{os.path.basename(xml_file)}' no manifesto: {e}")
+            plan.append((xml_file, info, skip_message))
+        to_parse = [xml_file for xml_file, _, skip_message in plan if not skip_message]
+
+        parsed_results = {} # arquivo -> future ou (parsed, erro)
+        workers = min(len(to_parse), self.max_workers or os.cpu_count() or 1)
+        executor = None
+        if workers > 1:
+            try:
+                executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+                for xml_file in to_parse: parsed_results[xml_file] = executor.submit(_parse_file_worker, xml_file, self.target_club_name, skip_meet_ids)
+                self.log_message.emit(f"Lendo arquivos em paralelo ({workers} processos)...")
+            except Exception as e:
+                self.log_message.emit(f"AVISO: Não foi possível iniciar o processamento paralelo ({e}). Usando modo serial.")
+                if executor: executor.shutdown(cancel_futures=True)
+                executor = None; parsed_results.clear()
 
-        # --- 1. Processar Meet (Verificar existência e Inserir com hostclub) ---
-        lenex_meet_id = meet_tag.get('number')
-        # ... (lógica para ID composto se 'number' não existir, igual) ...
-        if not lenex_meet_id:
-             m_name = meet_tag.get('name', '')
-             m_city = meet_tag.get('city', '')
-             m_date = meet_tag.find('.//SESSION').get('date', '') if meet_tag.find('.//SESSION') else ''
-             lenex_meet_id = f"{m_name}_{m_city}_{m_date}"
-             if not m_name or not m_city or not m_date:
-                 self.log_message.emit(f"Erro: Não foi possível determinar um ID único (number ou name+city+date) para o MEET em '{os.path.basename(xml_file_path)}'.")
-                 return False
-             self.log_message.emit(f"AVISO: Usando ID composto '{lenex_meet_id}' para o MEET (atributo 'number' ausente).")
+        try:
+            for xml_file, info, skip_message in plan:
+                if skip_message:
+                    yield xml_file, {'skipped': True, 'skip_message': skip_message, 'source': info, 'meet': None, 'warnings': []}, None
+                    continue
+                future = parsed_results.get(xml_file)
+                parsed = error = None
+                if future is not None:
+                    try: parsed, error = future.result()
+                    except BrokenProcessPool as e:
+                        self.log_message.emit(f"AVISO: Pool de processos interrompido ({e}). Continuando em modo serial.")
+                        executor.shutdown(cancel_futures=True); executor = None; parsed_results.clear(); future = None
+                    except Exception as e: error = f"Erro no processo de leitura de '{os.path.basename(xml_file)}': {e}"
+                if future is None:
+                    parsed, error = _parse_file_worker(xml_file, self.target_club_name, skip_meet_ids)
+                if parsed:
+                    parsed['source'] = info
+                    if parsed['meet']: known_meet_ids.add(parsed['meet']['lenex_meet_id'])
+                yield xml_file, parsed, error
+        finally:
+            if executor: executor.shutdown(cancel_futures=True)
 
+    def _store_parsed_file(self, xml_file_path, parsed, error, conn):
+        """Grava o resultado do parse de um arquivo. Retorna True, None (pulado) ou False."""
+        if error:
+            self.log_message.emit(error)
+            return False
+        if parsed.get('skip_message'):
+            self.log_message.emit(parsed['skip_message'])
+            if parsed['source'] and parsed['source']['sha256'] and parsed['source']['lenex_meet_id']:
+                self._record_source(conn, parsed['source'], parsed['source']['lenex_meet_id']); self._finish_file(conn, True)
+            return None
+        start_time = time.time()
+        for warning in parsed['warnings']: self.log_message.emit(warning)
+        if self.bulk_mode: conn.execute("SAVEPOINT lenex_file")
+        success = self._store_parsed_meet(parsed, conn)
+        if success is not False and parsed.get('source'):
+            self._record_source(conn, parsed['source'], parsed['meet']['lenex_meet_id']); self._finish_file(conn, True)
+        if self.bulk_mode:
+            if success is False: conn.execute("ROLLBACK TO lenex_file") # Desfaz só este arquivo
+            conn.execute("RELEASE lenex_file")
+        if success is True:
+            elapsed = parsed.get('parse_seconds', 0) + time.time() - start_time
+            self.log_message.emit(f"Arquivo '{os.path.basename(xml_file_path)}' processado com sucesso em {elapsed:.2f} segundos.")
+        return success
+
+    def _record_source(self, conn, source, lenex_meet_id):
+        """Registra o arquivo no manifesto de importação (hash calculado na etapa rápida, se ainda não houver).
+
+        No modo merge o banco passa a refletir este arquivo, então os demais arquivos da mesma competição
+        saem do manifesto (reaplicá-los deve mesclar de novo, e não ser pulado).
+        """
+        try:
+            sha256 = source['sha256'] or file_content_sha256(source['path'])
+            if self.merge_mode: forget_manifest_entries(conn, lenex_meet_id, keep_sha256=sha256)
+            record_manifest_entry(conn, sha256, source['path'], source['size'], source['mtime'], lenex_meet_id)
+        except (OSError, sqlite3.Error) as e:
+            self.log_message.emit(f"AVISO: Não foi possível registrar '{os.path.basename(source['path'])}' no manifesto: {e}")
+
+    def _store_parsed_meet(self, parsed, conn):
+        """Grava no banco as linhas produzidas por parse_lenex_file. Retorna True, None (pulado) ou False."""
+        cursor = conn.cursor()
+        meet = parsed['meet']
+        lenex_meet_id = meet['lenex_meet_id']
 
+        # --- 1. Meet (Verificar existência e Inserir com hostclub) ---
         cursor.execute("SELECT meet_id, name FROM Meet WHERE lenex_meet_id = ?", (lenex_meet_id,))
         existing_meet = cursor.fetchone()
-
-        if existing_meet:
-            self.log_message.emit(f"AVISO: Competição '{existing_meet[1]}' (ID LENEX: {lenex_meet_id}) já existe. Pulando inserção deste arquivo.")
+        if existing_meet and self.merge_mode:
+            return self._merge_parsed_meet(parsed, conn, existing_meet[0], existing_meet[1])
+        if existing_meet or parsed['skipped']:
+            meet_name = existing_meet[1] if existing_meet else meet['name']
+            self.log_message.emit(f"AVISO: Competição '{meet_name}' (ID LENEX: {lenex_meet_id}) já existe. Pulando inserção deste arquivo.")
             return None # Indica que foi pulado
 
-        # Inserir novo Meet - MODIFICADO para incluir hostclub
-        meet_name = meet_tag.get('name', 'N/A')
-        self.log_message.emit(f"Processando nova competição '{meet_name}' (ID LENEX: {lenex_meet_id})...")
-        meet_city = meet_tag.get('city', 'N/A'); meet_course = meet_tag.get('course', 'N/A')
-        meet_hostclub = meet_tag.get('hostclub') # <<< Pega o hostclub
-        meet_pool_desc = get_pool_size_desc(meet_course)
-        first_session = meet_tag.find('.//SESSION')
-        meet_start_date = first_session.get('date', 'N/A') if first_session is not None else 'N/A'
-        meet_id_db = None
+        self.log_message.emit(f"Processando nova competição '{meet['name']}' (ID LENEX: {lenex_meet_id})...")
         try:
-            # Atualiza a query INSERT para incluir hostclub
             cursor.execute('''
-                INSERT INTO Meet (lenex_meet_id, name, city, course, pool_size_desc, start_date, hostclub)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (lenex_meet_id, meet_name, meet_city, meet_course, meet_pool_desc, meet_start_date, meet_hostclub)) # Adiciona meet_hostclub
+                INSERT INTO Meet (lenex_meet_id, name, city, course, pool_size_desc, start_date, hostclub, age_date, age_date_type)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (lenex_meet_id, meet['name'], meet['city'], meet['course'], meet['pool_size_desc'], meet['start_date'], meet['hostclub'],
+                  meet['age_date'], meet['age_date_type']))
             meet_id_db = cursor.lastrowid
-            self.log_message.emit(f"Meet '{meet_name}' (ID DB: {meet_id_db}) preparado para inserção.")
+            self.log_message.emit(f"Meet '{meet['name']}' (ID DB: {meet_id_db}) preparado para inserção.")
         except sqlite3.Error as e:
             self.log_message.emit(f"Erro CRÍTICO ao preparar inserção do Meet: {e}")
-            conn.rollback()
+            self._finish_file(conn, False)
             return False
 
-        # --- 2. Processar Eventos e AgeGroups (Sem alterações aqui) ---
-        # ... (código igual para processar eventos e agegroups, usando event_map e agegroup_map) ...
+        # --- 2. Eventos e AgeGroups ---
         event_map = {}
         agegroup_map = {}
-        processed_event_lenex_ids = set()
-        try:
-            for session_tag in meet_tag.findall('.//SESSION'):
-                for event_tag in session_tag.findall('.//EVENT'):
-                    # ... (lógica interna de processamento de evento e agegroup igual) ...
-                    event_id_lenex = event_tag.get('eventid')
-                    if not event_id_lenex or event_id_lenex in processed_event_lenex_ids: continue
-                    processed_event_lenex_ids.add(event_id_lenex)
-                    swimstyle_tag = event_tag.find('SWIMSTYLE')
-                    if swimstyle_tag is None: continue
-                    dist = swimstyle_tag.get('distance'); stroke = swimstyle_tag.get('stroke')
-                    relay_count = swimstyle_tag.get('relaycount', '1'); gender = event_tag.get('gender')
-                    number = event_tag.get('number'); round_val = event_tag.get('round'); daytime = event_tag.get('daytime')
-                    try: dist_int = int(dist) if dist else None; relay_int = int(relay_count) if relay_count else 1; number_int = int(number) if number else None
-                    except ValueError: dist_int = None; relay_int = 1; number_int = None
-                    prova_desc = f"{dist}m {stroke}" + (f" (Revezamento x{relay_int})" if relay_int > 1 else "")
-                    event_db_id = None
-                    try:
-                        cursor.execute('''INSERT INTO Event (meet_id, event_id_lenex, number, gender, distance, stroke, relay_count, round, daytime, prova_desc) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', (meet_id_db, event_id_lenex, number_int, gender, dist_int, stroke, relay_int, round_val, daytime, prova_desc))
-                        event_db_id = cursor.lastrowid
-                        event_map[event_id_lenex] = event_db_id
-                    except sqlite3.IntegrityError as ie:
-                         if "UNIQUE constraint failed: Event.meet_id, Event.event_id_lenex" in str(ie):
-                             cursor.execute("SELECT event_db_id FROM Event WHERE meet_id = ? AND event_id_lenex = ?", (meet_id_db, event_id_lenex))
-                             existing = cursor.fetchone(); event_db_id = existing[0] if existing else None; event_map[event_id_lenex] = event_db_id
-                         else: self.log_message.emit(f"Erro Integridade Evento {event_id_lenex}: {ie}"); conn.rollback(); return False
-                    except sqlite3.Error as e: self.log_message.emit(f"Erro DB Evento {event_id_lenex}: {e}"); conn.rollback(); return False
-                    if event_db_id is None: continue
-                    agegroups_tag = event_tag.find('AGEGROUPS')
-                    if agegroups_tag is not None:
-                        for agegroup_tag in agegroups_tag.findall('AGEGROUP'):
-                            ag_id_lenex = agegroup_tag.get('agegroupid'); ag_min_str = agegroup_tag.get('agemin'); ag_max_str = agegroup_tag.get('agemax')
-                            if not ag_id_lenex: continue
-                            try: ag_min = int(ag_min_str) if ag_min_str and ag_min_str != '-1' else None; ag_max = int(ag_max_str) if ag_max_str and ag_max_str != '-1' else None
-                            except ValueError: ag_min = None; ag_max = None
-                            agegroup_db_id = None
-                            try:
-                                cursor.execute('''INSERT INTO AgeGroup (event_db_id, agegroup_id_lenex, age_min, age_max) VALUES (?, ?, ?, ?)''', (event_db_id, ag_id_lenex, ag_min, ag_max))
-                                agegroup_db_id = cursor.lastrowid; agegroup_map[(event_db_id, ag_id_lenex)] = agegroup_db_id
-                            except sqlite3.IntegrityError as ie:
-                                if "UNIQUE constraint failed: AgeGroup.event_db_id, AgeGroup.agegroup_id_lenex" in str(ie):
-                                     cursor.execute("SELECT agegroup_db_id FROM AgeGroup WHERE event_db_id = ? AND agegroup_id_lenex = ?", (event_db_id, ag_id_lenex))
-                                     existing = cursor.fetchone(); agegroup_db_id = existing[0] if existing else None; agegroup_map[(event_db_id, ag_id_lenex)] = agegroup_db_id
-                                else: self.log_message.emit(f"Erro Integridade AgeGroup {ag_id_lenex}: {ie}"); conn.rollback(); return False
-                            except sqlite3.Error as e: self.log_message.emit(f"Erro DB AgeGroup {ag_id_lenex}: {e}"); conn.rollback(); return False
-        except Exception as e: self.log_message.emit(f"Erro proc Eventos/AgeGroups: {e}"); import traceback; self.log_message.emit(traceback.format_exc()); conn.rollback(); return False
-
-
-        # --- 3. Pré-processar Rankings (Sem alterações aqui) ---
-        # ... (código igual para rankings_lookup) ...
-        rankings_lookup = {}
-        try:
-            for event_id_lenex in event_map.keys():
-                event_tag = root.find(f".//EVENT[@eventid='{event_id_lenex}']")
-                if event_tag is None: continue
-                for agegroup_tag in event_tag.findall('.//AGEGROUP'):
-                    ag_id_lenex = agegroup_tag.get('agegroupid')
-                    if not ag_id_lenex: continue
-                    for ranking_tag in agegroup_tag.findall('.//RANKING'):
-                        result_id_lenex = ranking_tag.get('resultid'); place_str = ranking_tag.get('place')
-                        if result_id_lenex and place_str:
-                            try: place = int(place_str)
-                            except ValueError: place = None
-                            if place is not None and place > 0: rankings_lookup[result_id_lenex] = {'place': place, 'ag_id': ag_id_lenex, 'event_id': event_id_lenex}
-        except Exception as e: self.log_message.emit(f"Erro pré-proc rankings: {e}"); conn.rollback(); return False
-
-
-        # --- 4. Processar Atletas, Links e Coletar Resultados (Sem alterações aqui) ---
-        # ... (código igual para athletes_master_to_insert, athlete_links_to_insert, etc.) ...
-        athletes_master_to_insert = []; athlete_links_to_insert = []; results_cm_temp_data = []
-        splits_cm_to_insert = []; target_athlete_licenses = set(); all_results_for_top3 = defaultdict(list)
         try:
-            for club_tag in root.findall('.//CLUB'):
-                club_name = club_tag.get('name'); is_target_club = (club_name == self.target_club_name) # <<< USA self.target_club_name
-                athletes_tag = club_tag.find('ATHLETES')
-                if athletes_tag is None: continue
-                for athlete_tag in athletes_tag.findall('ATHLETE'):
-                    athlete_id_lenex = athlete_tag.get('athleteid'); license_id = athlete_tag.get('license')
-                    if not athlete_id_lenex or not license_id: continue
-                    if is_target_club:
-                        target_athlete_licenses.add(license_id); first = athlete_tag.get('firstname', ''); last = athlete_tag.get('lastname', '')
-                        birth = athlete_tag.get('birthdate'); gender = athlete_tag.get('gender')
-                        athletes_master_to_insert.append((license_id, first, last, birth, gender))
-                        athlete_links_to_insert.append((license_id, meet_id_db, athlete_id_lenex))
-                    results_tag = athlete_tag.find('RESULTS')
-                    if results_tag is not None:
-                        for result_tag in results_tag.findall('RESULT'):
-                            result_id_lenex = result_tag.get('resultid'); event_id_lenex_res = result_tag.get('eventid')
-                            if not result_id_lenex or not event_id_lenex_res or event_id_lenex_res not in event_map: continue
-                            swimtime = result_tag.get('swimtime'); status = result_tag.get('status')
-                            ranking_info = rankings_lookup.get(result_id_lenex)
-                            place = ranking_info['place'] if ranking_info else None; ag_id_lenex = ranking_info['ag_id'] if ranking_info else None
-                            if ranking_info and ranking_info['event_id'] != event_id_lenex_res: pass # Aviso opcional
-                            if swimtime and place and place > 0 and (status is None or status == 'OFFICIAL'):
-                                category_key = (event_id_lenex_res, ag_id_lenex); all_results_for_top3[category_key].append({'place': place, 'time': swimtime})
-                            if is_target_club:
-                                points_str = result_tag.get('points'); heatid = result_tag.get('heatid'); lane_str = result_tag.get('lane'); reaction = result_tag.get('reactiontime')
-                                comment = result_tag.get('comment'); entrytime = result_tag.get('entrytime'); entrycourse = result_tag.get('entrycourse')
-                                try: points = int(points_str) if points_str else None; lane = int(lane_str) if lane_str else None
-                                except ValueError: points = None; lane = None
-                                results_cm_temp_data.append({'result_id': result_id_lenex, 'athlete_id_lenex': athlete_id_lenex, 'event_id_lenex': event_id_lenex_res, 'meet_id': meet_id_db, 'swimtime': swimtime, 'status': status, 'points': points, 'heatid': heatid, 'lane': lane, 'reaction': reaction, 'comment': comment, 'entrytime': entrytime, 'entrycourse': entrycourse, 'place': place, 'ag_id_lenex': ag_id_lenex})
-                                splits_tag = result_tag.find('SPLITS')
-                                if splits_tag is not None:
-                                    for split_tag in splits_tag.findall('SPLIT'):
-                                        split_dist_str = split_tag.get('distance'); split_time = split_tag.get('swimtime')
-                                        try: split_dist = int(split_dist_str) if split_dist_str else None
-                                        except ValueError: split_dist = None
-                                        if result_id_lenex and split_dist is not None and split_time is not None: splits_cm_to_insert.append((result_id_lenex, split_dist, split_time))
-        except Exception as e: self.log_message.emit(f"Erro proc Atletas/Resultados: {e}"); import traceback; self.log_message.emit(traceback.format_exc()); conn.rollback(); return False
-
-
-        # --- 5. Calcular e Preparar Top 3 (Sem alterações aqui) ---
-        # ... (código igual para top3_to_insert) ...
-        top3_to_insert = []
-        try:
-            for (event_id_lenex, ag_id_lenex), results_list in all_results_for_top3.items():
-                event_db_id = event_map.get(event_id_lenex)
-                if event_db_id is None: continue
-                agegroup_db_id = None
-                if ag_id_lenex is not None: agegroup_db_id = agegroup_map.get((event_db_id, ag_id_lenex))
-                sorted_results = sorted(results_list, key=lambda x: (x['place'], x['time'])); places_added = set()
-                for res in sorted_results:
-                    if len(places_added) >= 3: break
-                    if res['place'] in [1, 2, 3] and res['place'] not in places_added:
-                         top3_to_insert.append((meet_id_db, event_db_id, agegroup_db_id, res['place'], res['time'])); places_added.add(res['place'])
-        except Exception as e: self.log_message.emit(f"Erro cálculo Top 3: {e}"); conn.rollback(); return False
-
-
-        # --- 6. Inserir Dados (Sem alterações aqui, exceto logs) ---
-        # ... (código igual para inserções finais) ...
+            for ev in parsed['events']:
+                cursor.execute('''INSERT INTO Event (meet_id, event_id_lenex, number, gender, distance, stroke, relay_count, round, daytime, prova_desc) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                               (meet_id_db, ev['event_id_lenex'], ev['number'], ev['gender'], ev['distance'], ev['stroke'], ev['relay_count'], ev['round'], ev['daytime'], ev['prova_desc']))
+                event_db_id = cursor.lastrowid
+                event_map[ev['event_id_lenex']] = event_db_id
+                for ag_id_lenex, ag_min, ag_max in ev['agegroups']:
+                    if (event_db_id, ag_id_lenex) in agegroup_map: continue
+                    cursor.execute('''INSERT INTO AgeGroup (event_db_id, agegroup_id_lenex, age_min, age_max) VALUES (?, ?, ?, ?)''', (event_db_id, ag_id_lenex, ag_min, ag_max))
+                    agegroup_map[(event_db_id, ag_id_lenex)] = cursor.lastrowid
+        except sqlite3.Error as e:
+            self.log_message.emit(f"Erro DB Eventos/AgeGroups: {e}"); self._finish_file(conn, False); return False
+
+        # --- 3. Atletas, Links, Resultados, Parciais e Top 3 ---
         try:
-            if athletes_master_to_insert: cursor.executemany('INSERT OR IGNORE INTO AthleteMaster (license, first_name, last_name, birthdate, gender) VALUES (?, ?, ?, ?, ?)', athletes_master_to_insert)
-            if athlete_links_to_insert: cursor.executemany('INSERT OR IGNORE INTO AthleteMeetLink (license, meet_id, athlete_id_lenex) VALUES (?, ?, ?)', athlete_links_to_insert)
-            link_id_lookup = {}
-            if target_athlete_licenses:
-                 cm_athlete_ids_lenex = {link[2] for link in athlete_links_to_insert}
-                 if cm_athlete_ids_lenex:
-                     placeholders = ', '.join('?' * len(cm_athlete_ids_lenex)); query = f"SELECT link_id, athlete_id_lenex FROM AthleteMeetLink WHERE meet_id = ? AND athlete_id_lenex IN ({placeholders})"
-                     params = [meet_id_db] + list(cm_athlete_ids_lenex); cursor.execute(query, params)
-                     for link_id, ath_id_lenex in cursor.fetchall(): link_id_lookup[(meet_id_db, ath_id_lenex)] = link_id
-            results_cm_to_insert = []; missing_links = 0; missing_event_db_ids = 0; missing_ag_db_ids = 0
-            for temp_res in results_cm_temp_data:
-                lookup_key_link = (temp_res['meet_id'], temp_res['athlete_id_lenex']); link_id = link_id_lookup.get(lookup_key_link)
-                if not link_id: missing_links += 1; continue
-                event_db_id = event_map.get(temp_res['event_id_lenex'])
-                if not event_db_id: missing_event_db_ids += 1; continue
-                agegroup_db_id = None
-                if temp_res['ag_id_lenex'] is not None:
-                    lookup_key_ag = (event_db_id, temp_res['ag_id_lenex']); agegroup_db_id = agegroup_map.get(lookup_key_ag)
-                    if agegroup_db_id is None: missing_ag_db_ids += 1
-                results_cm_to_insert.append((temp_res['result_id'], link_id, event_db_id, temp_res['meet_id'], temp_res['swimtime'], temp_res['status'], temp_res['points'], temp_res['heatid'], temp_res['lane'], temp_res['reaction'], temp_res['comment'], temp_res['entrytime'], temp_res['entrycourse'], temp_res['place'], agegroup_db_id))
-            # Logs de aviso (opcional)
-            # if missing_links > 0: self.log_message.emit(f"AVISO: {missing_links} resultados CM ignorados por falta de link_id.")
-            # if missing_event_db_ids > 0: self.log_message.emit(f"AVISO: {missing_event_db_ids} resultados CM ignorados por falta de event_db_id.")
-            # if missing_ag_db_ids > 0: self.log_message.emit(f"AVISO: {missing_ag_db_ids} resultados CM terão agegroup_db_id=NULL.")
-            if results_cm_to_insert: cursor.executemany('''INSERT OR IGNORE INTO ResultCM (result_id_lenex, link_id, event_db_id, meet_id, swim_time, status, points, heat_id, lane, reaction_time, comment, entry_time, entry_course, place, agegroup_db_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', results_cm_to_insert)
-            if splits_cm_to_insert: cursor.executemany('INSERT OR IGNORE INTO SplitCM (result_id_lenex, distance, swim_time) VALUES (?, ?, ?)', splits_cm_to_insert)
-            if top3_to_insert: cursor.executemany('''INSERT OR IGNORE INTO Top3Result (meet_id, event_db_id, agegroup_db_id, place, swim_time) VALUES (?, ?, ?, ?, ?)''', top3_to_insert)
-
-            conn.commit()
-            end_time = time.time()
-            self.log_message.emit(f"Arquivo '{os.path.basename(xml_file_path)}' processado com sucesso em {end_time - start_time:.2f} segundos.")
+            link_id_lookup = self._store_athletes_and_links(parsed, meet_id_db, cursor)
+            results_cm_to_insert = self._build_result_rows(parsed, meet_id_db, event_map, agegroup_map, link_id_lookup)
+            top3_to_insert = self._build_top3_rows(parsed, meet_id_db, event_map, agegroup_map)
+
+            if results_cm_to_insert: cursor.executemany(f"INSERT OR IGNORE INTO ResultCM ({', '.join(RESULT_COLUMNS)}) VALUES ({', '.join('?' * len(RESULT_COLUMNS))})", results_cm_to_insert)
+            if parsed['splits'] and self.packed_splits: cursor.executemany('INSERT OR IGNORE INTO SplitPacked (result_id_lenex, split_count, distances, times_cs) VALUES (?, ?, ?, ?)', pack_split_rows(parsed['splits']))
+            elif parsed['splits']: cursor.executemany('INSERT OR IGNORE INTO SplitCM (result_id_lenex, distance, swim_time, swim_time_cs) VALUES (?, ?, ?, ?)', parsed['splits'])
+            if top3_to_insert: cursor.executemany('''INSERT OR IGNORE INTO Top3Result (meet_id, event_db_id, agegroup_db_id, place, swim_time, swim_time_cs) VALUES (?, ?, ?, ?, ?, ?)''', top3_to_insert)
+            refresh_result_flat(conn, meet_id_db) # Linhas desnormalizadas da competição (mesma transação)
+            refresh_best_times(conn, meet_id_db) # Melhores marcas só dos atletas desta competição
+
+            self._finish_file(conn, True)
             return True
 
         except sqlite3.Error as e:
-            self.log_message.emit(f"Erro CRÍTICO durante inserção final para '{os.path.basename(xml_file_path)}': {e}")
-            conn.rollback(); return False
+            self.log_message.emit(f"Erro CRÍTICO durante inserção final para '{meet['name']}': {e}")
+            self._finish_file(conn, False); return False
         except Exception as e:
-             self.log_message.emit(f"Erro inesperado durante inserção final para '{os.path.basename(xml_file_path)}': {e}")
-             import traceback; self.log_message.emit(traceback.format_exc()); conn.rollback(); return False
+             self.log_message.emit(f"Erro inesperado durante inserção final para '{meet['name']}': {e}")
+             import traceback; self.log_message.emit(traceback.format_exc()); self._finish_file(conn, False); return False
+
+    def _store_athletes_and_links(self, parsed, meet_id_db, cursor):
+        """Insere atletas e links do clube alvo (ignorando os já existentes). Retorna {athlete_id_lenex: link_id}."""
+        if parsed['athletes']: cursor.executemany('INSERT OR IGNORE INTO AthleteMaster (license, first_name, last_name, birthdate, birth_year, gender) VALUES (?, ?, ?, ?, ?, ?)', parsed['athletes'])
+        if parsed['links']: cursor.executemany('INSERT OR IGNORE INTO AthleteMeetLink (license, meet_id, athlete_id_lenex) VALUES (?, ?, ?)', [(license_id, meet_id_db, ath_id) for license_id, ath_id in parsed['links']])
+        link_id_lookup = {}
+        if parsed['links']:
+            cursor.execute("SELECT link_id, athlete_id_lenex FROM AthleteMeetLink WHERE meet_id = ?", (meet_id_db,))
+            for link_id, ath_id_lenex in cursor.fetchall(): link_id_lookup[ath_id_lenex] = link_id
+        return link_id_lookup
+
+    def _build_result_rows(self, parsed, meet_id_db, event_map, agegroup_map, link_id_lookup):
+        """Linhas de ResultCM (na ordem das colunas de RESULT_COLUMNS) com os IDs já traduzidos para o banco."""
+        rows = []
+        for temp_res in parsed['results']:
+            link_id = link_id_lookup.get(temp_res['athlete_id_lenex'])
+            if not link_id: continue
+            event_db_id = event_map.get(temp_res['event_id_lenex'])
+            if not event_db_id: continue
+            agegroup_db_id = agegroup_map.get((event_db_id, temp_res['ag_id_lenex'])) if temp_res['ag_id_lenex'] is not None else None
+            rows.append((temp_res['result_id'], link_id, event_db_id, meet_id_db, temp_res['swimtime'], temp_res['status'], temp_res['points'], temp_res['heatid'], temp_res['lane'], temp_res['reaction'], temp_res['comment'], temp_res['entrytime'], temp_res['entrycourse'], temp_res['place'], agegroup_db_id, temp_res['swimtime_cs'], temp_res['entrytime_cs']))
+        return rows
+
+    def _build_top3_rows(self, parsed, meet_id_db, event_map, agegroup_map):
+        """Linhas de Top3Result (meet_id, event_db_id, agegroup_db_id, place, swim_time, swim_time_cs)."""
+        rows = []
+        for event_id_lenex, ag_id_lenex, place, swim_time, swim_time_cs in parsed['top3']:
+            event_db_id = event_map.get(event_id_lenex)
+            if event_db_id is None: continue
+            agegroup_db_id = agegroup_map.get((event_db_id, ag_id_lenex)) if ag_id_lenex is not None else None
+            rows.append((meet_id_db, event_db_id, agegroup_db_id, place, swim_time, swim_time_cs))
+        return rows
+
+    def _merge_parsed_meet(self, parsed, conn, meet_id_db, meet_name):
+        """Modo merge: compara o arquivo com as linhas gravadas da competição e aplica só as diferenças.
+
+        Eventos e categorias novos são inseridos (faixas etárias alteradas são atualizadas); ResultCM,
+        SplitCM e Top3Result são comparados linha a linha (inserir/atualizar/remover). Tudo em uma transação.
+        Com packed_splits, as parciais são comparadas por resultado em SplitPacked; parciais da competição que
+        estejam no outro formato são convertidas para o formato atual.
+        Os dados da própria competição (Meet) não são tocados, preservando edições feitas na aba de edição; só o
+        AGEDATE é preenchido se ainda estiver vazio (competições importadas antes dessa coluna existir).
+        """
+        self.log_message.emit(f"Competição '{meet_name}' já existe. Mesclando alterações do arquivo (modo merge)...")
+        cursor = conn.cursor()
+        counts = defaultdict(int)
+        try:
+            meet = parsed['meet']
+            if meet.get('age_date'):
+                cursor.execute("UPDATE Meet SET age_date = ?, age_date_type = ? WHERE meet_id = ? AND age_date IS NULL", (meet['age_date'], meet['age_date_type'], meet_id_db))
+            # --- Eventos e AgeGroups ---
+            cursor.execute("SELECT event_id_lenex, event_db_id FROM Event WHERE meet_id = ?", (meet_id_db,))
+            event_map = dict(cursor.fetchall())
+            cursor.execute("""SELECT ag.event_db_id, ag.agegroup_id_lenex, ag.agegroup_db_id, ag.age_min, ag.age_max
+                              FROM AgeGroup ag JOIN Event e ON e.event_db_id = ag.event_db_id WHERE e.meet_id = ?""", (meet_id_db,))
+            stored_agegroups = {(row[0], row[1]): row[2:] for row in cursor.fetchall()}
+            agegroup_map = {key: value[0] for key, value in stored_agegroups.items()}
+            file_agegroup_keys = set()
+            for ev in parsed['events']:
+                event_db_id = event_map.get(ev['event_id_lenex'])
+                if event_db_id is None:
+                    cursor.execute('''INSERT INTO Event (meet_id, event_id_lenex, number, gender, distance, stroke, relay_count, round, daytime, prova_desc) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                                   (meet_id_db, ev['event_id_lenex'], ev['number'], ev['gender'], ev['distance'], ev['stroke'], ev['relay_count'], ev['round'], ev['daytime'], ev['prova_desc']))
+                    event_db_id = event_map[ev['event_id_lenex']] = cursor.lastrowid; counts['Event+'] += 1
+                for ag_id_lenex, ag_min, ag_max in ev['agegroups']:
+                    key = (event_db_id, ag_id_lenex); file_agegroup_keys.add(key)
+                    stored = stored_agegroups.get(key)
+                    if stored is None:
+                        cursor.execute('''INSERT INTO AgeGroup (event_db_id, agegroup_id_lenex, age_min, age_max) VALUES (?, ?, ?, ?)''', (event_db_id, ag_id_lenex, ag_min, ag_max))
+                        agegroup_map[key] = cursor.lastrowid; stored_agegroups[key] = (cursor.lastrowid, ag_min, ag_max); counts['AgeGroup+'] += 1
+                    elif (stored[1], stored[2]) != (ag_min, ag_max):
+                        cursor.execute("UPDATE AgeGroup SET age_min = ?, age_max = ? WHERE agegroup_db_id = ?", (ag_min, ag_max, stored[0])); counts['AgeGroup~'] += 1
+
+            # --- Atletas/links novos e linhas calculadas a partir do arquivo ---
+            link_id_lookup = self._store_athletes_and_links(parsed, meet_id_db, cursor)
+            new_results = {row[0]: row for row in self._build_result_rows(parsed, meet_id_db, event_map, agegroup_map, link_id_lookup)}
+            new_splits = {(r_id, dist): (t, cs) for r_id, dist, t, cs in parsed['splits'] if r_id in new_results}
+            new_top3 = {row[1:4]: row[4:] for row in self._build_top3_rows(parsed, meet_id_db, event_map, agegroup_map)}
+
+            # --- ResultCM ---
+            cursor.execute(f"SELECT {', '.join(RESULT_COLUMNS)} FROM ResultCM WHERE meet_id = ?", (meet_id_db,))
+            stored_results = {row[0]: tuple(row) for row in cursor.fetchall()}
+            removed_results = [r_id for r_id in stored_results if r_id not in new_results]
+            results_to_insert = [row for r_id, row in new_results.items() if r_id not in stored_results]
+            results_to_update = [row[1:] + (r_id,) for r_id, row in new_results.items() if r_id in stored_results and stored_results[r_id] != row]
+
+            # --- SplitCM ou SplitPacked (das provas da competição); o formato que não está em uso é esvaziado ---
+            other_split_table = 'SplitCM' if self.packed_splits else 'SplitPacked'
+            cursor.execute(f"SELECT t.result_id_lenex FROM {other_split_table} t JOIN ResultCM r ON r.result_id_lenex = t.result_id_lenex WHERE r.meet_id = ?", (meet_id_db,))
+            converted_results = sorted(set(row[0] for row in cursor.fetchall()))
+            if self.packed_splits:
+                new_splits = {row[0]: row[1:] for row in pack_split_rows([(r_id, dist) + value for (r_id, dist), value in new_splits.items()])}
+                cursor.execute("SELECT p.result_id_lenex, p.split_count, p.distances, p.times_cs FROM SplitPacked p JOIN ResultCM r ON r.result_id_lenex = p.result_id_lenex WHERE r.meet_id = ?", (meet_id_db,))
+                stored_splits = {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+                splits_to_delete = [(r_id,) for r_id in stored_splits if r_id not in new_splits]
+                splits_to_insert = [(r_id,) + value for r_id, value in new_splits.items() if r_id not in stored_splits]
+                splits_to_update = [value + (r_id,) for r_id, value in new_splits.items() if r_id in stored_splits and stored_splits[r_id] != value]
+            else:
+                cursor.execute("SELECT s.result_id_lenex, s.distance, s.swim_time, s.swim_time_cs FROM SplitCM s JOIN ResultCM r ON r.result_id_lenex = s.result_id_lenex WHERE r.meet_id = ?", (meet_id_db,))
+                stored_splits = {(r_id, dist): (t, cs) for r_id, dist, t, cs in cursor.fetchall()}
+                splits_to_delete = [key for key in stored_splits if key not in new_splits]
+                splits_to_insert = [key + value for key, value in new_splits.items() if key not in stored_splits]
+                splits_to_update = [value + key for key, value in new_splits.items() if key in stored_splits and stored_splits[key] != value]
+
+            # --- Top3Result ---
+            cursor.execute("SELECT top3_id, event_db_id, agegroup_db_id, place, swim_time, swim_time_cs FROM Top3Result WHERE meet_id = ?", (meet_id_db,))
+            stored_top3 = {tuple(row[1:4]): (row[0], tuple(row[4:])) for row in cursor.fetchall()}
+            top3_to_delete = [(top3_id,) for key, (top3_id, _) in stored_top3.items() if key not in new_top3]
+            top3_to_insert = [(meet_id_db,) + key + value for key, value in new_top3.items() if key not in stored_top3]
+            top3_to_update = [value + (stored_top3[key][0],) for key, value in new_top3.items() if key in stored_top3 and stored_top3[key][1] != value]
+
+            # --- Aplica as diferenças (parciais removidas antes dos resultados, por causa da FK) ---
+            if converted_results: cursor.executemany(f"DELETE FROM {other_split_table} WHERE result_id_lenex = ?", [(r_id,) for r_id in converted_results])
+            if splits_to_delete and self.packed_splits: cursor.executemany("DELETE FROM SplitPacked WHERE result_id_lenex = ?", splits_to_delete)
+            elif splits_to_delete: cursor.executemany("DELETE FROM SplitCM WHERE result_id_lenex = ? AND distance = ?", splits_to_delete)
+            if removed_results: cursor.executemany("DELETE FROM ResultCM WHERE result_id_lenex = ?", [(r_id,) for r_id in removed_results])
+            if results_to_insert: cursor.executemany(f"INSERT OR IGNORE INTO ResultCM ({', '.join(RESULT_COLUMNS)}) VALUES ({', '.join('?' * len(RESULT_COLUMNS))})", results_to_insert)
+            if results_to_update: cursor.executemany(f"UPDATE ResultCM SET {', '.join(c + ' = ?' for c in RESULT_COLUMNS[1:])} WHERE result_id_lenex = ?", results_to_update)
+            if self.packed_splits:
+                if splits_to_insert: cursor.executemany("INSERT INTO SplitPacked (result_id_lenex, split_count, distances, times_cs) VALUES (?, ?, ?, ?)", splits_to_insert)
+                if splits_to_update: cursor.executemany("UPDATE SplitPacked SET split_count = ?, distances = ?, times_cs = ? WHERE result_id_lenex = ?", splits_to_update)
+            else:
+                if splits_to_insert: cursor.executemany("INSERT INTO SplitCM (result_id_lenex, distance, swim_time, swim_time_cs) VALUES (?, ?, ?, ?)", splits_to_insert)
+                if splits_to_update: cursor.executemany("UPDATE SplitCM SET swim_time = ?, swim_time_cs = ? WHERE result_id_lenex = ? AND distance = ?", splits_to_update)
+            if top3_to_delete: cursor.executemany("DELETE FROM Top3Result WHERE top3_id = ?", top3_to_delete)
+            if top3_to_update: cursor.executemany("UPDATE Top3Result SET swim_time = ?, swim_time_cs = ? WHERE top3_id = ?", top3_to_update)
+            if top3_to_insert: cursor.executemany("INSERT INTO Top3Result (meet_id, event_db_id, agegroup_db_id, place, swim_time, swim_time_cs) VALUES (?, ?, ?, ?, ?, ?)", top3_to_insert)
+
+            # Categorias que sumiram do arquivo e não são mais referenciadas
+            stale_agegroups = [(value[0],) for key, value in stored_agegroups.items() if key not in file_agegroup_keys]
+            if stale_agegroups:
+                cursor.executemany("""DELETE FROM AgeGroup WHERE agegroup_db_id = ?
+                                      AND NOT EXISTS (SELECT 1 FROM ResultCM WHERE agegroup_db_id = AgeGroup.agegroup_db_id)
+                                      AND NOT EXISTS (SELECT 1 FROM Top3Result WHERE agegroup_db_id = AgeGroup.agegroup_db_id)""", stale_agegroups)
+                counts['AgeGroup-'] += cursor.rowcount if cursor.rowcount > 0 else 0
+            refresh_result_flat(conn, meet_id_db) # Refaz as linhas desnormalizadas da competição
+            refresh_best_times(conn, meet_id_db)
+
+            self._finish_file(conn, True)
+        except sqlite3.Error as e:
+            self.log_message.emit(f"Erro CRÍTICO durante mesclagem de '{meet_name}': {e}")
+            self._finish_file(conn, False); return False
+
+        summary = (f"Resultados +{len(results_to_insert)} ~{len(results_to_update)} -{len(removed_results)}, "
+                   f"Parciais{' (por resultado)' if self.packed_splits else ''} +{len(splits_to_insert)} ~{len(splits_to_update)} -{len(splits_to_delete)}"
+                   f"{f' (convertidas: {len(converted_results)})' if converted_results else ''}, "
+                   f"Top3 +{len(top3_to_insert)} ~{len(top3_to_update)} -{len(top3_to_delete)}, "
+                   f"Eventos +{counts['Event+']}, Categorias +{counts['AgeGroup+']} ~{counts['AgeGroup~']} -{counts['AgeGroup-']}")
+        changed = any((results_to_insert, results_to_update, removed_results, splits_to_insert, splits_to_update, splits_to_delete, converted_results,
+                       top3_to_insert, top3_to_update, top3_to_delete)) or any(counts.values())
+        self.log_message.emit(f"Mesclagem de '{meet_name}': {summary}." if changed else f"Mesclagem de '{meet_name}': nenhuma alteração encontrada.")
+        return True
@@ -0,0 +1,312 @@
+# NadosApp/core/migrations.py
+"""Migrações versionadas do schema do banco (controladas por PRAGMA user_version).
+
+Cada migração roda em sua própria transação e grava a nova versão no mesmo COMMIT, então um banco
+nunca fica "meio migrado". As migrações devem ser idempotentes (verificar se a coluna/índice já existe),
+pois bancos antigos podem ter recebido parte das alterações manualmente ou pelo setup inicial.
+Para adicionar uma alteração de schema: escreva a função e acrescente-a ao FINAL de MIGRATIONS.
+Migração publicada não muda: cada uma usa a sua própria cópia do DDL e do SQL de preenchimento (congelada
+na versão em que foi criada), nunca as constantes atuais de core.database, que acompanham o schema mais novo.
+"""
+import sqlite3
+
+BACKFILL_CHUNK_ROWS = 50000 # Linhas por UPDATE nos preenchimentos (permite reportar progresso)
+
+
+# --- Auxiliares ---
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def _column_exists(conn, table, column):
+    return column in [info[1] for info in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+def _add_column(conn, table, column, col_type):
+    """ALTER TABLE ADD COLUMN se a coluna ainda não existir. Retorna True se criou."""
+    if _column_exists(conn, table, column): return False
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}")
+    return True
+
+def _backfill(conn, table, set_clause, where_clause, report, label=None):
+    """UPDATE em blocos de rowid para tabelas grandes, reportando o andamento."""
+    max_rowid = conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0] or 0
+    for start in range(0, max_rowid + 1, BACKFILL_CHUNK_ROWS):
+        conn.execute(f"UPDATE {table} SET {set_clause} WHERE rowid >= ? AND rowid < ? AND ({where_clause})", (start, start + BACKFILL_CHUNK_ROWS))
+        report(f"{label or table}: {min(start + BACKFILL_CHUNK_ROWS, max_rowid)}/{max_rowid} linhas")
+
+
+# --- Migrações (na ordem) ---
+def _m001_meet_hostclub(conn, report):
+    _add_column(conn, 'Meet', 'hostclub', 'TEXT')
+
+_V2_IMPORT_MANIFEST_SQL = """
+    CREATE TABLE IF NOT EXISTS ImportManifest (
+        content_sha256 TEXT PRIMARY KEY, -- Hash do conteúdo do arquivo (.lef ou .lxf) como recebido
+        file_path TEXT,
+        file_size INTEGER,
+        file_mtime REAL,
+        lenex_meet_id TEXT, -- Competição contida no arquivo
+        imported_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )"""
+
+def _m002_import_manifest(conn, report):
+    conn.execute(_V2_IMPORT_MANIFEST_SQL)
+
+# (tabela, coluna nova, coluna de origem) - tempos LENEX 'HH:MM:SS.hh' em centésimos
+_V3_CENTISECOND_COLUMNS = (
+    ('ResultCM', 'swim_time_cs', 'swim_time'),
+    ('ResultCM', 'entry_time_cs', 'entry_time'),
+    ('SplitCM', 'swim_time_cs', 'swim_time'),
+    ('Top3Result', 'swim_time_cs', 'swim_time'),
+)
+_V3_CENTISECOND_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_resultcm_event_time_cs ON ResultCM (event_db_id, swim_time_cs)",
+    "CREATE INDEX IF NOT EXISTS idx_top3_event_time_cs ON Top3Result (event_db_id, swim_time_cs)",
+)
+
+def _v3_centiseconds_sql(column):
+    return (f"CASE WHEN {column} GLOB '[0-9][0-9]:[0-9][0-9]:[0-9][0-9].[0-9][0-9]' THEN "
+            f"CAST(SUBSTR({column}, 1, 2) AS INTEGER) * 360000 + CAST(SUBSTR({column}, 4, 2) AS INTEGER) * 6000 + "
+            f"CAST(SUBSTR({column}, 7, 2) AS INTEGER) * 100 + CAST(SUBSTR({column}, 10, 2) AS INTEGER) END")
+
+def _m003_centisecond_times(conn, report):
+    for table, column, source in _V3_CENTISECOND_COLUMNS:
+        if _add_column(conn, table, column, 'INTEGER'):
+            _backfill(conn, table, f"{column} = {_v3_centiseconds_sql(source)}", f"{source} IS NOT NULL", report, label=f"{table}.{column}")
+    for index_sql in _V3_CENTISECOND_INDEXES: conn.execute(index_sql)
+
+# Índices dos caminhos de consulta das abas (join ResultCM -> AthleteMeetLink -> AthleteMaster -> Meet -> Event).
+# Os UNIQUE já cobrem: AthleteMeetLink(license, meet_id), Event(meet_id, ...), Top3Result(meet_id, ...), SplitCM(result_id_lenex, ...).
+# As expressões dos índices de AthleteMaster precisam ser IDÊNTICAS às usadas nos filtros para o SQLite usá-las.
+RESULT_PATH_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_resultcm_link ON ResultCM (link_id)",                        # atleta -> resultados
+    "CREATE INDEX IF NOT EXISTS idx_resultcm_meet_event ON ResultCM (meet_id, event_db_id)",     # resumo da competição
+    "CREATE INDEX IF NOT EXISTS idx_event_prova_desc ON Event (prova_desc, event_db_id)",       # filtro/lista de provas (cobre DISTINCT)
+    "CREATE INDEX IF NOT EXISTS idx_meet_pool_size ON Meet (pool_size_desc, meet_id)",           # filtro de piscina
+    "CREATE INDEX IF NOT EXISTS idx_athlete_birth_year ON AthleteMaster (SUBSTR(birthdate, 1, 4))",                        # '= ?'
+    "CREATE INDEX IF NOT EXISTS idx_athlete_birth_year_int ON AthleteMaster (CAST(SUBSTR(birthdate, 1, 4) AS INTEGER))",   # faixas de ano
+    "CREATE INDEX IF NOT EXISTS idx_athlete_name ON AthleteMaster (last_name, first_name)",      # combos ordenados por nome
+)
+
+def _m004_result_path_indexes(conn, report):
+    for index_sql in RESULT_PATH_INDEXES: conn.execute(index_sql)
+    if conn.execute("SELECT 1 FROM ResultCM LIMIT 1").fetchone():
+        conn.execute("ANALYZE") # Estatísticas para o planejador escolher entre os índices (bancos vazios: após a 1ª importação)
+
+_V5_SPLIT_PACKED_SQL = """
+    CREATE TABLE IF NOT EXISTS SplitPacked (
+        result_id_lenex TEXT PRIMARY KEY,
+        split_count INTEGER NOT NULL,
+        distances BLOB NOT NULL, -- uint16 por parcial, em ordem crescente
+        times_cs BLOB NOT NULL, -- int32 por parcial: tempo ACUMULADO em centésimos (-1 = tempo inválido)
+        FOREIGN KEY (result_id_lenex) REFERENCES ResultCM (result_id_lenex)
+    )"""
+
+def _m005_split_packed(conn, report):
+    conn.execute(_V5_SPLIT_PACKED_SQL)
+
+# ResultFlat como criada na v6 (as colunas de idade vieram na v9)
+_V6_RESULT_FLAT_SQL = """
+    CREATE TABLE IF NOT EXISTS ResultFlat (
+        result_id_lenex TEXT PRIMARY KEY,
+        meet_id INTEGER NOT NULL, event_db_id INTEGER NOT NULL, agegroup_db_id INTEGER,
+        license TEXT NOT NULL,
+        athlete_name TEXT, -- first_name || ' ' || last_name
+        gender TEXT, -- Sexo do atleta (AthleteMaster.gender)
+        birth_year INTEGER, -- Ano de nascimento (4 primeiros caracteres de birthdate)
+        prova_desc TEXT, event_number INTEGER,
+        stroke TEXT, distance INTEGER, relay_count INTEGER, -- Código LENEX do estilo (FREE, BACK...), metros, nadadores
+        course TEXT, pool_size_desc TEXT, -- 'LCM'/'SCM' e a descrição da piscina
+        meet_name TEXT, meet_city TEXT, start_date TEXT,
+        swim_time TEXT, swim_time_cs INTEGER, place INTEGER, status TEXT, points INTEGER
+    )"""
+_V6_RESULT_FLAT_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_resultflat_license ON ResultFlat (license, start_date)",
+    "CREATE INDEX IF NOT EXISTS idx_resultflat_meet ON ResultFlat (meet_id, athlete_name, event_number)",
+    "CREATE INDEX IF NOT EXISTS idx_resultflat_prova ON ResultFlat (prova_desc, start_date)",
+    "CREATE INDEX IF NOT EXISTS idx_resultflat_event ON ResultFlat (event_db_id)",
+    "CREATE INDEX IF NOT EXISTS idx_resultflat_pool ON ResultFlat (pool_size_desc, start_date)",
+    "CREATE INDEX IF NOT EXISTS idx_resultflat_birth_year ON ResultFlat (birth_year)",
+)
+_V6_RESULT_FLAT_INSERT = """
+    INSERT INTO ResultFlat (result_id_lenex, meet_id, event_db_id, agegroup_db_id, license, athlete_name, gender, birth_year,
+                            prova_desc, event_number, stroke, distance, relay_count, course, pool_size_desc,
+                            meet_name, meet_city, start_date, swim_time, swim_time_cs, place, status, points)
+    SELECT r.result_id_lenex, r.meet_id, r.event_db_id, r.agegroup_db_id, am.license,
+           am.first_name || ' ' || am.last_name, am.gender,
+           CASE WHEN LENGTH(am.birthdate) >= 4 THEN CAST(SUBSTR(am.birthdate, 1, 4) AS INTEGER) END,
+           e.prova_desc, e.number, e.stroke, e.distance, e.relay_count, m.course, m.pool_size_desc,
+           m.name, m.city, m.start_date, r.swim_time, r.swim_time_cs, r.place, r.status, r.points
+    FROM ResultCM r
+    JOIN AthleteMeetLink aml ON r.link_id = aml.link_id
+    JOIN AthleteMaster am ON aml.license = am.license
+    JOIN Meet m ON r.meet_id = m.meet_id
+    JOIN Event e ON r.event_db_id = e.event_db_id
+"""
+
+def _v6_rebuild_result_flat(conn):
+    """Refaz ResultFlat inteira com as colunas da v6 (usada pela v6 e pela v8)."""
+    conn.execute("DELETE FROM ResultFlat"); conn.execute(_V6_RESULT_FLAT_INSERT)
+
+def _m006_result_flat(conn, report):
+    conn.execute(_V6_RESULT_FLAT_SQL)
+    for index_sql in _V6_RESULT_FLAT_INDEXES: conn.execute(index_sql)
+    report("ResultFlat: preenchendo a partir dos resultados existentes...")
+    _v6_rebuild_result_flat(conn)
+    if conn.execute("SELECT 1 FROM ResultFlat LIMIT 1").fetchone(): conn.execute("ANALYZE ResultFlat")
+
+_V7_PERSONAL_BEST_SQL = """
+    CREATE TABLE IF NOT EXISTS PersonalBest (
+        license TEXT NOT NULL, stroke TEXT NOT NULL, distance INTEGER NOT NULL, course TEXT NOT NULL,
+        swim_time_cs INTEGER NOT NULL, swim_time TEXT,
+        result_id_lenex TEXT, meet_id INTEGER, start_date TEXT, -- Resultado que deu a marca
+        athlete_name TEXT, gender TEXT, birth_year INTEGER, -- Copiados de ResultFlat (filtros dos rankings)
+        PRIMARY KEY (license, stroke, distance, course)
+    ) WITHOUT ROWID"""
+_V7_SEASON_BEST_SQL = """
+    CREATE TABLE IF NOT EXISTS SeasonBest (
+        license TEXT NOT NULL, season INTEGER NOT NULL, stroke TEXT NOT NULL, distance INTEGER NOT NULL, course TEXT NOT NULL,
+        swim_time_cs INTEGER NOT NULL, swim_time TEXT,
+        result_id_lenex TEXT, meet_id INTEGER, start_date TEXT,
+        athlete_name TEXT, gender TEXT, birth_year INTEGER,
+        PRIMARY KEY (license, season, stroke, distance, course)
+    ) WITHOUT ROWID"""
+_V7_BEST_TIMES_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_personalbest_event ON PersonalBest (stroke, distance, course, swim_time_cs)",
+    "CREATE INDEX IF NOT EXISTS idx_seasonbest_event ON SeasonBest (season, stroke, distance, course, swim_time_cs)",
+)
+_V7_BEST_TIME_COLUMNS = "license, stroke, distance, course, swim_time_cs, swim_time, result_id_lenex, meet_id, start_date, athlete_name, gender, birth_year"
+_V7_VALID_BEST_TIME = ("(status IS NULL OR status IN ('OK', 'OFFICIAL')) AND swim_time_cs IS NOT NULL AND stroke IS NOT NULL"
+                       " AND distance IS NOT NULL AND course IS NOT NULL AND COALESCE(relay_count, 1) <= 1")
+_V7_PERSONAL_BEST_INSERT = f"""
+    INSERT INTO PersonalBest ({_V7_BEST_TIME_COLUMNS})
+    SELECT {_V7_BEST_TIME_COLUMNS} FROM (
+        SELECT {_V7_BEST_TIME_COLUMNS},
+               ROW_NUMBER() OVER (PARTITION BY license, stroke, distance, course
+                                  ORDER BY swim_time_cs, start_date, result_id_lenex) AS position
+        FROM ResultFlat WHERE {_V7_VALID_BEST_TIME}
+    ) WHERE position = 1"""
+_V7_SEASON_BEST_INSERT = f"""
+    INSERT INTO SeasonBest (season, {_V7_BEST_TIME_COLUMNS})
+    SELECT season, {_V7_BEST_TIME_COLUMNS} FROM (
+        SELECT CAST(SUBSTR(start_date, 1, 4) AS INTEGER) AS season, {_V7_BEST_TIME_COLUMNS},
+               ROW_NUMBER() OVER (PARTITION BY license, CAST(SUBSTR(start_date, 1, 4) AS INTEGER), stroke, distance, course
+                                  ORDER BY swim_time_cs, start_date, result_id_lenex) AS position
+        FROM ResultFlat WHERE {_V7_VALID_BEST_TIME} AND LENGTH(start_date) >= 4
+    ) WHERE position = 1"""
+
+def _v7_rebuild_best_times(conn):
+    """Recalcula PersonalBest e SeasonBest de todos os atletas a partir de ResultFlat (usada pela v7 e pela v8)."""
+    conn.execute("DELETE FROM PersonalBest"); conn.execute(_V7_PERSONAL_BEST_INSERT)
+    conn.execute("DELETE FROM SeasonBest"); conn.execute(_V7_SEASON_BEST_INSERT)
+
+def _m007_best_times(conn, report):
+    conn.execute(_V7_PERSONAL_BEST_SQL); conn.execute(_V7_SEASON_BEST_SQL)
+    for index_sql in _V7_BEST_TIMES_INDEXES: conn.execute(index_sql)
+    report("Melhores marcas: calculando a partir dos resultados existentes...")
+    _v7_rebuild_best_times(conn)
+
+# Grafias alternativas de estilo -> código canônico, como na v8
+_V8_STROKE_ALIASES = {'LIVRE': 'FREE', 'CRAWL': 'FREE', 'FREESTYLE': 'FREE', 'COSTAS': 'BACK', 'DORSO': 'BACK', 'BACKSTROKE': 'BACK',
+                      'PEITO': 'BREAST', 'BREASTSTROKE': 'BREAST', 'BORBOLETA': 'FLY', 'BUTTERFLY': 'FLY', 'IM': 'MEDLEY'}
+_V8_EVENT_STROKE_INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_event_stroke ON Event (stroke, distance, relay_count)"
+
+def _v8_stroke_code_sql(column):
+    cases = ' '.join(f"WHEN '{alias}' THEN '{code}'" for alias, code in _V8_STROKE_ALIASES.items())
+    return f"CASE UPPER(TRIM({column})) {cases} WHEN '' THEN NULL ELSE UPPER(TRIM({column})) END"
+
+def _m008_event_stroke_codes(conn, report):
+    # Estilos fora do padrão (ex.: 'Livre', 'free') viram o código canônico antes de indexar
+    changed = conn.execute(f"UPDATE Event SET stroke = {_v8_stroke_code_sql('stroke')} WHERE stroke IS NOT {_v8_stroke_code_sql('stroke')}").rowcount
+    conn.execute(_V8_EVENT_STROKE_INDEX_SQL)
+    if changed:
+        report(f"Estilos: {changed} prova(s) corrigida(s); atualizando resultados e melhores marcas...")
+        _v6_rebuild_result_flat(conn); _v7_rebuild_best_times(conn)
+
+_V9_YEAR_GLOB = "'[0-9][0-9][0-9][0-9]*'"
+_V9_DATE_GLOB = "'[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'"
+_V9_BIRTH_YEAR_SQL = f"CASE WHEN birthdate GLOB {_V9_YEAR_GLOB} THEN CAST(SUBSTR(birthdate, 1, 4) AS INTEGER) END"
+_V9_ATHLETE_BIRTH_YEAR_INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_athlete_birth_year_col ON AthleteMaster (birth_year)"
+_V9_RESULT_FLAT_AGE_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_resultflat_prova_age ON ResultFlat (prova_desc, age_at_meet)",
+)
+# ResultFlat com as colunas da v9: birth_year vem de AthleteMaster.birth_year; idade pelo AGEDATE do LENEX
+_V9_RESULT_FLAT_INSERT = f"""
+    INSERT INTO ResultFlat (result_id_lenex, meet_id, event_db_id, agegroup_db_id, license, athlete_name, gender, birth_year,
+                            age_at_meet, age_min, age_max,
+                            prova_desc, event_number, stroke, distance, relay_count, course, pool_size_desc,
+                            meet_name, meet_city, start_date, swim_time, swim_time_cs, place, status, points)
+    SELECT r.result_id_lenex, r.meet_id, r.event_db_id, r.agegroup_db_id, am.license,
+           am.first_name || ' ' || am.last_name, am.gender, am.birth_year,
+           CASE
+               WHEN am.birth_year IS NULL THEN NULL
+               WHEN m.age_date_type = 'DATE' AND m.age_date GLOB {_V9_DATE_GLOB} AND am.birthdate GLOB {_V9_DATE_GLOB}
+                   THEN CAST(SUBSTR(m.age_date, 1, 4) AS INTEGER) - am.birth_year - (SUBSTR(m.age_date, 6, 5) < SUBSTR(am.birthdate, 6, 5))
+               WHEN m.age_date GLOB {_V9_YEAR_GLOB} THEN CAST(SUBSTR(m.age_date, 1, 4) AS INTEGER) - am.birth_year
+               WHEN m.start_date GLOB {_V9_YEAR_GLOB} THEN CAST(SUBSTR(m.start_date, 1, 4) AS INTEGER) - am.birth_year
+           END, ag.age_min, ag.age_max,
+           e.prova_desc, e.number, e.stroke, e.distance, e.relay_count, m.course, m.pool_size_desc,
+           m.name, m.city, m.start_date, r.swim_time, r.swim_time_cs, r.place, r.status, r.points
+    FROM ResultCM r
+    JOIN AthleteMeetLink aml ON r.link_id = aml.link_id
+    JOIN AthleteMaster am ON aml.license = am.license
+    JOIN Meet m ON r.meet_id = m.meet_id
+    JOIN Event e ON r.event_db_id = e.event_db_id
+    LEFT JOIN AgeGroup ag ON r.agegroup_db_id = ag.agegroup_db_id
+"""
+
+def _m009_birth_year_and_age(conn, report):
+    if _add_column(conn, 'AthleteMaster', 'birth_year', 'INTEGER'):
+        _backfill(conn, 'AthleteMaster', f"birth_year = {_V9_BIRTH_YEAR_SQL}", "birthdate IS NOT NULL", report, label="AthleteMaster.birth_year")
+    _add_column(conn, 'Meet', 'age_date', 'TEXT'); _add_column(conn, 'Meet', 'age_date_type', 'TEXT')
+    conn.execute(_V9_ATHLETE_BIRTH_YEAR_INDEX_SQL)
+    # Filtros e combos usam AthleteMaster.birth_year; os índices de expressão sobre birthdate ficaram sem uso
+    conn.execute("DROP INDEX IF EXISTS idx_athlete_birth_year"); conn.execute("DROP INDEX IF EXISTS idx_athlete_birth_year_int")
+    for column in ('age_at_meet', 'age_min', 'age_max'): _add_column(conn, 'ResultFlat', column, 'INTEGER')
+    for index_sql in _V9_RESULT_FLAT_AGE_INDEXES: conn.execute(index_sql)
+    # Sempre refeita: birth_year passa a vir de AthleteMaster.birth_year e as colunas de idade precisam ser preenchidas
+    report("ResultFlat: calculando idade na competição e categoria...")
+    conn.execute("DELETE FROM ResultFlat"); conn.execute(_V9_RESULT_FLAT_INSERT)
+    if conn.execute("SELECT 1 FROM ResultFlat LIMIT 1").fetchone(): conn.execute("ANALYZE ResultFlat")
+
+MIGRATIONS = (
+    (1, "Coluna hostclub em Meet", _m001_meet_hostclub),
+    (2, "Tabela ImportManifest", _m002_import_manifest),
+    (3, "Tempos em centésimos (colunas *_cs e índices)", _m003_centisecond_times),
+    (4, "Índices dos joins de resultados", _m004_result_path_indexes),
+    (5, "Tabela SplitPacked (parciais compactadas)", _m005_split_packed),
+    (6, "Tabela ResultFlat (resultados desnormalizados)", _m006_result_flat),
+    (7, "Tabelas PersonalBest e SeasonBest (melhores marcas)", _m007_best_times),
+    (8, "Códigos canônicos de estilo e índice Event (stroke, distance, relay_count)", _m008_event_stroke_codes),
+    (9, "Ano de nascimento (INTEGER) e idade na competição", _m009_birth_year_and_age),
+)
+LATEST_SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def pending_migrations(conn):
+    current = get_schema_version(conn)
+    return [m for m in MIGRATIONS if m[0] > current]
+
+def apply_migrations(conn, progress_callback=None):
+    """Aplica as migrações pendentes em ordem, cada uma em uma transação.
+
+    `progress_callback(step, total, message)` é opcional (padrão: print). Levanta sqlite3.Error se uma
+    migração falhar; as migrações anteriores já confirmadas permanecem aplicadas.
+    """
+    pending = pending_migrations(conn)
+    if not pending: return 0
+    total = len(pending)
+    if progress_callback is None:
+        progress_callback = lambda step, total, message: print(f"Migração [{step}/{total}] {message}")
+    for step, (version, description, migrate) in enumerate(pending, start=1):
+        progress_callback(step - 1, total, f"v{version}: {description}...")
+        report = lambda message, step=step, version=version: progress_callback(step - 1, total, f"v{version}: {message}")
+        try:
+            conn.execute("BEGIN")
+            migrate(conn, report)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        progress_callback(step, total, f"v{version}: {description} - concluída.")
+    return total
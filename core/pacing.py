@@ -0,0 +1,114 @@
+# NadosApp/core/pacing.py
+"""Cálculo vetorizado de voltas e ritmo (parciais acumuladas -> tempos de volta -> estatísticas).
+
+Recebe TODAS as parciais de uma consulta como arrays e calcula, de uma vez para todos os resultados,
+os tempos de volta, média, desvio padrão (amostral), índice de queda (fade) e a flag de split negativo,
+usando offsets de grupo do NumPy em vez de um loop Python por resultado.
+
+Regras (as mesmas do cálculo que existia em cada aba):
+- As parciais são tempos ACUMULADOS, na ordem da distância; volta = parcial - parcial anterior (começando em 0).
+- Com tempo final e parciais, a última volta é (final - última parcial). Sem parciais, a única volta é o tempo final.
+- Voltas negativas (parciais inconsistentes) são descartadas; parciais/finais inválidos chegam como NaN.
+"""
+import numpy as np
+
+
+class PacingStats:
+    """Resultado de compute_pacing. Arrays indexados pela posição do resultado na consulta.
+
+    lap_times/lap_offsets: voltas de todos os resultados concatenadas; as do resultado i estão em
+    lap_times[lap_offsets[i]:lap_offsets[i + 1]].
+    mean, stdev: média e desvio padrão (ddof=1; 0.0 com uma volta; NaN sem voltas).
+    fade_index: (soma da 2ª metade das voltas / soma da 1ª metade) - 1 (volta do meio ignorada se ímpar;
+    NaN com menos de 2 voltas). Positivo = caiu de ritmo.
+    negative_split: True quando a 2ª metade foi mais rápida que a 1ª (fade_index < 0).
+    """
+    def __init__(self, lap_times, lap_offsets, mean, stdev, fade_index, negative_split):
+        self.lap_times = lap_times; self.lap_offsets = lap_offsets
+        self.mean = mean; self.stdev = stdev
+        self.fade_index = fade_index; self.negative_split = negative_split
+
+    def __len__(self):
+        return len(self.lap_offsets) - 1
+
+    def lap_count(self, i):
+        return int(self.lap_offsets[i + 1] - self.lap_offsets[i])
+
+    def laps(self, i):
+        """Lista (floats Python) com os tempos de volta do resultado i."""
+        return self.lap_times[self.lap_offsets[i]:self.lap_offsets[i + 1]].tolist()
+
+
+def format_lap_stat(value):
+    """Formata média/DP de volta como nas tabelas ('12.34'); 'N/A' quando não há voltas."""
+    return "N/A" if value is None or value != value else f"{value:.2f}"
+
+
+def compute_pacing(result_ids, final_times_sec, split_result_ids, split_times_sec):
+    """Calcula voltas e estatísticas de ritmo para todos os resultados de uma vez.
+
+    result_ids: id (result_id_lenex) de cada resultado, na ordem desejada da saída.
+    final_times_sec: tempo final de cada resultado em segundos (NaN = sem tempo), mesmo tamanho de result_ids.
+    split_result_ids, split_times_sec: linhas de SplitCM (id do resultado, tempo acumulado em segundos),
+    ordenadas por distância dentro de cada resultado (ORDER BY result_id_lenex, distance).
+    """
+    n_results = len(result_ids)
+    final_times = np.asarray(final_times_sec, dtype=np.float64).reshape(n_results)
+    split_times = np.asarray(split_times_sec, dtype=np.float64).reshape(len(split_result_ids))
+
+    # 1. Agrupa as parciais válidas por resultado (ordenação estável mantém a ordem por distância)
+    valid = ~np.isnan(split_times)
+    split_ids = [rid for rid, ok in zip(split_result_ids, valid.tolist()) if ok]
+    split_times = split_times[valid]
+    group_of_id = {}
+    split_group = np.fromiter((group_of_id.setdefault(rid, len(group_of_id)) for rid in split_ids), dtype=np.int64, count=len(split_ids))
+    order = np.argsort(split_group, kind='stable')
+    split_group = split_group[order]; split_times = split_times[order]
+    group_counts = np.bincount(split_group, minlength=len(group_of_id))
+    group_starts = np.concatenate(([0], np.cumsum(group_counts)[:-1])).astype(np.int64)
+
+    # 2. Voltas das parciais: diferença para a parcial anterior do mesmo grupo
+    previous = np.empty_like(split_times)
+    if len(split_times):
+        previous[1:] = split_times[:-1]; previous[group_starts[group_counts > 0]] = 0.0
+    split_laps = split_times - previous
+    group_last = split_times[group_starts + group_counts - 1] if len(split_times) else np.empty(0)
+
+    # 3. Expande por resultado (um mesmo id pode aparecer em mais de uma linha da consulta)
+    result_group = np.fromiter((group_of_id.get(rid, -1) for rid in result_ids), dtype=np.int64, count=n_results)
+    has_splits = result_group >= 0
+    n_split_laps = np.where(has_splits, group_counts[np.maximum(result_group, 0)] if len(group_counts) else 0, 0)
+    total_split_laps = int(n_split_laps.sum())
+    owner_splits = np.repeat(np.arange(n_results), n_split_laps)
+    within = np.arange(total_split_laps) - np.repeat(np.cumsum(n_split_laps) - n_split_laps, n_split_laps)
+    lap_values = split_laps[group_starts[result_group[owner_splits]] + within] if total_split_laps else np.empty(0)
+
+    # Última volta (final - última parcial) ou, sem parciais, o próprio tempo final
+    has_final = ~np.isnan(final_times)
+    last_split = np.zeros(n_results)
+    if has_splits.any(): last_split[has_splits] = group_last[result_group[has_splits]]
+    extra = has_final & (last_split >= 0)
+    extra_values = final_times - last_split
+    owner_extra = np.flatnonzero(extra)
+
+    owners = np.concatenate((owner_splits, owner_extra))
+    laps = np.concatenate((lap_values, extra_values[extra]))
+    order = np.argsort(owners, kind='stable') # Voltas das parciais antes da última volta
+    owners = owners[order]; laps = laps[order]
+    keep = laps >= 0
+    owners = owners[keep]; laps = laps[keep]
+
+    # 4. Estatísticas por resultado
+    counts = np.bincount(owners, minlength=n_results)
+    offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(owners, weights=laps, minlength=n_results) / counts
+        sq_dev = np.bincount(owners, weights=(laps - mean[owners]) ** 2, minlength=n_results)
+        stdev = np.where(counts >= 2, np.sqrt(sq_dev / (counts - 1)), np.where(counts == 1, 0.0, np.nan))
+        position = np.arange(len(laps)) - offsets[owners]
+        half = counts[owners] // 2
+        first_half = np.bincount(owners, weights=np.where(position < half, laps, 0.0), minlength=n_results)
+        second_half = np.bincount(owners, weights=np.where(position >= counts[owners] - half, laps, 0.0), minlength=n_results)
+        fade_index = np.where((counts >= 2) & (first_half > 0), second_half / first_half - 1.0, np.nan)
+    negative_split = fade_index < 0
+    return PacingStats(laps, offsets, mean, stdev, fade_index, negative_split)
@@ -0,0 +1,121 @@
+# NadosApp/core/plotting.py
+"""Sparklines (PNG) dos relatórios em PDF, com cache endereçado pelo conteúdo.
+
+Todas as exportações em PDF (Visualizar Dados, Resumo Competição, Relatório Atleta/Estilo) desenham o mesmo
+gráfico de voltas; aqui ele é gerado uma vez por conteúdo:
+
+    buf = sparkline_png_buffer(lap_times, width_px, height_px, line_width=1.5, mean_line_width=1.0)
+
+- Chave: voltas arredondadas em SPARKLINE_QUANTUM segundos + tamanho da imagem + espessuras das linhas.
+  O gráfico é desenhado a partir das voltas arredondadas, então a mesma chave sempre gera a mesma imagem.
+- Memória: LRU dos bytes PNG (SPARKLINE_MEMORY_ITEMS imagens), compartilhado pela sessão.
+- Disco (opcional, set_sparkline_disk_cache): <pasta>/<sha1 da chave>.png, reaproveitado entre execuções.
+- O desenho usa Figure + FigureCanvasAgg direto (sem pyplot nem troca de backend a cada imagem).
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    MATPLOTLIB_AVAILABLE = True
+except ImportError:
+    MATPLOTLIB_AVAILABLE = False
+    print("AVISO: Matplotlib não encontrado. Sparklines dos PDFs não estarão disponíveis.")
+
+SPARKLINE_QUANTUM = 0.01          # Resolução das voltas na chave (s); os tempos vêm em centésimos
+SPARKLINE_MEMORY_ITEMS = 4096     # Imagens mantidas em memória (~1-2 KB cada)
+SPARKLINE_CACHE_VERSION = 1       # Mude ao alterar o desenho: invalida os PNGs gravados em disco
+
+
+def sparkline_key(lap_times, width_px, height_px, line_width, mean_line_width):
+    """Chave de conteúdo: voltas quantizadas, tamanho e espessuras."""
+    laps = tuple(round(t / SPARKLINE_QUANTUM) for t in lap_times)
+    return (SPARKLINE_CACHE_VERSION, laps, int(width_px), int(height_px), float(line_width), float(mean_line_width))
+
+
+def render_sparkline_png(lap_times, width_px, height_px, line_width=1.5, mean_line_width=1.0):
+    """Desenha o sparkline (linha azul das voltas + média tracejada em vermelho) e retorna os bytes PNG."""
+    fig = Figure(figsize=(width_px / 72, height_px / 72), dpi=72); FigureCanvasAgg(fig)
+    fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
+    ax = fig.add_subplot()
+    ax.plot(range(len(lap_times)), lap_times, color='blue', linewidth=line_width)
+    ax.axhline(sum(lap_times) / len(lap_times), color='red', linestyle='--', linewidth=mean_line_width)
+    ax.axis('off')
+    buf = io.BytesIO(); fig.savefig(buf, format='png', transparent=True)
+    return buf.getvalue()
+
+
+class SparklineCache:
+    """LRU em memória de PNGs de sparkline, com camada opcional em disco."""
+    def __init__(self, max_items=SPARKLINE_MEMORY_ITEMS, disk_dir=None):
+        self.max_items = max_items; self.disk_dir = disk_dir
+        self._entries = OrderedDict() # chave -> bytes PNG
+        self._lock = threading.Lock() # Os PDFs do relatório do atleta são gerados em QThread
+        self.hits = 0; self.disk_hits = 0; self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, hashlib.sha1(repr(key).encode('utf-8')).hexdigest() + '.png')
+
+    def _read_disk(self, key):
+        if not self.disk_dir: return None
+        try:
+            with open(self._disk_path(key), 'rb') as f: return f.read() or None
+        except OSError: return None
+
+    def _write_disk(self, key, png):
+        if not self.disk_dir: return
+        path = self._disk_path(key); tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            with open(tmp_path, 'wb') as f: f.write(png)
+            os.replace(tmp_path, path) # Atômico: outra execução nunca lê um PNG pela metade
+        except OSError as e:
+            print(f"Aviso: não foi possível gravar o sparkline em cache ({e}).")
+            try: os.remove(tmp_path)
+            except OSError: pass
+
+    def _remember(self, key, png):
+        with self._lock:
+            self._entries[key] = png; self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items: self._entries.popitem(last=False)
+
+    def get_png(self, lap_times, width_px, height_px, line_width=1.5, mean_line_width=1.0):
+        """Bytes PNG do sparkline: memória -> disco -> desenho (guardado nas duas camadas)."""
+        key = sparkline_key(lap_times, width_px, height_px, line_width, mean_line_width)
+        with self._lock:
+            png = self._entries.get(key)
+            if png is not None: self._entries.move_to_end(key); self.hits += 1; return png
+        png = self._read_disk(key)
+        if png is not None:
+            self.disk_hits += 1; self._remember(key, png); return png
+        self.misses += 1
+        png = render_sparkline_png([q * SPARKLINE_QUANTUM for q in key[1]], width_px, height_px, line_width, mean_line_width)
+        self._remember(key, png); self._write_disk(key, png)
+        return png
+
+    def clear(self):
+        with self._lock: self._entries.clear()
+
+
+_cache = SparklineCache()
+
+def get_sparkline_cache():
+    return _cache
+
+def set_sparkline_disk_cache(disk_dir):
+    """Ativa (pasta) ou desativa (None) a camada em disco do cache de sparklines."""
+    _cache.disk_dir = disk_dir
+
+def sparkline_png_buffer(lap_times, width_px=80, height_px=20, line_width=1.5, mean_line_width=1.0):
+    """BytesIO com o PNG do sparkline para o ReportLab (um buffer novo por chamada); None sem voltas/matplotlib."""
+    if not MATPLOTLIB_AVAILABLE or not lap_times: return None
+    try: return io.BytesIO(_cache.get_png(lap_times, width_px, height_px, line_width, mean_line_width))
+    except Exception as e:
+        print(f"Erro ao gerar sparkline para PDF: {e}"); return None
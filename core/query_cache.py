@@ -0,0 +1,116 @@
+# NadosApp/core/query_cache.py
+"""Cache dos resultados já processados das abas (relatório do atleta, resumo da competição, relatório do estilo).
+
+Voltar a um atleta/competição/estilo já visto reaproveita a lista processada em vez de refazer a consulta,
+as parciais e o Top 3. A chave é (tipo da consulta, banco, parâmetros, geração do banco):
+
+    data = get_or_compute('stroke_report', db_path, (estilo, prova, sexo, ano_ini, ano_fim), lambda: calcular(...))
+
+- A geração é um contador do processo incrementado por bump_generation() sempre que o banco muda
+  (ImportTab.import_success, update_meet_details); o cache é esvaziado nesse momento e um cálculo que
+  começou antes da mudança não é guardado.
+- LRU limitado pela memória estimada dos valores (QUERY_CACHE_MAX_BYTES); valores maiores que o limite não ficam.
+- None não é guardado (as abas devolvem None quando a busca falha).
+- Os valores são compartilhados entre as chamadas: quem recebe só pode ler (ou copiar) o que recebeu.
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+QUERY_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Memória estimada máxima dos resultados guardados
+SIZE_SAMPLE_ITEMS = 256                   # Listas maiores têm o tamanho estimado por amostra
+
+
+def estimate_size(value, _seen=None):
+    """Estimativa (bytes) da memória de um resultado: listas/tuplas/dicts percorridos, arrays pelo nbytes.
+    Objetos repetidos (ex.: as chaves dos dicts de cada linha) contam uma vez; listas grandes são amostradas."""
+    if _seen is None: _seen = set()
+    if id(value) in _seen: return 0
+    _seen.add(id(value))
+    if isinstance(value, np.ndarray): return sys.getsizeof(value) + (value.nbytes if value.base is not None else 0)
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        items = value if isinstance(value, (list, tuple)) else list(value)
+        if len(items) > SIZE_SAMPLE_ITEMS:
+            sample = sum(estimate_size(item, _seen) for item in items[:SIZE_SAMPLE_ITEMS])
+            size += sample * len(items) // SIZE_SAMPLE_ITEMS
+        else:
+            size += sum(estimate_size(item, _seen) for item in items)
+    return size
+
+
+class QueryCache:
+    """LRU de resultados processados, com chave (tipo, banco, parâmetros, geração) e limite de memória."""
+    def __init__(self, max_bytes=QUERY_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict() # chave -> (valor, bytes estimados)
+        self._bytes = 0
+        self._generation = 0
+        self._lock = threading.Lock() # Os workers de relatório consultam de outras threads
+        self.hits = 0; self.misses = 0
+
+    @property
+    def generation(self):
+        return self._generation
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def bump_generation(self):
+        """Marca o banco como alterado: descarta tudo e invalida os cálculos em andamento."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear(); self._bytes = 0
+            return self._generation
+
+    def get_or_compute(self, kind, db_path, params, compute):
+        """Valor guardado para (kind, db_path, params) na geração atual ou, se não houver, compute() (guardado se não for None)."""
+        db_key = os.path.abspath(db_path) if db_path else None
+        with self._lock:
+            generation = self._generation
+            key = (kind, db_key, params, generation)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key); self.hits += 1
+                return entry[0]
+            self.misses += 1
+        value = compute() # Fora do lock: consultas de abas/threads diferentes não se bloqueiam
+        if value is None: return value
+        size = estimate_size(value)
+        with self._lock:
+            if generation != self._generation or size > self.max_bytes: return value # Banco mudou durante o cálculo / grande demais
+            old = self._entries.pop(key, None)
+            if old is not None: self._bytes -= old[1]
+            self._entries[key] = (value, size); self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False); self._bytes -= evicted_size
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear(); self._bytes = 0
+
+
+_cache = QueryCache()
+
+def get_query_cache():
+    return _cache
+
+def get_or_compute(kind, db_path, params, compute):
+    return _cache.get_or_compute(kind, db_path, params, compute)
+
+def bump_generation():
+    """Chamado quando o banco muda (importação concluída, edição de competição)."""
+    return _cache.bump_generation()
+
+def current_generation():
+    return _cache.generation
@@ -0,0 +1,233 @@
+# NadosApp/core/query_jobs.py
+"""Consultas das abas em segundo plano (threads fixas de consulta), sem travar a janela.
+
+Cada aba tem um QueryJobRunner; a consulta e o processamento rodam numa thread do pool e o resultado volta
+por sinal para a thread da interface, onde os callbacks atualizam os widgets:
+
+    self.query_runner = QueryJobRunner(self.db_path, self)
+    self.query_runner.submit(self._load_athlete_data, license, prova, on_result=self._show_data, on_error=self._show_error)
+
+- Um submit novo cancela o job anterior da aba, assim como cancel() (chamado quando um filtro muda): a
+  consulta SQL em andamento é interrompida (Connection.interrupt) e o resultado de um job cancelado nunca
+  é entregue. Entre as etapas em Python, a função pode chamar check_cancelled().
+- Os jobs rodam num conjunto fixo de QUERY_JOB_THREADS threads de longa duração. Cada thread mantém a sua
+  conexão de leitura (get_read_connection) aberta entre os jobs - cache de comandos preparados e de páginas
+  preservado entre cliques - e só a fecha em shutdown_query_jobs (ao fechar o aplicativo). A função
+  executada usa get_read_connection(db_path) normalmente, sem fechar a conexão.
+- Resultados parciais (p.ex. páginas de linhas lidas com fetchmany): a função chama emit_partial(valor) e o
+  on_partial(valor) da aba recebe cada um, em ordem, antes do on_result.
+- busy_changed(bool) alimenta o indicador de ocupado da aba (widgets.busy_indicator.BusyIndicator).
+- A função executada não pode tocar em widgets: recebe os filtros já lidos e devolve os dados.
+"""
+import queue
+import sqlite3
+import threading
+import time
+import traceback
+from collections import namedtuple
+
+from PySide6.QtCore import QObject, Signal, Slot
+
+from .database import get_read_connection, close_read_connections
+
+QUERY_JOB_THREADS = 4           # Jobs simultâneos (um cancelado pode ainda estar terminando a etapa em Python)
+SHUTDOWN_WAIT_MS = 3000         # Espera pelas threads de consulta ao fechar o aplicativo
+
+_pool = None
+_active_tokens = set()
+_active_lock = threading.Lock()
+_current = threading.local()     # Job que roda na thread atual (check_cancelled, emit_partial)
+
+
+class QueryCancelled(Exception):
+    """O job foi cancelado (filtro alterado, nova consulta ou fechamento do aplicativo)."""
+
+
+class CancelToken:
+    """Pedido de cancelamento de um job; interrompe a consulta SQL em andamento na conexão do job."""
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            self._event.set()
+            if self._conn is not None: self._conn.interrupt() # Seguro de outra thread; sem consulta ativa não faz nada
+
+    def attach(self, conn):
+        with self._lock: self._conn = conn
+
+    def detach(self):
+        with self._lock: self._conn = None
+
+
+def check_cancelled():
+    """Levanta QueryCancelled se o job da thread atual foi cancelado (fora de um job não faz nada)."""
+    job = getattr(_current, 'job', None)
+    if job is not None and job.token.cancelled: raise QueryCancelled()
+
+
+def emit_partial(value):
+    """Entrega `value` ao on_partial do job da thread atual (fora de um job não faz nada); levanta QueryCancelled se cancelado."""
+    job = getattr(_current, 'job', None)
+    if job is None: return
+    if job.token.cancelled: raise QueryCancelled()
+    job.signals.partial.emit(job.job_id, value)
+
+
+class QueryThreadPool:
+    """Threads fixas que executam os jobs em ordem de chegada; cada uma mantém a sua conexão de leitura.
+
+    Threads Python (e não QThreadPool): os dados de threading.local - onde ficam as conexões de leitura -
+    sobrevivem de um job para o outro, e as threads nunca expiram.
+    """
+    def __init__(self, threads=QUERY_JOB_THREADS):
+        self._queue = queue.Queue()
+        self._threads = [threading.Thread(target=self._worker, name=f"QueryJob-{i + 1}", daemon=True) for i in range(threads)]
+        for thread in self._threads: thread.start()
+
+    def start(self, job):
+        self._queue.put(job)
+
+    def _worker(self):
+        try:
+            while True:
+                job = self._queue.get()
+                if job is None: break
+                job.run()
+        finally:
+            close_read_connections() # Só ao encerrar a thread: a conexão é reaproveitada pelos próximos jobs
+
+    def shutdown(self, wait_ms=SHUTDOWN_WAIT_MS):
+        """Encerra as threads depois dos jobs já agendados (cancelados, terminam logo); espera até `wait_ms`."""
+        for _ in self._threads: self._queue.put(None)
+        deadline = time.monotonic() + wait_ms / 1000
+        for thread in self._threads: thread.join(max(0.0, deadline - time.monotonic()))
+
+
+def query_thread_pool():
+    """Threads dedicadas às consultas das abas (criadas na primeira consulta)."""
+    global _pool
+    if _pool is None: _pool = QueryThreadPool()
+    return _pool
+
+
+def shutdown_query_jobs(wait_ms=SHUTDOWN_WAIT_MS):
+    """Cancela os jobs em andamento, encerra as threads de consulta e fecha as conexões delas (ao fechar o aplicativo)."""
+    global _pool
+    with _active_lock: tokens = list(_active_tokens)
+    for token in tokens: token.cancel()
+    if _pool is not None: _pool.shutdown(wait_ms); _pool = None
+
+
+class _QueryJobSignals(QObject):
+    partial = Signal(int, object)      # job_id, resultado parcial
+    finished = Signal(int, object)     # job_id, resultado
+    failed = Signal(int, object, str)  # job_id, exceção, traceback
+    cancelled = Signal(int)            # job_id
+
+
+class QueryJob:
+    """Executa fn(*args, **kwargs) numa thread de consulta, com a conexão de leitura da thread aberta."""
+    def __init__(self, job_id, db_path, fn, args, kwargs, token):
+        self.job_id = job_id; self.db_path = db_path; self.fn = fn; self.args = args; self.kwargs = kwargs; self.token = token
+        self.signals = _QueryJobSignals() # Criado na thread da interface: os sinais chegam lá em fila
+
+    def run(self):
+        _current.job = self
+        try:
+            if self.token.cancelled: raise QueryCancelled()
+            conn = get_read_connection(self.db_path)
+            if conn is None: raise sqlite3.Error(f"Não foi possível conectar: {self.db_path}")
+            self.token.attach(conn)
+            result = self.fn(*self.args, **self.kwargs)
+            if self.token.cancelled: raise QueryCancelled()
+            self.signals.finished.emit(self.job_id, result)
+        except Exception as e:
+            if self.token.cancelled or isinstance(e, QueryCancelled): self.signals.cancelled.emit(self.job_id) # Inclui 'interrupted' do SQLite
+            else: self.signals.failed.emit(self.job_id, e, traceback.format_exc())
+        finally:
+            self.token.detach(); _current.job = None
+            with _active_lock: _active_tokens.discard(self.token)
+
+
+_RunningJob = namedtuple('_RunningJob', 'job_id token on_result on_error on_partial')
+
+
+class QueryJobRunner(QObject):
+    """Jobs de consulta de uma aba: um por vez, o mais recente vence; callbacks na thread da interface."""
+    busy_changed = Signal(bool)
+
+    def __init__(self, db_path, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self._next_id = 0
+        self._current = None  # _RunningJob do job atual
+        self._signals = {}    # job_id -> sinais do job (mantidos vivos até o job terminar)
+
+    @property
+    def is_busy(self):
+        return self._current is not None
+
+    def submit(self, fn, *args, on_result, on_error=None, on_partial=None, **kwargs):
+        """Cancela o job atual e agenda fn(*args, **kwargs); on_partial(parcial)*, depois on_result(resultado) ou on_error(exceção, traceback)."""
+        was_busy = self._cancel_current()
+        self._next_id += 1; job_id = self._next_id
+        token = CancelToken()
+        job = QueryJob(job_id, self.db_path, fn, args, kwargs, token)
+        job.signals.partial.connect(self._on_partial)
+        job.signals.finished.connect(self._on_finished)
+        job.signals.failed.connect(self._on_failed)
+        job.signals.cancelled.connect(self._on_cancelled)
+        self._signals[job_id] = job.signals
+        self._current = _RunningJob(job_id, token, on_result, on_error, on_partial)
+        with _active_lock: _active_tokens.add(token)
+        query_thread_pool().start(job)
+        if not was_busy: self.busy_changed.emit(True)
+        return job_id
+
+    @Slot()
+    def cancel(self):
+        """Cancela o job atual (se houver); o resultado dele é descartado."""
+        if not self._cancel_current(): return False
+        self.busy_changed.emit(False)
+        return True
+
+    def _cancel_current(self):
+        if self._current is None: return False
+        self._current.token.cancel(); self._current = None
+        return True
+
+    def _take_current(self, job_id):
+        """Callbacks do job se ele ainda for o atual (e marca a aba como livre); None se foi substituído/cancelado."""
+        self._signals.pop(job_id, None)
+        if self._current is None or self._current.job_id != job_id: return None
+        current = self._current; self._current = None
+        self.busy_changed.emit(False)
+        return current
+
+    @Slot(int, object)
+    def _on_partial(self, job_id, value):
+        current = self._current
+        if current is not None and current.job_id == job_id and current.on_partial is not None: current.on_partial(value)
+
+    @Slot(int, object)
+    def _on_finished(self, job_id, result):
+        current = self._take_current(job_id)
+        if current is not None: current.on_result(result) # Depois de liberar: o callback pode agendar outra consulta
+
+    @Slot(int, object, str)
+    def _on_failed(self, job_id, error, tb):
+        current = self._take_current(job_id)
+        if current is None: return
+        print(f"QueryJobRunner: Erro na consulta em segundo plano: {error}\n{tb}")
+        if current.on_error is not None: current.on_error(error, tb)
+
+    @Slot(int)
+    def _on_cancelled(self, job_id):
+        self._take_current(job_id)
@@ -0,0 +1,56 @@
+# NadosApp/core/query_plans.py
+"""Verificação dos planos de consulta (EXPLAIN QUERY PLAN) das abas.
+
+As consultas não são copiadas aqui: capture_queries grava (Connection.set_trace_callback) os comandos que o
+código das abas executa de fato, já com os parâmetros, e find_full_scans confere que nenhum deles faz
+varredura completa (SCAN) das tabelas que crescem com as importações. Usado por tests/test_query_plans.py:
+
+    with capture_queries(conn) as statements:
+        tab._query_results(*tab._build_query_and_params())
+    assert not find_full_scans(conn, statements)
+"""
+import re
+from contextlib import contextmanager
+
+# Tabelas que crescem com cada competição importada (SCAN nelas não escala)
+GUARDED_TABLES = ('ResultCM', 'ResultFlat', 'AthleteMaster', 'SplitCM', 'SplitPacked', 'Top3Result', 'AthleteMeetLink', 'PersonalBest', 'SeasonBest', 'Event')
+
+_FROM_ALIAS_RE = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?!ON\b|WHERE\b|JOIN\b|ORDER\b|GROUP\b)(\w+))?", re.IGNORECASE)
+
+
+def _guarded_names(sql):
+    """Nomes/aliases pelos quais as tabelas protegidas aparecem no plano desta consulta."""
+    names = set()
+    for table, alias in _FROM_ALIAS_RE.findall(sql):
+        if table in GUARDED_TABLES:
+            names.add(table)
+            if alias: names.add(alias)
+    return names
+
+
+@contextmanager
+def capture_queries(conn):
+    """Lista dos comandos executados em `conn` dentro do bloco (SQL com os parâmetros já expandidos)."""
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try: yield statements
+    finally: conn.set_trace_callback(None)
+
+
+def explain(conn, sql, params=()):
+    """Linhas de detalhe do EXPLAIN QUERY PLAN."""
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+
+
+def find_full_scans(conn, statements):
+    """Retorna [(sql, plano)] das consultas (SELECT) que fazem SCAN em uma tabela protegida."""
+    problems = []
+    for sql in dict.fromkeys(statements): # Cada comando uma vez, na ordem em que rodou
+        if not sql.lstrip().upper().startswith(('SELECT', 'WITH')): continue
+        plan = explain(conn, sql)
+        guarded = _guarded_names(sql)
+        for detail in plan:
+            parts = detail.split()
+            if len(parts) >= 2 and parts[0] == 'SCAN' and parts[1] in guarded:
+                problems.append((sql, plan)); break
+    return problems
@@ -1,6 +1,7 @@
 # NadosApp/main.py
 import sys
 import os
+import multiprocessing
 from PySide6.QtWidgets import QApplication
 from PySide6.QtCore import QCoreApplication
 
@@ -33,6 +34,9 @@ except ImportError as e:
 # os.makedirs(os.path.join(script_dir, DB_FOLDER), exist_ok=True)
 
 if __name__ == '__main__':
+    # Necessário para o pool de processos do importador em executáveis congelados (Windows/PyInstaller)
+    multiprocessing.freeze_support()
+
     # Configurações da aplicação Qt
     QCoreApplication.setApplicationName("NadosApp")
     # QCoreApplication.setApplicationVersion(APP_VERSION) # Opcional
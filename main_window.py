@@ -1,8 +1,8 @@
 # NadosApp/main_window.py
 import sys
 import os
-from PySide6.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QTabWidget, QMessageBox
-from PySide6.QtCore import Slot
+from PySide6.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QTabWidget, QMessageBox, QProgressDialog, QApplication
+from PySide6.QtCore import Slot, Qt
 
 # Adiciona diretório pai para encontrar 'core' e 'widgets'
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -20,12 +20,15 @@ from widgets.meet_summary_tab import MeetSummaryTab
 from widgets.athlete_report_tab import AthleteReportTab
 from widgets.stroke_report_tab import StrokeReportTab # <<< ADICIONAR
 from widgets.about_tab import AboutTab # <<< ADICIONAR
+from core.query_cache import bump_generation # Invalida o cache de resultados das abas
+from core.plotting import set_sparkline_disk_cache
 
 
 # --- Configurações ---
 APP_DIR = parent_dir
 DB_DIR = os.path.join(APP_DIR, 'data')
 DB_PATH = os.path.join(DB_DIR, 'nadosapp.db') # Nome padrão do banco
+SPARKLINE_CACHE_DIR = os.path.join(DB_DIR, 'cache', 'sparklines') # PNGs dos sparklines dos PDFs, reaproveitados entre execuções
 # TARGET_CLUB = "Fundação De Esportes De Campo Mourão" # Defina o nome exato do seu clube alvo
 
 class MainWindow(QMainWindow):
@@ -36,11 +39,14 @@ class MainWindow(QMainWindow):
 
         # Garante que o diretório de dados exista
         os.makedirs(DB_DIR, exist_ok=True)
+        set_sparkline_disk_cache(SPARKLINE_CACHE_DIR) # A pasta é criada na primeira gravação
 
         # Verifica a conexão inicial com o DB (get_db_connection já lida com setup/update)
         # Importa get_db_connection aqui para garantir uso da versão atualizada
         from core.database import get_db_connection
-        self.db_conn_check = get_db_connection(DB_PATH)
+        self._migration_dialog = None
+        self.db_conn_check = get_db_connection(DB_PATH, migration_progress=self._show_migration_progress)
+        if self._migration_dialog: self._migration_dialog.close(); self._migration_dialog = None
         if not self.db_conn_check:
             QMessageBox.critical(self, "Erro Crítico", f"Não foi possível conectar ou criar o banco de dados em:\n{DB_PATH}\nO aplicativo será fechado.")
             sys.exit(1)
@@ -48,6 +54,17 @@ class MainWindow(QMainWindow):
 
         self._init_ui()
 
+    def _show_migration_progress(self, step, total, message):
+        """Mostra o andamento das migrações do banco (só aparece quando há migrações pendentes)."""
+        if self._migration_dialog is None:
+            self._migration_dialog = QProgressDialog("Atualizando o banco de dados...", None, 0, total, self)
+            self._migration_dialog.setWindowTitle("NadosApp - Atualização do Banco")
+            self._migration_dialog.setWindowModality(Qt.WindowModality.ApplicationModal)
+            self._migration_dialog.setMinimumDuration(0)
+        self._migration_dialog.setLabelText(f"Atualizando o banco de dados...\n{message}")
+        self._migration_dialog.setValue(step)
+        QApplication.processEvents()
+
     def _init_ui(self):
         # Widget Central e Layout Principal
         central_widget = QWidget()
@@ -98,6 +115,8 @@ class MainWindow(QMainWindow):
 
         # --- Conectar Sinais ---
         # Conecta o sinal de sucesso da importação aos slots de refresh das outras abas
+        # (primeiro invalida o cache de resultados, para os refresh abaixo já lerem o banco novo)
+        self.import_tab.import_success.connect(bump_generation)
         self.import_tab.import_success.connect(self.view_data_tab.refresh_data)
         #self.import_tab.import_success.connect(self.filter_data_tab.refresh_data)
         self.import_tab.import_success.connect(self.analysis_tab.refresh_data)
@@ -107,11 +126,13 @@ class MainWindow(QMainWindow):
         self.import_tab.import_success.connect(self.stroke_report_tab.refresh_data) # <<< CORRIGIDO - Conectar ao sinal import_success
 
 
-    # Opcional: Método closeEvent para garantir fechamento limpo
-    # def closeEvent(self, event):
-    #     # Adicionar lógica se necessário para fechar conexões ou threads
-    #     print("Fechando NadosApp...")
-    #     # Se houver conexões persistentes, fechá-las aqui
-    #     event.accept()
+    def closeEvent(self, event):
+        """Cancela as consultas em segundo plano e fecha as conexões persistentes (leitura das abas e escrita do importador) ao sair."""
+        from core.database import close_connections
+        from core.query_jobs import shutdown_query_jobs
+        print("Fechando NadosApp...")
+        shutdown_query_jobs() # Interrompe as consultas das abas e espera as threads do pool
+        close_connections()
+        event.accept()
 
 # O código em main.py para iniciar a aplicação permanece o mesmo
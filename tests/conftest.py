@@ -0,0 +1,37 @@
+# NadosApp/tests/conftest.py
+"""Fixtures comuns: QApplication (offscreen) e um banco criado em pasta temporária (schema + migrações, como no
+aplicativo) com os arquivos LENEX de exemplo da pasta lenex/."""
+import glob
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+TARGET_CLUB = "Fundação De Esportes De Campo Mourão"
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    from PySide6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture(scope='session')
+def db_path(qapp, tmp_path_factory):
+    from core.database import close_read_connections
+    from core.importer import LenexImporter
+    files = sorted(glob.glob(os.path.join(ROOT_DIR, 'lenex', '*.lef')))
+    if not files: pytest.skip("Sem arquivos LENEX de exemplo em lenex/")
+    path = str(tmp_path_factory.mktemp('sample') / 'nadosapp.db')
+    importer = LenexImporter(path, TARGET_CLUB)
+    importer.max_workers = 1 # Parse serial: sem pool de processos dentro do pytest
+    result = {}
+    importer.finished.connect(lambda ok, message: result.update(ok=ok, message=message))
+    importer.set_files(files); importer.run_import()
+    assert result.get('ok'), result.get('message')
+    yield path
+    close_read_connections()
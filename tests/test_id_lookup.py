@@ -0,0 +1,47 @@
+# NadosApp/tests/test_id_lookup.py
+"""core.id_lookup: listas maiores que o limite de variáveis do SQLite continuam em blocos, sem tabela temporária."""
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.id_lookup import fetch_by_ids, TEMP_TABLE_MIN_IDS
+from core.query_plans import capture_queries
+
+OLD_VARIABLE_LIMIT = 999 # SQLite < 3.32
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE Item (id INTEGER PRIMARY KEY, tag TEXT)")
+    conn.executemany("INSERT INTO Item (id, tag) VALUES (?, ?)", ((i, 'par' if i % 2 == 0 else 'impar') for i in range(3000)))
+    conn.commit()
+    conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, OLD_VARIABLE_LIMIT)
+    yield conn
+    conn.close()
+
+
+def test_auto_uses_chunks_above_variable_limit(conn):
+    ids = list(range(1500))
+    assert len(ids) < TEMP_TABLE_MIN_IDS
+    with capture_queries(conn) as statements: rows = fetch_by_ids(conn, "SELECT id FROM Item WHERE id IN ({ids})", ids)
+    assert sorted(row[0] for row in rows) == ids
+    assert not any('_lookup_ids_' in sql for sql in statements)
+
+
+def test_chunk_shrinks_to_fit_extra_params(conn):
+    ids = list(range(2000))
+    rows = fetch_by_ids(conn, "SELECT id FROM Item WHERE tag = ? AND id IN ({ids})", ids, params_before=('par',), chunk_size=OLD_VARIABLE_LIMIT)
+    assert sorted(row[0] for row in rows) == ids[::2]
+
+
+def test_auto_with_cursor_open(conn):
+    """Sem DDL no modo 'chunks': funciona com outro SELECT da mesma conexão ainda em andamento (paginação)."""
+    cursor = conn.execute("SELECT id FROM Item ORDER BY id")
+    page = [row[0] for row in cursor.fetchmany(1500)]
+    rows = fetch_by_ids(conn, "SELECT id FROM Item WHERE id IN ({ids})", page)
+    assert len(rows) == 1500 and len(cursor.fetchmany(1500)) == 1500
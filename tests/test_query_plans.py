@@ -0,0 +1,85 @@
+# NadosApp/tests/test_query_plans.py
+"""Planos de consulta das abas: nenhuma consulta filtrada pode fazer SCAN das tabelas que crescem com as importações.
+
+O banco (fixture db_path, em conftest.py) tem os arquivos LENEX de exemplo da pasta lenex/; as consultas
+verificadas são as que as próprias abas montam e executam.
+"""
+import pytest
+
+from core.database import get_read_connection
+from core.query_plans import capture_queries, find_full_scans
+
+
+def _assert_no_full_scans(db_path, run):
+    """Roda `run()` gravando os comandos da conexão de leitura da thread e confere o plano de cada SELECT."""
+    conn = get_read_connection(db_path)
+    with capture_queries(conn) as statements: run()
+    assert any(sql.lstrip().upper().startswith('SELECT') for sql in statements), "Nenhuma consulta foi executada"
+    problems = find_full_scans(conn, statements)
+    assert not problems, "\n\n".join(f"{sql.strip()}\n    " + "\n    ".join(plan) for sql, plan in problems)
+
+
+def _first_value(db_path, sql):
+    row = get_read_connection(db_path).execute(sql).fetchone()
+    return row[0] if row else None
+
+
+def _select_only(combos, combo, index=1):
+    """Deixa só `combo` filtrando (os demais em "Todos")."""
+    for other in combos: other.setCurrentIndex(0)
+    combo.setCurrentIndex(index)
+
+
+def test_view_data_tab(db_path):
+    from widgets.view_data_tab import ViewDataTab
+    tab = ViewDataTab(db_path)
+    combos = (tab.combo_athlete, tab.combo_meet, tab.combo_event, tab.combo_course, tab.combo_birth_year)
+    for combo in combos:
+        assert combo.count() > 1
+        _select_only(combos, combo)
+        _assert_no_full_scans(db_path, lambda: tab._query_results(*tab._build_query_and_params()))
+
+
+def test_athlete_report_tab(db_path):
+    from widgets.athlete_report_tab import AthleteReportTab, ALL_EVENTS
+    tab = AthleteReportTab(db_path)
+    license_id = _first_value(db_path, "SELECT license FROM ResultFlat GROUP BY license ORDER BY COUNT(*) DESC LIMIT 1")
+    _assert_no_full_scans(db_path, lambda: tab.combo_athlete.setCurrentIndex(tab.combo_athlete.findData(license_id))) # Popula as provas
+    event_desc = tab.combo_event.itemText(tab.combo_event.count() - 1)
+    assert event_desc != ALL_EVENTS
+    for event_filter in (ALL_EVENTS, event_desc):
+        _assert_no_full_scans(db_path, lambda: tab._query_athlete_data(license_id, event_filter))
+    _assert_no_full_scans(db_path, lambda: tab._query_data_for_single_athlete(license_id))
+
+
+def test_stroke_report_tab(db_path):
+    from widgets.stroke_report_tab import StrokeReportTab, ALL_DISTANCES, ALL_FILTER
+    tab = StrokeReportTab(db_path)
+    stroke = tab.combo_stroke.itemData(1)
+    _assert_no_full_scans(db_path, lambda: tab.combo_stroke.setCurrentIndex(1)) # Popula as provas do estilo
+    event_desc = tab.combo_distance_event.itemData(1)
+    year = tab.combo_birth_year_start.itemText(1)
+    for filters in ((ALL_DISTANCES, ALL_FILTER, ALL_FILTER, ALL_FILTER), (event_desc, ALL_FILTER, ALL_FILTER, ALL_FILTER),
+                    (ALL_DISTANCES, "Feminino", year, year), (event_desc, "Masculino", year, ALL_FILTER)):
+        _assert_no_full_scans(db_path, lambda: tab._query_data_for_stroke(stroke, *filters))
+
+
+def test_meet_summary_tab(db_path):
+    from widgets.meet_summary_tab import MeetSummaryTab
+    tab = MeetSummaryTab(db_path)
+    meet_id = _first_value(db_path, "SELECT meet_id FROM Meet ORDER BY meet_id LIMIT 1")
+    _assert_no_full_scans(db_path, lambda: tab._compute_meet_summary(meet_id))
+
+
+def test_analysis_tab(db_path):
+    from widgets.analysis_tab import AnalysisTab, ALL_FILTER, PANDAS_AVAILABLE
+    if not PANDAS_AVAILABLE: pytest.skip("Pandas não instalado")
+    tab = AnalysisTab(db_path)
+    license_id, event_desc = get_read_connection(db_path).execute(
+        "SELECT license, prova_desc FROM ResultFlat WHERE swim_time_cs IS NOT NULL GROUP BY license, prova_desc ORDER BY COUNT(*) DESC LIMIT 1").fetchone()
+    relay_desc = _first_value(db_path, "SELECT prova_desc FROM Event WHERE relay_count > 1 LIMIT 1")
+    runs = [("Evolução Individual", license_id, event_desc), ("Comparativo Evolução (Linhas)", ALL_FILTER, event_desc),
+            ("Comparativo Melhores Tempos (Barras)", ALL_FILTER, event_desc), ("Comparativo Melhores Tempos (Barras)", ALL_FILTER, relay_desc)]
+    for graph_type, athlete, prova in runs:
+        if prova is None: continue # Sem revezamentos nos arquivos de exemplo
+        _assert_no_full_scans(db_path, lambda: tab._fetch_data_for_graph(graph_type, athlete, prova, ALL_FILTER, ALL_FILTER, ALL_FILTER))
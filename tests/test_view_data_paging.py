@@ -0,0 +1,64 @@
+# NadosApp/tests/test_view_data_paging.py
+"""Carregamento em páginas da aba Visualizar Dados: com o SELECT principal ainda aberto (fetchmany), o Top 3 e as
+parciais de cada página não podem usar a tabela temporária (DROP TABLE falha com "database table is locked").
+
+O banco de exemplo é copiado e seus resultados repetidos até passar de PAGE_ROWS linhas; o limite de variáveis
+da conexão fica em 999 (SQLite < 3.32) e TEMP_TABLE_MIN_IDS abaixo da página, como se a página fosse grande
+o bastante para o modo 'auto' escolher a tabela temporária.
+"""
+import sqlite3
+
+import pytest
+
+import core.id_lookup
+from core.database import get_read_connection, close_read_connections
+
+OLD_VARIABLE_LIMIT = 999 # SQLite < 3.32
+COPIES = 16 # Resultados repetidos com outro result_id_lenex (e as mesmas parciais)
+
+
+@pytest.fixture
+def big_db_path(db_path, tmp_path):
+    path = str(tmp_path / 'paging.db')
+    src = sqlite3.connect(db_path); dst = sqlite3.connect(path)
+    src.backup(dst); src.close()
+    flat_columns = [row[1] for row in dst.execute("PRAGMA table_info(ResultFlat)") if row[1] != 'result_id_lenex']
+    for copy in range(1, COPIES):
+        dst.execute(f"""INSERT INTO ResultFlat (result_id_lenex, {', '.join(flat_columns)})
+                        SELECT result_id_lenex || '#{copy}', {', '.join(flat_columns)} FROM ResultFlat WHERE result_id_lenex NOT LIKE '%#%'""")
+        dst.execute(f"""INSERT INTO SplitCM (result_id_lenex, distance, swim_time, swim_time_cs)
+                        SELECT result_id_lenex || '#{copy}', distance, swim_time, swim_time_cs FROM SplitCM WHERE result_id_lenex NOT LIKE '%#%'""")
+    dst.commit(); dst.close()
+    yield path
+    close_read_connections()
+
+
+def _load_all(tab, monkeypatch):
+    """Roda a consulta sem filtros da aba; retorna (entregas de emit_partial, total retornado)."""
+    import widgets.view_data_tab as view_data_tab
+    partials = []
+    monkeypatch.setattr(view_data_tab, 'emit_partial', partials.append)
+    return partials, tab._query_results(*tab._build_query_and_params())
+
+
+def _lap_keys(rows):
+    return sorted((row["Atleta"], row["Prova"], row["Data"], row["Tempo"], tuple(row["Lap Times"])) for row in rows)
+
+
+def test_pages_with_cursor_open(qapp, db_path, big_db_path, monkeypatch):
+    from widgets.view_data_tab import ViewDataTab, FIRST_PAGE_ROWS, PAGE_ROWS
+    partials, _ = _load_all(ViewDataTab(db_path), monkeypatch)
+    sample_rows = [row for kind, value in partials if kind == 'rows' for row in value]
+
+    tab = ViewDataTab(big_db_path)
+    conn = get_read_connection(big_db_path)
+    conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, OLD_VARIABLE_LIMIT)
+    monkeypatch.setattr(core.id_lookup, 'TEMP_TABLE_MIN_IDS', OLD_VARIABLE_LIMIT + 1)
+    total = conn.execute("SELECT COUNT(*) FROM ResultFlat").fetchone()[0]
+    assert total == len(sample_rows) * COPIES and total > FIRST_PAGE_ROWS + PAGE_ROWS # Pelo menos uma página cheia depois da primeira
+
+    partials, n_rows = _load_all(tab, monkeypatch)
+    pages = [value for kind, value in partials if kind == 'rows']
+    assert partials[0] == ('total', total) and n_rows == total
+    assert [len(page) for page in pages[:2]] == [FIRST_PAGE_ROWS, PAGE_ROWS]
+    assert _lap_keys(row for page in pages for row in page) == sorted(_lap_keys(sample_rows) * COPIES) # Parciais de todas as páginas
@@ -0,0 +1,98 @@
+# NadosApp/utils/helpers.py
+"""Funções auxiliares compartilhadas pelas abas: conversão e formatação de tempos de natação.
+
+Formatos aceitos (mesmos das cópias antigas de time_to_seconds nas abas):
+'HH:MM:SS.cc' (LENEX), 'M:SS.cc', 'SS.cc' (centésimos com 1 ou 2 dígitos) e segundos inteiros ('65').
+Tempos inválidos/vazios retornam None (escalar) ou NaN / `invalid` (arrays).
+"""
+import re
+import numbers
+from functools import lru_cache
+
+import numpy as np
+
+TIME_CACHE_SIZE = 65536 # Tempos distintos guardados no cache do conversor escalar
+
+# Um único regex no lugar dos quatro re.match por string. Os lookaheads garantem MM e SS com 2 dígitos
+# quando há um campo à esquerda (como nas versões antigas).
+_TIME_RE = re.compile(r'(?:(\d{1,2}):(?=\d{2}:))?(?:(\d{1,2}):(?=\d{2}\.))?(\d{1,2})\.(\d{1,2})|(\d+)')
+_LENEX_DIGIT_COLS = [0, 1, 3, 4, 6, 7, 9, 10] # Posições dos dígitos em 'HH:MM:SS.cc'
+_LENEX_DIGIT_WEIGHTS = np.array([3600000, 360000, 60000, 6000, 1000, 100, 10, 1], dtype=np.int64)
+
+
+# --- Conversão escalar ---
+@lru_cache(maxsize=TIME_CACHE_SIZE)
+def _parse_centiseconds(time_str):
+    # Caminho rápido: formato fixo LENEX 'HH:MM:SS.cc'
+    if len(time_str) == 11 and time_str[2] == ':' and time_str[5] == ':' and time_str[8] == '.':
+        digits = time_str[0:2] + time_str[3:5] + time_str[6:8] + time_str[9:11]
+        if digits.isdigit() and digits.isascii():
+            return int(time_str[0:2]) * 360000 + int(time_str[3:5]) * 6000 + int(time_str[6:8]) * 100 + int(time_str[9:11])
+    match = _TIME_RE.fullmatch(time_str.strip())
+    if not match: return None
+    hours, minutes, seconds, cents, whole_seconds = match.groups()
+    if whole_seconds is not None: return int(whole_seconds) * 100
+    return (int(hours or 0) * 3600 + int(minutes or 0) * 60 + int(seconds)) * 100 + int(cents.ljust(2, '0'))
+
+def time_to_centiseconds(time_str):
+    """Converte uma string de tempo em centésimos (int). Retorna None se vazia ou fora do formato."""
+    if not time_str: return None
+    if not isinstance(time_str, str): time_str = str(time_str)
+    return _parse_centiseconds(time_str)
+
+def time_to_seconds(time_str):
+    """Converte uma string de tempo em segundos (float). Retorna None se vazia ou fora do formato."""
+    cs = time_to_centiseconds(time_str)
+    return cs / 100.0 if cs is not None else None
+
+
+# --- Conversão em lote (NumPy) ---
+def times_to_centiseconds(time_strs, invalid=-1):
+    """Converte uma sequência de strings de tempo em um array int64 de centésimos numa única chamada.
+
+    Strings no formato fixo LENEX são convertidas de forma vetorizada (código dos caracteres - '0');
+    as demais passam pelo conversor escalar com cache. Entradas vazias/inválidas recebem `invalid`.
+    """
+    values = [v if isinstance(v, str) else ('' if v is None else str(v)) for v in time_strs]
+    result = np.full(len(values), invalid, dtype=np.int64)
+    if not values: return result
+    width = max(11, max(len(v) for v in values))
+    chars = np.array(values, dtype=f'U{width}')
+    codes = chars.view(np.uint32).reshape(len(values), width)[:, :11]
+    lengths = np.char.str_len(chars)
+    digits = codes[:, _LENEX_DIGIT_COLS].astype(np.int64) - ord('0')
+    fixed = ((lengths == 11) & (codes[:, 2] == ord(':')) & (codes[:, 5] == ord(':')) & (codes[:, 8] == ord('.'))
+             & ((digits >= 0) & (digits <= 9)).all(axis=1))
+    result[fixed] = digits[fixed] @ _LENEX_DIGIT_WEIGHTS
+    for i in np.flatnonzero(~fixed & (lengths > 0)):
+        cs = _parse_centiseconds(values[i])
+        if cs is not None: result[i] = cs
+    return result
+
+def times_to_seconds(time_strs):
+    """Como times_to_centiseconds, mas retorna um array float64 de segundos (NaN para inválidos)."""
+    cs = times_to_centiseconds(time_strs)
+    seconds = cs / 100.0
+    seconds[cs < 0] = np.nan
+    return seconds
+
+
+# --- Formatação ---
+def format_centiseconds(cs):
+    """Formata centésimos (int) como 'MM:SS.cc' ou 'HH:MM:SS.cc'. Retorna 'N/A' se inválido."""
+    if cs is None or not isinstance(cs, numbers.Real) or cs != cs or cs < 0: return "N/A"
+    cs = int(round(cs))
+    hours, rest = divmod(cs, 360000); minutes, rest = divmod(rest, 6000); seconds, cents = divmod(rest, 100)
+    if hours > 0: return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{cents:02d}"
+    return f"{minutes:02d}:{seconds:02d}.{cents:02d}"
+
+def format_seconds_to_time_str(total_seconds):
+    """Converte segundos (float) para uma string de tempo MM:SS.ss ou HH:MM:SS.ss."""
+    if total_seconds is None or not isinstance(total_seconds, numbers.Real) or not total_seconds >= 0: return "N/A"
+    return format_centiseconds(round(total_seconds * 100))
+
+def format_time_diff(diff_seconds):
+    """Diferença de tempo com sinal: '+1.23s', '-0.50s' ou '0.00s'."""
+    if diff_seconds is None: return "N/A"
+    if abs(diff_seconds) < 0.001: return "0.00s"
+    sign = "+" if diff_seconds >= 0 else "-"; return f"{sign}{abs(diff_seconds):.2f}s"
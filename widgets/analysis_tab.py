@@ -4,7 +4,6 @@ import os
 import sqlite3
 import pandas as pd
 from datetime import datetime
-import re # Para time_to_seconds
 
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel,
                                QComboBox, QPushButton, QSpacerItem, QSizePolicy,
@@ -53,27 +52,12 @@ if parent_dir not in sys.path:
     sys.path.append(parent_dir)
 
 # Importa funções do core.database
-from core.database import get_db_connection
+from core.database import get_read_connection, fetch_best_times_board, fetch_individual_event_key, fetch_birth_years
 
 # Constante para a opção "Todos" / "Selecione"
 SELECT_PROMPT = "--- Selecione ---"
 ALL_FILTER = "Todos" # Pode ser útil se adicionar mais filtros
 
-# --- Função Auxiliar time_to_seconds (copiada/adaptada) ---
-def time_to_seconds(time_str):
-    if not time_str: return None; time_str = str(time_str).strip() # Garante que é string
-    match_hr = re.match(r'(\d{1,2}):(\d{2}):(\d{2})\.(\d{1,2})$', time_str)
-    match_min = re.match(r'(\d{1,2}):(\d{2})\.(\d{1,2})$', time_str)
-    match_sec = re.match(r'(\d{1,2})\.(\d{1,2})$', time_str)
-    match_sec_only = re.match(r'(\d+)$', time_str)
-    try:
-        if match_hr: h = int(match_hr.group(1)); m = int(match_hr.group(2)); s = int(match_hr.group(3)); c = int(match_hr.group(4).ljust(2, '0')); return h * 3600 + m * 60 + s + c / 100.0
-        elif match_min: m = int(match_min.group(1)); s = int(match_min.group(2)); c = int(match_min.group(3).ljust(2, '0')); return m * 60 + s + c / 100.0
-        elif match_sec: s = int(match_sec.group(1)); c = int(match_sec.group(2).ljust(2, '0')); return s + c / 100.0
-        elif match_sec_only: return float(match_sec_only.group(1))
-        else: return None
-    except (ValueError, TypeError): return None
-# --- Fim time_to_seconds ---
 
 class AnalysisTab(QWidget):
     def __init__(self, db_path, parent=None):
@@ -186,7 +170,7 @@ class AnalysisTab(QWidget):
 
         conn = None
         try:
-            conn = get_db_connection(self.db_path)
+            conn = get_read_connection(self.db_path)
             if not conn: return
 
             # Atletas
@@ -222,8 +206,7 @@ class AnalysisTab(QWidget):
             self.combo_event.blockSignals(False)
 
             # Ano Nasc. (Início e Fim) - Similar a ViewDataTab
-            df_years = pd.read_sql_query("SELECT DISTINCT SUBSTR(birthdate, 1, 4) AS year FROM AthleteMaster WHERE year IS NOT NULL AND LENGTH(birthdate) >= 4 ORDER BY year DESC", conn)
-            years = [row['year'] for _, row in df_years.iterrows() if row['year']]
+            years = fetch_birth_years(conn) # Índice de AthleteMaster.birth_year
             self.combo_birth_year_start.blockSignals(True); self.combo_birth_year_end.blockSignals(True)
             current_start_year = self.combo_birth_year_start.currentText(); current_end_year = self.combo_birth_year_end.currentText()
             self.combo_birth_year_start.clear(); self.combo_birth_year_end.clear()
@@ -235,8 +218,6 @@ class AnalysisTab(QWidget):
 
         except Exception as e:
             QMessageBox.warning(self, "Erro ao Carregar Filtros", f"Não foi possível buscar dados para os filtros:\n{e}")
-        finally:
-            if conn: conn.close()
 
     def _fetch_data_for_graph(self, graph_type, athlete_license, event_desc, gender, start_year, end_year):
         """Busca os dados de tempo para o atleta e prova especificados."""
@@ -245,55 +226,53 @@ class AnalysisTab(QWidget):
         params = []
         filters = []
 
-        # Cláusulas FROM e JOIN são comuns
+        # Cláusula FROM comum (tabela desnormalizada, sem joins)
         from_join_clause = """
-            FROM ResultCM r
-            JOIN AthleteMeetLink aml ON r.link_id = aml.link_id
-            JOIN AthleteMaster am ON aml.license = am.license
-            JOIN Meet m ON r.meet_id = m.meet_id
-            JOIN Event e ON r.event_db_id = e.event_db_id
+            FROM ResultFlat f
         """
 
         # --- Filtros Comuns ---
-        filters.append("e.prova_desc = ?"); params.append(event_desc)
-        filters.append("(r.status IS NULL OR r.status IN ('OK', 'OFFICIAL'))") # Apenas tempos válidos
-        filters.append("r.swim_time IS NOT NULL") # Garante que há tempo
+        filters.append("f.prova_desc = ?"); params.append(event_desc)
+        filters.append("(f.status IS NULL OR f.status IN ('OK', 'OFFICIAL'))") # Apenas tempos válidos
+        filters.append("f.swim_time_cs IS NOT NULL") # Garante que há tempo (válido)
 
         if gender != ALL_FILTER:
             gender_code = 'M' if gender == "Masculino" else 'F'
-            filters.append("am.gender = ?"); params.append(gender_code)
+            filters.append("f.gender = ?"); params.append(gender_code)
 
         if start_year != ALL_FILTER:
-            filters.append("CAST(SUBSTR(am.birthdate, 1, 4) AS INTEGER) >= ?"); params.append(int(start_year))
+            filters.append("f.birth_year >= ?"); params.append(int(start_year))
         if end_year != ALL_FILTER:
-            filters.append("CAST(SUBSTR(am.birthdate, 1, 4) AS INTEGER) <= ?"); params.append(int(end_year))
+            filters.append("f.birth_year <= ?"); params.append(int(end_year))
 
         # --- Filtros e Campos Específicos por Tipo de Gráfico ---
         if graph_type == "Evolução Individual":
             select_clause = """
 
                 SELECT
-                    m.start_date AS Date,
-                    r.swim_time AS Time,
-                    m.pool_size_desc AS Course
+                    f.start_date AS Date,
+                    f.swim_time AS Time,
+                    f.swim_time_cs AS TimeCs,
+                    f.pool_size_desc AS Course
             """
             if athlete_license is None or athlete_license == ALL_FILTER:
                 QMessageBox.warning(self, "Seleção Inválida", "Selecione um atleta específico para o gráfico de evolução individual.")
                 return None
-            filters.append("am.license = ?"); params.append(athlete_license)
-            query = select_clause + from_join_clause + " WHERE " + " AND ".join(filters) + " ORDER BY m.start_date;"
+            filters.append("f.license = ?"); params.append(athlete_license)
+            query = select_clause + from_join_clause + " WHERE " + " AND ".join(filters) + " ORDER BY f.start_date;"
 
         elif graph_type == "Comparativo Melhores Tempos (Barras)":
             select_clause = """
 
                 SELECT
-                    am.first_name || ' ' || am.last_name AS AthleteName,
-                    MIN(r.swim_time) AS BestTime
+                    f.athlete_name AS AthleteName,
+                    MIN(f.swim_time_cs) AS TimeCs
             """
+            # Só para provas sem ranking pré-calculado (revezamentos); as individuais vêm de PersonalBest abaixo.
+            # Comparação numérica (centésimos): MIN/ORDER BY sobre TEXT dependiam do formato da string
             group_order_clause = """
-                GROUP BY am.license, AthleteName
-                HAVING MIN(r.swim_time) IS NOT NULL
-                ORDER BY MIN(r.swim_time);
+                GROUP BY f.license, AthleteName
+                ORDER BY TimeCs;
             """
             query = select_clause + from_join_clause + " WHERE " + " AND ".join(filters) + group_order_clause
 
@@ -301,14 +280,15 @@ class AnalysisTab(QWidget):
             # Precisa do nome/licença para agrupar, data, tempo e piscina
             select_clause = """
                 SELECT
-                    am.license, -- Para agrupar
-                    am.first_name || ' ' || am.last_name AS AthleteName,
-                    m.start_date AS Date,
-                    r.swim_time AS Time,
-                    m.pool_size_desc AS Course
+                    f.license, -- Para agrupar
+                    f.athlete_name AS AthleteName,
+                    f.start_date AS Date,
+                    f.swim_time AS Time,
+                    f.swim_time_cs AS TimeCs,
+                    f.pool_size_desc AS Course
             """
             # Ordena por atleta e data para plotagem sequencial
-            query = select_clause + from_join_clause + " WHERE " + " AND ".join(filters) + " ORDER BY am.license, m.start_date;"
+            query = select_clause + from_join_clause + " WHERE " + " AND ".join(filters) + " ORDER BY f.license, f.start_date;"
 
         else:
             QMessageBox.critical(self, "Erro Interno", f"Tipo de gráfico desconhecido: {graph_type}")
@@ -316,10 +296,18 @@ class AnalysisTab(QWidget):
 
         conn = None
         try:
-            conn = get_db_connection(self.db_path)
+            conn = get_read_connection(self.db_path)
             if not conn: return None
-            print(f"\n--- AnalysisTab: Executing Query ---\n{query}\nParams: {params}\n-----------------------------------\n") # DEBUG Query
-            df = pd.read_sql_query(query, conn, params=params)
+            # Melhores tempos de provas individuais: ranking pré-calculado (PersonalBest), sem varrer o histórico
+            event_key = fetch_individual_event_key(conn, event_desc) if graph_type == "Comparativo Melhores Tempos (Barras)" else None
+            if event_key:
+                headers, rows = fetch_best_times_board(conn, *event_key,
+                                                       gender=('M' if gender == "Masculino" else 'F') if gender != ALL_FILTER else None,
+                                                       start_year=start_year if start_year != ALL_FILTER else None,
+                                                       end_year=end_year if end_year != ALL_FILTER else None)
+                df = pd.DataFrame(rows, columns=headers)
+            else:
+                df = pd.read_sql_query(query, conn, params=params)
 
             # --- Processamento com Pandas ---
             if df.empty:
@@ -328,9 +316,8 @@ class AnalysisTab(QWidget):
             # Converter Data para datetime
             if 'Date' in df.columns:
                 df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-            # Converter Tempo para segundos (float) - Coluna pode ser 'Time' ou 'BestTime'
-            time_col = 'Time' if 'Time' in df.columns else 'BestTime'
-            df['Time_sec'] = df[time_col].apply(time_to_seconds)
+            # Tempo em segundos (float) a partir da coluna em centésimos
+            df['Time_sec'] = df['TimeCs'] / 100.0
 
             # Remover linhas onde a conversão falhou
             required_cols = ['Time_sec']
@@ -347,8 +334,6 @@ class AnalysisTab(QWidget):
         except Exception as e:
             QMessageBox.critical(self, "Erro ao Buscar Dados", f"Erro ao buscar dados para o gráfico:\n{e}")
             return None
-        finally:
-            if conn: conn.close()
 
     @Slot()
     def _on_graph_type_changed(self):
@@ -3,17 +3,15 @@ import sys
 import os
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QGridLayout, QLabel,
                                QComboBox, QPushButton, QMessageBox, QSpacerItem,
-                               QSizePolicy, QFileDialog, QHBoxLayout, QTableWidget, QProgressDialog, # Add QProgressDialog
-                               QCheckBox, QTableWidgetItem, QAbstractItemView,
+                               QSizePolicy, QFileDialog, QHBoxLayout, QProgressDialog, # Add QProgressDialog
+                               QCheckBox,
                                QScrollArea, QDialog) # Removido QMetaObject daqui
 # Add QThread, Signal, QObject
 from PySide6.QtCore import Slot, Qt, QMetaObject, Q_ARG, QThread, Signal, QObject
-from PySide6.QtGui import QFont, QPixmap # Adicionado QPixmap
 import sqlite3
 from collections import defaultdict
 import re
 import statistics
-import math
 import io
 import threading # Para rodar a API em background
 from datetime import datetime
@@ -94,33 +92,22 @@ if parent_dir not in sys.path:
     sys.path.append(parent_dir)
 
 # Importa funções do core.database
-from core.database import (get_db_connection, fetch_top3_for_meet,
-                           fetch_splits_for_meet)
+from core.database import (get_read_connection, close_read_connections, fetch_top3_for_meet,
+                           fetch_splits_for_meet, fetch_split_arrays)
+# Conversão/formatação de tempos compartilhada (utils/helpers.py) e cálculo de voltas em lote
+from utils.helpers import time_to_seconds, times_to_seconds, format_time_diff
+from core.pacing import compute_pacing, format_lap_stat
+from core.id_lookup import fetch_by_ids
+from core.query_cache import get_or_compute
+from core.plotting import sparkline_png_buffer
+from core.query_jobs import QueryJobRunner
+from widgets.results_table import ResultsTableView
+from widgets.busy_indicator import BusyIndicator
 
 # Constantes
 SELECT_PROMPT = "--- Selecione ---"
 ALL_EVENTS = "Todos os Tipos de Prova"
 
-# --- Funções Auxiliares (copiadas) ---
-def time_to_seconds(time_str):
-    if not time_str: return None; time_str = str(time_str).strip()
-    match_hr = re.match(r'(\d{1,2}):(\d{2}):(\d{2})\.(\d{1,2})$', time_str)
-    match_min = re.match(r'(\d{1,2}):(\d{2})\.(\d{1,2})$', time_str)
-    match_sec = re.match(r'(\d{1,2})\.(\d{1,2})$', time_str)
-    match_sec_only = re.match(r'(\d+)$', time_str)
-    try:
-        if match_hr: h = int(match_hr.group(1)); m = int(match_hr.group(2)); s = int(match_hr.group(3)); c = int(match_hr.group(4).ljust(2, '0')); return h * 3600 + m * 60 + s + c / 100.0
-        elif match_min: m = int(match_min.group(1)); s = int(match_min.group(2)); c = int(match_min.group(3).ljust(2, '0')); return m * 60 + s + c / 100.0
-        elif match_sec: s = int(match_sec.group(1)); c = int(match_sec.group(2).ljust(2, '0')); return s + c / 100.0
-        elif match_sec_only: return float(match_sec_only.group(1))
-        else: return None
-    except (ValueError, TypeError): return None
-
-def format_time_diff(diff_seconds):
-    if diff_seconds is None: return "N/A"
-    if abs(diff_seconds) < 0.001: return "0.00s"
-    sign = "+" if diff_seconds >= 0 else "-"; return f"{sign}{abs(diff_seconds):.2f}s"
-# --- Fim Funções Auxiliares ---
 
 # --- Classe GraphPopupDialog (copiada/adaptada de MeetSummaryTab) ---
 class GraphPopupDialog(QDialog):
@@ -181,6 +168,11 @@ class AthleteReportTab(QWidget):
         filter_layout.addWidget(self.btn_view_data, 2, 0, 1, 4)
 
         self.main_layout.addWidget(filter_group)
+        # Busca em segundo plano (a janela não trava); trocar atleta/prova cancela a busca em andamento
+        self.query_runner = QueryJobRunner(self.db_path, self)
+        self.busy_indicator = BusyIndicator("Buscando dados do atleta..."); self.busy_indicator.attach(self.query_runner)
+        self.main_layout.addWidget(self.busy_indicator)
+        self.combo_event.currentIndexChanged.connect(self.query_runner.cancel)
         # self.main_layout.addStretch() # Removido - ScrollArea ocupará espaço
 
         # Conecta a seleção do atleta à habilitação do botão e busca de provas
@@ -193,11 +185,8 @@ class AthleteReportTab(QWidget):
         scroll_content_layout = QVBoxLayout(scroll_content_widget)
 
         # --- Tabela de Resultados ---
-        self.table_widget = QTableWidget()
-        self.table_widget.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
-        self.table_widget.setAlternatingRowColors(True)
-        self.table_widget.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
-        self.table_widget.setSortingEnabled(True)
+        self.table_widget = ResultsTableView(["Prova", "Colocação", "Tempo", "Média Lap", "DP Lap", "Ritmo", "Parciais",
+                                              "vs Top3", "vs Top2", "vs Top1", "Cidade", "Data"])
         self.table_widget.setMinimumHeight(300) # Altura mínima
         scroll_content_layout.addWidget(QLabel("<b>Resultados Detalhados:</b>"))
         scroll_content_layout.addWidget(self.table_widget) # Sem stretch
@@ -372,7 +361,7 @@ class AthleteReportTab(QWidget):
         """Popula o ComboBox de atletas."""
         conn = None
         try:
-            conn = get_db_connection(self.db_path);
+            conn = get_read_connection(self.db_path);
             if not conn: return
             cursor = conn.cursor()
             cursor.execute("SELECT license, first_name || ' ' || last_name FROM AthleteMaster ORDER BY last_name, first_name")
@@ -395,12 +384,11 @@ class AthleteReportTab(QWidget):
                  self._on_athlete_selected(self.combo_athlete.currentIndex())
 
         except sqlite3.Error as e: QMessageBox.warning(self, "Erro Filtros", f"Erro ao popular atletas:\n{e}")
-        finally:
-            if conn: conn.close()
 
     @Slot(int)
     def _on_athlete_selected(self, index):
         """Chamado quando um atleta é selecionado. Popula o filtro de provas."""
+        self.query_runner.cancel() # Busca do atleta anterior (se houver) não é mais exibida
         athlete_license = self.combo_athlete.itemData(index)
         self.selected_athlete_name = self.combo_athlete.itemText(index)
 
@@ -418,16 +406,14 @@ class AthleteReportTab(QWidget):
         # Popula provas que o atleta nadou
         conn = None
         try:
-            conn = get_db_connection(self.db_path)
+            conn = get_read_connection(self.db_path)
             if not conn: return
             cursor = conn.cursor()
             cursor.execute("""
-                SELECT DISTINCT e.prova_desc
-                FROM ResultCM r
-                JOIN AthleteMeetLink aml ON r.link_id = aml.link_id
-                JOIN Event e ON r.event_db_id = e.event_db_id
-                WHERE aml.license = ? AND e.prova_desc IS NOT NULL
-                ORDER BY e.prova_desc
+                SELECT DISTINCT prova_desc
+                FROM ResultFlat
+                WHERE license = ? AND prova_desc IS NOT NULL
+                ORDER BY prova_desc
             """, (athlete_license,))
             events = cursor.fetchall()
             if events:
@@ -441,46 +427,76 @@ class AthleteReportTab(QWidget):
 
         except sqlite3.Error as e: QMessageBox.warning(self, "Erro Filtros", f"Erro ao buscar provas do atleta:\n{e}")
         finally:
-            if conn: conn.close()
             self.combo_event.blockSignals(False)
 
     # --- Métodos de Busca e Exibição de Dados ---
     @Slot()
     def _fetch_and_display_data(self):
-        """Busca os dados com base nos filtros e atualiza a UI."""
-        """Busca todos os dados relevantes para o atleta selecionado."""
+        """Agenda a busca com base nos filtros (em segundo plano); a UI é atualizada em _show_athlete_data."""
+        athlete_license = self.combo_athlete.currentData()
+        event_filter = self.combo_event.currentText()
+        if athlete_license is None: return # Não deveria acontecer se botão está habilitado
+        self.query_runner.submit(self._load_athlete_data, athlete_license, event_filter,
+                                 on_result=self._show_athlete_data, on_error=self._show_query_error)
+
+    def _load_athlete_data(self, athlete_license, event_filter):
+        """Dados processados do atleta; em cache até o banco mudar (voltar a um atleta já visto não refaz consulta, parciais e Top 3)."""
+        return get_or_compute('athlete_report', self.db_path, (athlete_license, event_filter),
+                              lambda: self._query_athlete_data(athlete_license, event_filter))
+
+    def _show_query_error(self, error, tb):
+        if isinstance(error, sqlite3.Error): QMessageBox.critical(self, "Erro de Consulta", f"Erro ao buscar dados do atleta:\n{error}")
+        else: QMessageBox.critical(self, "Erro Inesperado", f"Ocorreu um erro inesperado ao buscar dados:\n{error}")
+        self._show_athlete_data([])
+
+    def _show_athlete_data(self, processed_data):
+        """Exibe os dados buscados e habilita gráficos/relatório conforme as bibliotecas disponíveis."""
+        self.current_athlete_data = processed_data or []
+        self._update_athlete_table()
+        self._populate_evolution_graph_combo()
+
+        # --- DEBUG: Check flags before enabling buttons ---
+        print(f"AthleteReportTab: _show_athlete_data - Data loaded: {bool(self.current_athlete_data)}")
+        print(f"AthleteReportTab: _show_athlete_data - MATPLOTLIB_QT_AVAILABLE: {MATPLOTLIB_QT_AVAILABLE}")
+        print(f"AthleteReportTab: _show_athlete_data - PANDAS_AVAILABLE: {PANDAS_AVAILABLE}")
+        print(f"AthleteReportTab: _show_athlete_data - GOOGLE_GENERATIVEAI_AVAILABLE: {GOOGLE_GENERATIVEAI_AVAILABLE}")
+        # --- END DEBUG ---
+
+        # Habilita botão de gerar PDF se dados foram carregados e libs OK
+        heatmap_possible = bool(self.current_athlete_data) and MATPLOTLIB_QT_AVAILABLE and PANDAS_AVAILABLE # Heatmap precisa de Pandas
+        #self.combo_heatmap_pool.setEnabled(heatmap_possible)
+        # Habilita controles do boxplot
+        boxplot_possible = bool(self.current_athlete_data) and MATPLOTLIB_QT_AVAILABLE and PANDAS_AVAILABLE
+        self.combo_boxplot_pool.setEnabled(boxplot_possible)
+        self.check_boxplot_normalize.setEnabled(boxplot_possible)
+        self.btn_generate_heatmap.setEnabled(heatmap_possible)
+        # Habilita botão de análise IA se libs e dados ok - <<< REATIVADO
+        # self.btn_analyze_boxplot_ai.setEnabled(boxplot_possible and GOOGLE_GENERATIVEAI_AVAILABLE) # <<< REMOVIDO - Botão desabilitado permanentemente
+        self.btn_generate_boxplot.setEnabled(boxplot_possible) # <<< ADICIONAR ESTA LINHA
+        self.btn_generate_report.setEnabled(bool(self.current_athlete_data) and REPORTLAB_AVAILABLE and MATPLOTLIB_AVAILABLE)
+
+    def _query_athlete_data(self, athlete_license, event_filter):
+        """Busca todos os dados relevantes para o atleta selecionado (filtro de prova opcional) e os processa."""
         base_query_with_fina = """
             SELECT -- Query original com FINA (será tratada no except)
-                am.first_name || ' ' || am.last_name AS Atleta, SUBSTR(am.birthdate, 1, 4) AS AnoNasc, am.license,
-                e.prova_desc AS Prova, m.pool_size_desc AS Piscina, r.swim_time AS Tempo, r.fina_points AS FINA,
-                r.place AS Colocacao, r.status AS Status, m.name AS NomeCompeticao,
-                m.city AS CidadeCompeticao, m.start_date AS Data, r.meet_id,
-                r.result_id_lenex, r.event_db_id, r.agegroup_db_id
-            FROM ResultCM r
-            JOIN AthleteMeetLink aml ON r.link_id = aml.link_id
-            JOIN AthleteMaster am ON aml.license = am.license
-            JOIN Meet m ON r.meet_id = m.meet_id
-            JOIN Event e ON r.event_db_id = e.event_db_id
-            WHERE am.license = ?
+                f.athlete_name AS Atleta, CAST(f.birth_year AS TEXT) AS AnoNasc, f.license,
+                f.prova_desc AS Prova, f.pool_size_desc AS Piscina, f.swim_time AS Tempo, f.fina_points AS FINA,
+                f.place AS Colocacao, f.status AS Status, f.meet_name AS NomeCompeticao,
+                f.meet_city AS CidadeCompeticao, f.start_date AS Data, f.meet_id,
+                f.result_id_lenex, f.event_db_id, f.agegroup_db_id
+            FROM ResultFlat f
+            WHERE f.license = ?
         """
         base_query_without_fina = """
             SELECT
-                am.first_name || ' ' || am.last_name AS Atleta, SUBSTR(am.birthdate, 1, 4) AS AnoNasc, am.license, -- Query sem FINA
-                e.prova_desc AS Prova, m.pool_size_desc AS Piscina, r.swim_time AS Tempo, NULL AS FINA, -- Retorna NULL para FINA
-                r.place AS Colocacao, r.status AS Status, m.name AS NomeCompeticao,
-                m.city AS CidadeCompeticao, m.start_date AS Data, r.meet_id,
-                r.result_id_lenex, r.event_db_id, r.agegroup_db_id
-            FROM ResultCM r
-            JOIN AthleteMeetLink aml ON r.link_id = aml.link_id
-            JOIN AthleteMaster am ON aml.license = am.license
-            JOIN Meet m ON r.meet_id = m.meet_id
-            JOIN Event e ON r.event_db_id = e.event_db_id
-            WHERE am.license = ?
+                f.athlete_name AS Atleta, CAST(f.birth_year AS TEXT) AS AnoNasc, f.license, -- Query sem FINA
+                f.prova_desc AS Prova, f.pool_size_desc AS Piscina, f.swim_time AS Tempo, NULL AS FINA, -- Retorna NULL para FINA
+                f.place AS Colocacao, f.status AS Status, f.meet_name AS NomeCompeticao,
+                f.meet_city AS CidadeCompeticao, f.start_date AS Data, f.meet_id,
+                f.result_id_lenex, f.event_db_id, f.agegroup_db_id
+            FROM ResultFlat f
+            WHERE f.license = ?
         """
-        athlete_license = self.combo_athlete.currentData()
-        event_filter = self.combo_event.currentText()
-        if athlete_license is None: return # Não deveria acontecer se botão está habilitado
-
         params = [athlete_license]
         
         # Inicializa as strings de query que serão usadas
@@ -489,206 +505,90 @@ class AthleteReportTab(QWidget):
 
         if event_filter != ALL_EVENTS:
             # Adiciona filtro a ambas as queries
-            filter_clause = " AND e.prova_desc = ?"
+            filter_clause = " AND f.prova_desc = ?"
             query_string_with_fina += filter_clause # Modifica a cópia local
             query_string_without_fina += filter_clause # Modifica a cópia local
             params.append(event_filter)
 
-        order_clause = " ORDER BY m.start_date DESC, e.number"
+        order_clause = " ORDER BY f.start_date DESC, f.event_number"
         # Adiciona a cláusula ORDER BY às strings de query
         query_string_with_fina += order_clause
         query_string_without_fina += order_clause
         
-        conn = None
-        processed_data = []
-        self.current_athlete_data = [] # Limpa dados anteriores
         fina_column_exists = True # Assume que existe por padrão
-        try:
-            conn = get_db_connection(self.db_path)
-            if not conn: raise sqlite3.Error("Falha na conexão com o banco de dados.")
-            cursor = conn.cursor()
-
-            try:
-                print(f"AthleteReportTab: Tentando Query com FINA: {query_string_with_fina}")
-                print(f"AthleteReportTab: Com Parâmetros: {params}")
-                cursor.execute(query_string_with_fina, params)
-            except sqlite3.OperationalError as e:
-                if "no such column: r.fina_points" in str(e):
-                    print("AthleteReportTab: Coluna r.fina_points não encontrada. Tentando query alternativa.")
-                    fina_column_exists = False
-                    cursor.execute(query_string_without_fina, params)
-                else:
-                    raise # Re-levanta outros erros operacionais
-
-            query_headers = [description[0] for description in cursor.description]
-            results_data = cursor.fetchall()
-            print(f"AthleteReportTab: Query retornou: {len(results_data)} linhas")
-
-            # Encontrar índices
-            try:
-                result_id_idx = query_headers.index('result_id_lenex'); athlete_idx = query_headers.index('Atleta'); birth_idx = query_headers.index('AnoNasc'); event_idx = query_headers.index('Prova'); place_idx = query_headers.index('Colocacao'); time_idx = query_headers.index('Tempo'); status_idx = query_headers.index('Status'); event_db_id_idx = query_headers.index('event_db_id'); agegroup_db_id_idx = query_headers.index('agegroup_db_id'); meet_id_idx = query_headers.index('meet_id'); city_idx = query_headers.index('CidadeCompeticao'); date_idx = query_headers.index('Data'); pool_idx = query_headers.index('Piscina')
-                # Tenta encontrar FINA, mas não causa erro se não existir (tratado abaixo)
-                fina_idx = query_headers.index('FINA') if fina_column_exists else -1
-            except ValueError as e: raise ValueError(f"Coluna não encontrada na query do atleta: {e}")
-
-            # Buscar Dados Adicionais (Top3 e Parciais)
-            meet_ids_in_results = list(set(row[meet_id_idx] for row in results_data)); result_ids_in_results = list(set(row[result_id_idx] for row in results_data))
-            top3_lookup = defaultdict(dict); splits_lookup = defaultdict(list)
-            if meet_ids_in_results:
-                placeholders = ', '.join('?' * len(meet_ids_in_results)); top3_query = f"SELECT event_db_id, agegroup_db_id, place, swim_time FROM Top3Result WHERE meet_id IN ({placeholders})"
-                cursor.execute(top3_query, meet_ids_in_results)
-                for t3_event, t3_ag, t3_place, t3_time in cursor.fetchall(): top3_lookup[(t3_event, t3_ag)][t3_place] = t3_time
-            if result_ids_in_results:
-                placeholders = ', '.join('?' * len(result_ids_in_results)); splits_query = f"SELECT result_id_lenex, distance, swim_time FROM SplitCM WHERE result_id_lenex IN ({placeholders}) ORDER BY result_id_lenex, distance"
-                cursor.execute(splits_query, result_ids_in_results)
-                for split_res_id, _, split_time_str in cursor.fetchall():
-                    split_sec = time_to_seconds(split_time_str)
-                    if split_sec is not None: splits_lookup[split_res_id].append(split_sec)
-
-            # Processar Resultados (igual a ViewDataTab)
-            for row in results_data:
-                result_id = row[result_id_idx]; place = row[place_idx]; status = row[status_idx]; event_db_id = row[event_db_id_idx]; ag_db_id = row[agegroup_db_id_idx]; athlete_time_str = row[time_idx]
-                city = row[city_idx]; date = row[date_idx]; pool = row[pool_idx]
-                fina_points = row[fina_idx] if fina_column_exists and fina_idx != -1 else None # Pega FINA se a coluna existia e foi encontrada
-                display_colocacao = "N/A"; is_valid_result = status is None or status.upper() == 'OK' or status.upper() == 'OFFICIAL'
-                if not is_valid_result and status: display_colocacao = status.upper()
-                elif place is not None: display_colocacao = str(place)
-
-                top3_times_for_event = top3_lookup.get((event_db_id, ag_db_id), {}); top1_time_str = top3_times_for_event.get(1); top2_time_str = top3_times_for_event.get(2); top3_time_str = top3_times_for_event.get(3)
-                athlete_secs = time_to_seconds(athlete_time_str); diff1_str = "N/A"; diff2_str = "N/A"; diff3_str = "N/A"
-                if athlete_secs is not None:
-                    top1_secs = time_to_seconds(top1_time_str); top2_secs = time_to_seconds(top2_time_str); top3_secs = time_to_seconds(top3_time_str)
-                    if top1_secs is not None: diff1_str = format_time_diff(athlete_secs - top1_secs)
-                    if top2_secs is not None: diff2_str = format_time_diff(athlete_secs - top2_secs)
-                    if top3_secs is not None: diff3_str = format_time_diff(athlete_secs - top3_secs)
-
-                cumulative_splits_sec = splits_lookup.get(result_id, [])
-                lap_times_sec = []
-                media_lap_str = "N/A"; dp_lap_str = "N/A"
-                last_cumulative_split = 0.0
-                if cumulative_splits_sec:
-                    previous_split_sec = 0.0
-                    for current_split_sec in cumulative_splits_sec:
-                        lap_time = current_split_sec - previous_split_sec
-                        if lap_time >= 0: lap_times_sec.append(lap_time)
-                        previous_split_sec = current_split_sec
-                    last_cumulative_split = previous_split_sec
-                if athlete_secs is not None and last_cumulative_split >= 0 and cumulative_splits_sec:
-                    last_lap_time = athlete_secs - last_cumulative_split
-                    if last_lap_time >= 0: lap_times_sec.append(last_lap_time)
-                elif not cumulative_splits_sec and athlete_secs is not None:
-                     lap_times_sec.append(athlete_secs)
-                if lap_times_sec:
-                    try: media = statistics.mean(lap_times_sec); media_lap_str = f"{media:.2f}"
-                    except statistics.StatisticsError: media_lap_str = "N/A"
-                    if len(lap_times_sec) >= 2:
-                        try:
-                            stdev = statistics.stdev(lap_times_sec);
-                            if not math.isnan(stdev): dp_lap_str = f"{stdev:.2f}"
-                            else: dp_lap_str = "0.00"
-                        except statistics.StatisticsError: dp_lap_str = "N/A"
-                    elif len(lap_times_sec) == 1: dp_lap_str = "0.00"
-
-                processed_data.append({
-                    "Atleta": row[athlete_idx], "AnoNasc": row[birth_idx],
-                    "Prova": row[event_idx], "Cidade": city, "Data": date, "Piscina": pool,
-                    "Colocação": display_colocacao, "Tempo": athlete_time_str or "N/A",
-                    "Média Lap": media_lap_str, "DP Lap": dp_lap_str,
-                    "Lap Times": lap_times_sec, "Tempo_Sec": athlete_secs, # Guarda tempo em segundos
-                    "vs Top3": diff3_str, "vs Top2": diff2_str, "vs Top1": diff1_str,
-                    # "FINA": fina_points # <<< Removido do dicionário final
-                })
-
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "Erro de Consulta", f"Erro ao buscar dados do atleta:\n{e}")
-        except Exception as e:
-            QMessageBox.critical(self, "Erro Inesperado", f"Ocorreu um erro inesperado ao buscar dados:\n{e}")
-            import traceback; print(traceback.format_exc())
-        finally:
-            if conn: conn.close()
+        processed_data = []
+        conn = get_read_connection(self.db_path)
+        if not conn: raise sqlite3.Error("Falha na conexão com o banco de dados.")
+        cursor = conn.cursor()
 
-        self.current_athlete_data = processed_data
-        self._update_athlete_table()
-        self._populate_evolution_graph_combo()
+        try:
+            print(f"AthleteReportTab: Tentando Query com FINA: {query_string_with_fina}")
+            print(f"AthleteReportTab: Com Parâmetros: {params}")
+            cursor.execute(query_string_with_fina, params)
+        except sqlite3.OperationalError as e:
+            if "no such column: f.fina_points" in str(e):
+                print("AthleteReportTab: Coluna f.fina_points não encontrada. Tentando query alternativa.")
+                fina_column_exists = False
+                cursor.execute(query_string_without_fina, params)
+            else:
+                raise # Re-levanta outros erros operacionais
 
-        # --- DEBUG: Check flags before enabling buttons ---
-        print(f"AthleteReportTab: _fetch_and_display_data - Data loaded: {bool(self.current_athlete_data)}")
-        print(f"AthleteReportTab: _fetch_and_display_data - MATPLOTLIB_QT_AVAILABLE: {MATPLOTLIB_QT_AVAILABLE}")
-        print(f"AthleteReportTab: _fetch_and_display_data - PANDAS_AVAILABLE: {PANDAS_AVAILABLE}")
-        print(f"AthleteReportTab: _fetch_and_display_data - GOOGLE_GENERATIVEAI_AVAILABLE: {GOOGLE_GENERATIVEAI_AVAILABLE}")
-        # --- END DEBUG ---
+        query_headers = [description[0] for description in cursor.description]
+        results_data = cursor.fetchall()
+        print(f"AthleteReportTab: Query retornou: {len(results_data)} linhas")
 
-        # Habilita botão de gerar PDF se dados foram carregados e libs OK
-        heatmap_possible = bool(self.current_athlete_data) and MATPLOTLIB_QT_AVAILABLE and PANDAS_AVAILABLE # Heatmap precisa de Pandas
-        #self.combo_heatmap_pool.setEnabled(heatmap_possible)
-        # Habilita controles do boxplot
-        boxplot_possible = bool(self.current_athlete_data) and MATPLOTLIB_QT_AVAILABLE and PANDAS_AVAILABLE
-        self.combo_boxplot_pool.setEnabled(boxplot_possible)
-        self.check_boxplot_normalize.setEnabled(boxplot_possible)
-        self.btn_generate_heatmap.setEnabled(heatmap_possible)
-        # Habilita botão de análise IA se libs e dados ok - <<< REATIVADO
-        # self.btn_analyze_boxplot_ai.setEnabled(boxplot_possible and GOOGLE_GENERATIVEAI_AVAILABLE) # <<< REMOVIDO - Botão desabilitado permanentemente
-        self.btn_generate_boxplot.setEnabled(boxplot_possible) # <<< ADICIONAR ESTA LINHA
-        self.btn_generate_report.setEnabled(bool(self.current_athlete_data) and REPORTLAB_AVAILABLE and MATPLOTLIB_AVAILABLE)
+        # Encontrar índices
+        try:
+            result_id_idx = query_headers.index('result_id_lenex'); athlete_idx = query_headers.index('Atleta'); birth_idx = query_headers.index('AnoNasc'); event_idx = query_headers.index('Prova'); place_idx = query_headers.index('Colocacao'); time_idx = query_headers.index('Tempo'); status_idx = query_headers.index('Status'); event_db_id_idx = query_headers.index('event_db_id'); agegroup_db_id_idx = query_headers.index('agegroup_db_id'); meet_id_idx = query_headers.index('meet_id'); city_idx = query_headers.index('CidadeCompeticao'); date_idx = query_headers.index('Data'); pool_idx = query_headers.index('Piscina')
+            # Tenta encontrar FINA, mas não causa erro se não existir (tratado abaixo)
+            fina_idx = query_headers.index('FINA') if fina_column_exists else -1
+        except ValueError as e: raise ValueError(f"Coluna não encontrada na query do atleta: {e}")
+
+        # Buscar Dados Adicionais (Top3 e Parciais)
+        meet_ids_in_results = list(set(row[meet_id_idx] for row in results_data)); result_ids_in_results = list(set(row[result_id_idx] for row in results_data))
+        top3_lookup = defaultdict(dict)
+        if meet_ids_in_results:
+            top3_rows = fetch_by_ids(conn, "SELECT event_db_id, agegroup_db_id, place, swim_time FROM Top3Result WHERE meet_id IN ({ids})", meet_ids_in_results)
+            for t3_event, t3_ag, t3_place, t3_time in top3_rows: top3_lookup[(t3_event, t3_ag)][t3_place] = t3_time
+        split_ids, _, split_secs = fetch_split_arrays(conn, result_ids_in_results, as_seconds=True) # SplitCM + SplitPacked
+
+        # Voltas/média/DP de todos os resultados de uma vez (parciais acumuladas em segundos)
+        pacing = compute_pacing([row[result_id_idx] for row in results_data], times_to_seconds([row[time_idx] for row in results_data]), split_ids, split_secs)
+
+        # Processar Resultados (igual a ViewDataTab)
+        for row_idx, row in enumerate(results_data):
+            place = row[place_idx]; status = row[status_idx]; event_db_id = row[event_db_id_idx]; ag_db_id = row[agegroup_db_id_idx]; athlete_time_str = row[time_idx]
+            city = row[city_idx]; date = row[date_idx]; pool = row[pool_idx]
+            fina_points = row[fina_idx] if fina_column_exists and fina_idx != -1 else None # Pega FINA se a coluna existia e foi encontrada
+            display_colocacao = "N/A"; is_valid_result = status is None or status.upper() == 'OK' or status.upper() == 'OFFICIAL'
+            if not is_valid_result and status: display_colocacao = status.upper()
+            elif place is not None: display_colocacao = str(place)
+
+            top3_times_for_event = top3_lookup.get((event_db_id, ag_db_id), {}); top1_time_str = top3_times_for_event.get(1); top2_time_str = top3_times_for_event.get(2); top3_time_str = top3_times_for_event.get(3)
+            athlete_secs = time_to_seconds(athlete_time_str); diff1_str = "N/A"; diff2_str = "N/A"; diff3_str = "N/A"
+            if athlete_secs is not None:
+                top1_secs = time_to_seconds(top1_time_str); top2_secs = time_to_seconds(top2_time_str); top3_secs = time_to_seconds(top3_time_str)
+                if top1_secs is not None: diff1_str = format_time_diff(athlete_secs - top1_secs)
+                if top2_secs is not None: diff2_str = format_time_diff(athlete_secs - top2_secs)
+                if top3_secs is not None: diff3_str = format_time_diff(athlete_secs - top3_secs)
+
+            # Tempos de volta, média e DP (calculados em lote por compute_pacing)
+            lap_times_sec = pacing.laps(row_idx); media_lap_str = format_lap_stat(pacing.mean[row_idx]); dp_lap_str = format_lap_stat(pacing.stdev[row_idx])
+
+            processed_data.append({
+                "Atleta": row[athlete_idx], "AnoNasc": row[birth_idx],
+                "Prova": row[event_idx], "Cidade": city, "Data": date, "Piscina": pool,
+                "Colocação": display_colocacao, "Tempo": athlete_time_str or "N/A",
+                "Média Lap": media_lap_str, "DP Lap": dp_lap_str,
+                "Lap Times": lap_times_sec, "Tempo_Sec": athlete_secs, # Guarda tempo em segundos
+                "vs Top3": diff3_str, "vs Top2": diff2_str, "vs Top1": diff1_str,
+                # "FINA": fina_points # <<< Removido do dicionário final
+            })
+        return processed_data
 
     def _update_athlete_table(self):
-        """Popula a QTableWidget com os dados processados."""
-        self.table_widget.setRowCount(0);
-        if not self.current_athlete_data: return
-
-        display_headers = ["Prova", "Colocação", "Tempo", "Média Lap", "DP Lap",
-                           "Ritmo", "Parciais", "vs Top3", "vs Top2", "vs Top1",
-                           "Cidade", "Data"] # Cabeçalhos para esta tabela
-
-        self.table_widget.setColumnCount(len(display_headers))
-        self.table_widget.setHorizontalHeaderLabels(display_headers)
-        self.table_widget.setRowCount(len(self.current_athlete_data))
-        bold_font = QFont(); bold_font.setBold(True)
-
-        header_to_key_map = {h: h for h in display_headers}
-        header_to_key_map["Ritmo"] = "Lap Times"; header_to_key_map["Parciais"] = "Lap Times"
-        header_to_key_map["vs T3"] = "vs Top3"; header_to_key_map["vs T2"] = "vs Top2"; header_to_key_map["vs T1"] = "vs Top1"
-
-        for row_idx, row_dict in enumerate(self.current_athlete_data):
-            col_idx = 0; athlete_place_str = row_dict.get("Colocação", "")
-            for key in display_headers:
-                dict_key = header_to_key_map[key]; value = row_dict.get(dict_key, "")
-                if key == "Ritmo":
-                    self.table_widget.setCellWidget(row_idx, col_idx, None)
-                    lap_times = value
-                    pixmap = self._generate_sparkline_pixmap(lap_times)
-                    if pixmap:
-                        label = QLabel(); label.setPixmap(pixmap); label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-                        self.table_widget.setCellWidget(row_idx, col_idx, label)
-                    else:
-                        item = QTableWidgetItem("N/A"); item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                        self.table_widget.setItem(row_idx, col_idx, item)
-                elif key == "Parciais":
-                    self.table_widget.setCellWidget(row_idx, col_idx, None)
-                    lap_times = value
-                    if lap_times:
-                        parciais_str = "; ".join([f"{t:.2f}" for t in lap_times])
-                        item = QTableWidgetItem(parciais_str)
-                    else:
-                        item = QTableWidgetItem("N/A")
-                    self.table_widget.setItem(row_idx, col_idx, item)
-                else:
-                    self.table_widget.setCellWidget(row_idx, col_idx, None)
-                    item = QTableWidgetItem(str(value))
-                    if key == "vs Top1" and athlete_place_str == "1": item.setFont(bold_font)
-                    elif key == "vs T2" and athlete_place_str == "2": item.setFont(bold_font)
-                    elif key == "vs Top3" and athlete_place_str == "3": item.setFont(bold_font)
-                    if key == "Colocação" and not str(value).isdigit() and str(value) != "N/A": item.setForeground(Qt.GlobalColor.red)
-                    self.table_widget.setItem(row_idx, col_idx, item)
-                col_idx += 1
-
-        self.table_widget.resizeColumnsToContents()
-        try:
-            sparkline_col_index = display_headers.index("Ritmo")
-            self.table_widget.setColumnWidth(sparkline_col_index, 90)
-            parciais_col_index = display_headers.index("Parciais")
-            self.table_widget.setColumnWidth(parciais_col_index, 120)
-        except ValueError: pass
+        """Exibe os dados processados; células geradas só para as linhas visíveis (Ritmo desenhado pelo delegate)."""
+        self.table_widget.set_rows(self.current_athlete_data or [])
 
     def _populate_evolution_graph_combo(self):
         """Popula o ComboBox com as provas para o gráfico de evolução."""
@@ -1009,41 +909,8 @@ Forneça uma análise concisa (2-3 parágrafos) sobre:
         # self.btn_analyze_boxplot_ai.setEnabled(True) # <<< REMOVIDO - Não reabilitar
 
     # --- Métodos Auxiliares PDF (copiados/adaptados) ---
-    # _generate_sparkline_pixmap (para UI)
-    def _generate_sparkline_pixmap(self, lap_times, width_px=80, height_px=20):
-        if not MATPLOTLIB_AVAILABLE or not lap_times: return None
-        fig = None # Define fig como None inicialmente
-        try:
-            fig, ax = plt.subplots(figsize=(width_px / 72, height_px / 72), dpi=72)
-            fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
-            ax.plot(range(len(lap_times)), lap_times, color='blue', linewidth=0.8)
-            if len(lap_times) > 0:
-                mean_time = statistics.mean(lap_times)
-                ax.axhline(mean_time, color='red', linestyle='--', linewidth=0.5)
-            ax.axis('off'); buf = io.BytesIO()
-            fig.savefig(buf, format='png', transparent=True); buf.seek(0)
-            pixmap = QPixmap(); pixmap.loadFromData(buf.read());
-            return pixmap
-        except Exception as e:
-            print(f"Erro ao gerar sparkline: {e}"); return None
-        finally:
-            if fig: plt.close(fig) # Fecha a figura se ela foi criada
-
     def _generate_sparkline_pdf_image(self, lap_times, width_px=80, height_px=20):
-        if not MATPLOTLIB_AVAILABLE or not lap_times: return None
-        fig = None
-        try:
-            fig, ax = plt.subplots(figsize=(width_px / 72, height_px / 72), dpi=72)
-            fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
-            ax.plot(range(len(lap_times)), lap_times, color='blue', linewidth=1.5)
-            if len(lap_times) > 0:
-                mean_time = statistics.mean(lap_times)
-                ax.axhline(mean_time, color='red', linestyle='--', linewidth=1.0)
-            ax.axis('off'); buf = io.BytesIO()
-            fig.savefig(buf, format='png', transparent=True); plt.close(fig); buf.seek(0)
-            return buf
-        except Exception as e: # Erro aqui, plt.close(fig) estava fora do try
-            print(f"Erro ao gerar sparkline PDF: {e}"); plt.close(fig); return None
+        return sparkline_png_buffer(lap_times, width_px, height_px, line_width=1.5, mean_line_width=1.0) # Cache em core.plotting
 
     def _generate_pdf_evolution_chart(self, event_name, event_data):
         """Gera imagem PNG do gráfico de evolução para o PDF."""
@@ -1480,8 +1347,7 @@ Forneça uma análise concisa (2-3 parágrafos) sobre:
     # --- Método de Refresh ---
     def _clear_ui_elements(self):
         """Limpa a tabela e desabilita controles de gráfico/relatório."""
-        self.table_widget.setRowCount(0)
-        self.table_widget.setColumnCount(0)
+        self.table_widget.clear()
         self.current_athlete_data = []
         self.combo_evolution_event.clear()
         self.combo_evolution_event.addItem("--- Selecione Prova ---", userData=None)
@@ -1776,13 +1642,18 @@ Forneça uma análise concisa (2-3 parágrafos) sobre:
             return None # Retorna None em caso de erro
 
     def _fetch_data_for_single_athlete(self, athlete_license):
-        """Busca e processa todos os dados para um único atleta (para relatório)."""
+        """Busca e processa todos os dados para um único atleta (para relatório; em cache até o banco mudar)."""
+        data = get_or_compute('athlete_report_pdf', self.db_path, (athlete_license,), lambda: self._query_data_for_single_athlete(athlete_license))
+        return data if data is not None else [] # Lista vazia em caso de erro (não fica no cache)
+
+    def _query_data_for_single_athlete(self, athlete_license):
+        """Consulta e processa os resultados de um atleta. Retorna None em caso de erro."""
         # Esta função é uma adaptação de _fetch_and_display_data, focada em um atleta
         # e retornando os dados processados em vez de atualizar a UI diretamente.
-        base_query_with_fina = """ SELECT am.first_name || ' ' || am.last_name AS Atleta, SUBSTR(am.birthdate, 1, 4) AS AnoNasc, am.license, e.prova_desc AS Prova, m.pool_size_desc AS Piscina, r.swim_time AS Tempo, r.fina_points AS FINA, r.place AS Colocacao, r.status AS Status, m.name AS NomeCompeticao, m.city AS CidadeCompeticao, m.start_date AS Data, r.meet_id, r.result_id_lenex, r.event_db_id, r.agegroup_db_id FROM ResultCM r JOIN AthleteMeetLink aml ON r.link_id = aml.link_id JOIN AthleteMaster am ON aml.license = am.license JOIN Meet m ON r.meet_id = m.meet_id JOIN Event e ON r.event_db_id = e.event_db_id WHERE am.license = ? """
-        base_query_without_fina = """ SELECT am.first_name || ' ' || am.last_name AS Atleta, SUBSTR(am.birthdate, 1, 4) AS AnoNasc, am.license, e.prova_desc AS Prova, m.pool_size_desc AS Piscina, r.swim_time AS Tempo, NULL AS FINA, r.place AS Colocacao, r.status AS Status, m.name AS NomeCompeticao, m.city AS CidadeCompeticao, m.start_date AS Data, r.meet_id, r.result_id_lenex, r.event_db_id, r.agegroup_db_id FROM ResultCM r JOIN AthleteMeetLink aml ON r.link_id = aml.link_id JOIN AthleteMaster am ON aml.license = am.license JOIN Meet m ON r.meet_id = m.meet_id JOIN Event e ON r.event_db_id = e.event_db_id WHERE am.license = ? """
+        base_query_with_fina = """ SELECT f.athlete_name AS Atleta, CAST(f.birth_year AS TEXT) AS AnoNasc, f.license, f.prova_desc AS Prova, f.pool_size_desc AS Piscina, f.swim_time AS Tempo, f.fina_points AS FINA, f.place AS Colocacao, f.status AS Status, f.meet_name AS NomeCompeticao, f.meet_city AS CidadeCompeticao, f.start_date AS Data, f.meet_id, f.result_id_lenex, f.event_db_id, f.agegroup_db_id FROM ResultFlat f WHERE f.license = ? """
+        base_query_without_fina = """ SELECT f.athlete_name AS Atleta, CAST(f.birth_year AS TEXT) AS AnoNasc, f.license, f.prova_desc AS Prova, f.pool_size_desc AS Piscina, f.swim_time AS Tempo, NULL AS FINA, f.place AS Colocacao, f.status AS Status, f.meet_name AS NomeCompeticao, f.meet_city AS CidadeCompeticao, f.start_date AS Data, f.meet_id, f.result_id_lenex, f.event_db_id, f.agegroup_db_id FROM ResultFlat f WHERE f.license = ? """
         params = [athlete_license]
-        order_clause = " ORDER BY m.start_date DESC, e.number"
+        order_clause = " ORDER BY f.start_date DESC, f.event_number"
         query_string_with_fina = base_query_with_fina + order_clause
         query_string_without_fina = base_query_without_fina + order_clause
 
@@ -1790,13 +1661,13 @@ Forneça uma análise concisa (2-3 parágrafos) sobre:
         processed_data = []
         fina_column_exists = True
         try:
-            conn = get_db_connection(self.db_path)
+            conn = get_read_connection(self.db_path)
             if not conn: raise sqlite3.Error("Falha na conexão.")
             cursor = conn.cursor()
             try:
                 cursor.execute(query_string_with_fina, params)
             except sqlite3.OperationalError as e:
-                if "no such column: r.fina_points" in str(e):
+                if "no such column: f.fina_points" in str(e):
                     fina_column_exists = False
                     cursor.execute(query_string_without_fina, params)
                 else: raise
@@ -1810,21 +1681,18 @@ Forneça uma análise concisa (2-3 parágrafos) sobre:
 
             # Busca Top3 e Parciais (igual a antes)
             meet_ids_in_results = list(set(row[meet_id_idx] for row in results_data)); result_ids_in_results = list(set(row[result_id_idx] for row in results_data))
-            top3_lookup = defaultdict(dict); splits_lookup = defaultdict(list)
+            top3_lookup = defaultdict(dict)
             if meet_ids_in_results:
-                placeholders = ', '.join('?' * len(meet_ids_in_results)); top3_query = f"SELECT event_db_id, agegroup_db_id, place, swim_time FROM Top3Result WHERE meet_id IN ({placeholders})"
-                cursor.execute(top3_query, meet_ids_in_results)
-                for t3_event, t3_ag, t3_place, t3_time in cursor.fetchall(): top3_lookup[(t3_event, t3_ag)][t3_place] = t3_time
-            if result_ids_in_results:
-                placeholders = ', '.join('?' * len(result_ids_in_results)); splits_query = f"SELECT result_id_lenex, distance, swim_time FROM SplitCM WHERE result_id_lenex IN ({placeholders}) ORDER BY result_id_lenex, distance"
-                cursor.execute(splits_query, result_ids_in_results)
-                for split_res_id, _, split_time_str in cursor.fetchall():
-                    split_sec = time_to_seconds(split_time_str)
-                    if split_sec is not None: splits_lookup[split_res_id].append(split_sec)
+                top3_rows = fetch_by_ids(conn, "SELECT event_db_id, agegroup_db_id, place, swim_time FROM Top3Result WHERE meet_id IN ({ids})", meet_ids_in_results)
+                for t3_event, t3_ag, t3_place, t3_time in top3_rows: top3_lookup[(t3_event, t3_ag)][t3_place] = t3_time
+            split_ids, _, split_secs = fetch_split_arrays(conn, result_ids_in_results, as_seconds=True) # SplitCM + SplitPacked
+
+            # Voltas/média/DP de todos os resultados de uma vez (parciais acumuladas em segundos)
+            pacing = compute_pacing([row[result_id_idx] for row in results_data], times_to_seconds([row[time_idx] for row in results_data]), split_ids, split_secs)
 
             # Processamento (igual a antes)
-            for row in results_data:
-                result_id = row[result_id_idx]; place = row[place_idx]; status = row[status_idx]; event_db_id = row[event_db_id_idx]; ag_db_id = row[ag_db_id_idx]; athlete_time_str = row[time_idx]; city = row[city_idx]; date = row[date_idx]; pool = row[pool_idx]; event_desc = row[event_idx]; birth_year = row[birth_idx]; athlete_name = row[athlete_idx]
+            for row_idx, row in enumerate(results_data):
+                place = row[place_idx]; status = row[status_idx]; event_db_id = row[event_db_id_idx]; ag_db_id = row[ag_db_id_idx]; athlete_time_str = row[time_idx]; city = row[city_idx]; date = row[date_idx]; pool = row[pool_idx]; event_desc = row[event_idx]; birth_year = row[birth_idx]; athlete_name = row[athlete_idx]
                 fina_points = row[fina_idx] if fina_column_exists and fina_idx != -1 else None
                 display_colocacao = "N/A"; is_valid_result = status is None or status.upper() == 'OK' or status.upper() == 'OFFICIAL'
                 if not is_valid_result and status: display_colocacao = status.upper()
@@ -1836,28 +1704,13 @@ Forneça uma análise concisa (2-3 parágrafos) sobre:
                     if top1_secs is not None: diff1_str = format_time_diff(athlete_secs - top1_secs)
                     if top2_secs is not None: diff2_str = format_time_diff(athlete_secs - top2_secs)
                     if top3_secs is not None: diff3_str = format_time_diff(athlete_secs - top3_secs)
-                cumulative_splits_sec = splits_lookup.get(result_id, []); lap_times_sec = []
-                media_lap_str = "N/A"; dp_lap_str = "N/A"; last_cumulative_split = 0.0
-                if cumulative_splits_sec:
-                    previous_split_sec = 0.0
-                    for current_split_sec in cumulative_splits_sec: lap_time = current_split_sec - previous_split_sec; lap_times_sec.append(lap_time); previous_split_sec = current_split_sec
-                    last_cumulative_split = previous_split_sec
-                if athlete_secs is not None and last_cumulative_split >= 0 and cumulative_splits_sec: last_lap_time = athlete_secs - last_cumulative_split; lap_times_sec.append(last_lap_time)
-                elif not cumulative_splits_sec and athlete_secs is not None: lap_times_sec.append(athlete_secs)
-                if lap_times_sec:
-                    try: media = statistics.mean(lap_times_sec); media_lap_str = f"{media:.2f}"
-                    except: pass
-                    if len(lap_times_sec) >= 2:
-                        try: stdev = statistics.stdev(lap_times_sec); dp_lap_str = f"{stdev:.2f}" if not math.isnan(stdev) else "0.00"
-                        except: pass
-                    elif len(lap_times_sec) == 1: dp_lap_str = "0.00"
+                # Tempos de volta, média e DP (calculados em lote por compute_pacing)
+                lap_times_sec = pacing.laps(row_idx); media_lap_str = format_lap_stat(pacing.mean[row_idx]); dp_lap_str = format_lap_stat(pacing.stdev[row_idx])
                 processed_data.append({ "Atleta": athlete_name, "AnoNasc": birth_year, "Prova": event_desc, "Cidade": city, "Data": date, "Piscina": pool, "Colocação": display_colocacao, "Tempo": athlete_time_str or "N/A", "Média Lap": media_lap_str, "DP Lap": dp_lap_str, "Lap Times": lap_times_sec, "Tempo_Sec": athlete_secs, "vs Top3": diff3_str, "vs Top2": diff2_str, "vs Top1": diff1_str, "Status": status }) # Adiciona Status
             return processed_data
         except Exception as e:
             print(f"Erro ao buscar dados para atleta {athlete_license}: {e}")
-            return [] # Retorna lista vazia em caso de erro
-        finally:
-            if conn: conn.close()
+            return None
 
 # --- Worker Class para Geração do Relatório Completo (pode ser movida para outro arquivo se preferir) ---
 class AllAthletesReportWorker(QObject):
@@ -1878,7 +1731,7 @@ class AllAthletesReportWorker(QObject):
         """Executa a lógica de geração do relatório completo."""
         conn = None; all_athletes = []
         try:
-            conn = get_db_connection(self.db_path)
+            conn = get_read_connection(self.db_path)
             if not conn: raise sqlite3.Error("Falha na conexão.")
             cursor = conn.cursor()
             cursor.execute("SELECT license, first_name || ' ' || last_name FROM AthleteMaster ORDER BY last_name, first_name")
@@ -1889,7 +1742,7 @@ class AllAthletesReportWorker(QObject):
             self.finished.emit(success, message)
         except Exception as e: import traceback; print(traceback.format_exc()); self.finished.emit(False, f"Erro inesperado:\n{e}")
         finally:
-            if conn: conn.close()
+            close_read_connections() # Conexões de leitura abertas nesta thread do relatório
 
     def _build_complete_report(self, all_athletes):
         """Constrói o PDF completo iterando pelos atletas."""
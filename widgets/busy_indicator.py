@@ -0,0 +1,33 @@
+# NadosApp/widgets/busy_indicator.py
+"""Indicador de consulta em andamento das abas (barra indeterminada + texto).
+
+Ligado ao QueryJobRunner da aba: aparece enquanto a consulta roda em segundo plano.
+
+    self.busy_indicator = BusyIndicator(); self.busy_indicator.attach(self.query_runner)
+"""
+from PySide6.QtCore import QTimer, Slot
+from PySide6.QtWidgets import QWidget, QHBoxLayout, QLabel, QProgressBar
+
+BUSY_SHOW_DELAY_MS = 150 # Consultas rápidas (p.ex. vindas do cache) não piscam o indicador
+
+
+class BusyIndicator(QWidget):
+    def __init__(self, text="Consultando banco de dados...", parent=None):
+        super().__init__(parent)
+        layout = QHBoxLayout(self); layout.setContentsMargins(0, 0, 0, 0)
+        self.progress = QProgressBar(); self.progress.setRange(0, 0) # Indeterminada
+        self.progress.setTextVisible(False); self.progress.setMaximumWidth(160); self.progress.setMaximumHeight(12)
+        self.label = QLabel(text)
+        layout.addWidget(self.progress); layout.addWidget(self.label); layout.addStretch(1)
+        self._show_timer = QTimer(self); self._show_timer.setSingleShot(True); self._show_timer.setInterval(BUSY_SHOW_DELAY_MS)
+        self._show_timer.timeout.connect(self.show)
+        policy = self.sizePolicy(); policy.setRetainSizeWhenHidden(True); self.setSizePolicy(policy) # Layout não pula ao aparecer
+        self.setVisible(False)
+
+    def attach(self, runner):
+        runner.busy_changed.connect(self.set_busy)
+
+    @Slot(bool)
+    def set_busy(self, busy):
+        if busy: self._show_timer.start()
+        else: self._show_timer.stop(); self.hide()
@@ -14,8 +14,8 @@ if parent_dir not in sys.path:
     sys.path.append(parent_dir)
 
 # Importa funções específicas do core.database
-from core.database import (get_db_connection, fetch_all_meets_for_edit,
-                           fetch_meet_details, update_meet_details)
+from core.database import (get_read_connection, acquire_writer_connection, release_writer_connection,
+                           fetch_all_meets_for_edit, fetch_meet_details, update_meet_details)
 
 class EditMeetTab(QWidget):
     def __init__(self, db_path, parent=None):
@@ -93,7 +93,7 @@ class EditMeetTab(QWidget):
         """Busca meets no DB e popula o ComboBox de seleção."""
         conn = None
         try:
-            conn = get_db_connection(self.db_path)
+            conn = get_read_connection(self.db_path)
             if not conn: return
 
             meets = fetch_all_meets_for_edit(conn)
@@ -123,9 +123,6 @@ class EditMeetTab(QWidget):
 
         except Exception as e:
             QMessageBox.warning(self, "Erro ao Carregar Competições", f"Não foi possível buscar a lista de competições:\n{e}")
-        finally:
-            if conn:
-                conn.close()
 
     @Slot(int)
     def _display_selected_meet_data(self, index):
@@ -139,7 +136,7 @@ class EditMeetTab(QWidget):
 
         conn = None
         try:
-            conn = get_db_connection(self.db_path)
+            conn = get_read_connection(self.db_path)
             if not conn: return
 
             details = fetch_meet_details(conn, self.current_meet_id)
@@ -169,9 +166,6 @@ class EditMeetTab(QWidget):
             QMessageBox.critical(self, "Erro ao Buscar Detalhes", f"Ocorreu um erro:\n{e}")
             self._clear_fields()
             self.btn_save.setEnabled(False)
-        finally:
-            if conn:
-                conn.close()
 
     @Slot()
     def _save_changes(self):
@@ -193,12 +187,11 @@ class EditMeetTab(QWidget):
             return
         # Adicionar mais validações se necessário (formato da data, etc.)
 
-        conn = None
         try:
-            conn = get_db_connection(self.db_path)
-            if not conn: return
-
-            success = update_meet_details(conn, self.current_meet_id, new_name, new_city, new_course, new_date, new_hostclub)
+            # Conexão de escrita dedicada; devolvida antes das mensagens para não segurar uma importação
+            conn = acquire_writer_connection(self.db_path)
+            try: success = update_meet_details(conn, self.current_meet_id, new_name, new_city, new_course, new_date, new_hostclub)
+            finally: release_writer_connection(conn)
 
             if success:
                 QMessageBox.information(self, "Sucesso", "Alterações salvas com sucesso!")
@@ -213,9 +206,6 @@ class EditMeetTab(QWidget):
 
         except Exception as e:
             QMessageBox.critical(self, "Erro Inesperado", f"Ocorreu um erro ao salvar:\n{e}")
-        finally:
-            if conn:
-                conn.close()
 
     def _clear_fields(self):
         """Limpa todos os campos de edição."""
@@ -16,7 +16,8 @@ if parent_dir not in sys.path:
     sys.path.append(parent_dir)
 
 # Importa funções do core.database (usando a estrutura existente)
-from core.database import get_db_connection
+from core.database import get_read_connection, fetch_birth_years
+from core.id_lookup import fetch_by_ids
 
 # Constante para a opção "Todos"
 ALL_FILTER = "Todos"
@@ -80,7 +81,7 @@ class FilterDataTab(QWidget):
         """Busca valores distintos no DB e popula os ComboBoxes."""
         conn = None
         try:
-            conn = get_db_connection(self.db_path)
+            conn = get_read_connection(self.db_path)
             if not conn: return
             cursor = conn.cursor()
             combos = [self.combo_athlete, self.combo_meet, self.combo_event, self.combo_course, self.combo_birth_year]
@@ -112,41 +113,35 @@ class FilterDataTab(QWidget):
                 if course_desc: self.combo_course.addItem(course_desc.strip())
             self.combo_course.blockSignals(False)
             # Ano Nasc.
-            cursor.execute("SELECT DISTINCT SUBSTR(birthdate, 1, 4) FROM AthleteMaster WHERE birthdate IS NOT NULL AND LENGTH(birthdate) >= 4 ORDER BY SUBSTR(birthdate, 1, 4) DESC")
+            years = fetch_birth_years(conn) # Índice de AthleteMaster.birth_year
             self.combo_birth_year.blockSignals(True)
-            for (year,) in cursor.fetchall():
+            for year in years:
                 if year: self.combo_birth_year.addItem(year)
             self.combo_birth_year.blockSignals(False)
         except sqlite3.Error as e: QMessageBox.warning(self, "Erro ao Popular Filtros", f"Não foi possível buscar dados para os filtros:\n{e}")
-        finally:
-            if conn: conn.close()
 
     # --- MODIFICAÇÃO AQUI ---
     def _build_query_and_params(self):
         """Constrói a query SQL principal e parâmetros, incluindo IDs e dados do resultado para lookup do Top3."""
         base_query = """
             SELECT
-                am.first_name || ' ' || am.last_name AS Atleta,
-                SUBSTR(am.birthdate, 1, 4) AS AnoNasc,
-                e.prova_desc AS Prova,
-                m.pool_size_desc AS Piscina,
-                r.swim_time AS Tempo,
-                r.place AS Colocacao,
-                r.status AS Status,
-                m.name AS NomeCompeticao,
-                m.city AS CidadeCompeticao,
-                m.start_date AS Data,
+                f.athlete_name AS Atleta,
+                CAST(f.birth_year AS TEXT) AS AnoNasc,
+                f.prova_desc AS Prova,
+                f.pool_size_desc AS Piscina,
+                f.swim_time AS Tempo,
+                f.place AS Colocacao,
+                f.status AS Status,
+                f.meet_name AS NomeCompeticao,
+                f.meet_city AS CidadeCompeticao,
+                f.start_date AS Data,
                 -- IDs e dados do resultado necessários para buscar/comparar com o Top 3 correspondente
-                r.meet_id AS ResultMeetID,
-                r.event_db_id AS ResultEventDBID,
-                r.agegroup_db_id AS ResultAgeGroupDBID,
-                r.place AS ResultPlace, -- Adicionado a colocação do resultado
-                r.swim_time AS ResultSwimTime -- Adicionado o tempo do resultado
-            FROM ResultCM r
-            JOIN AthleteMeetLink aml ON r.link_id = aml.link_id
-            JOIN AthleteMaster am ON aml.license = am.license
-            JOIN Meet m ON r.meet_id = m.meet_id
-            JOIN Event e ON r.event_db_id = e.event_db_id -- JOIN CORRETO
+                f.meet_id AS ResultMeetID,
+                f.event_db_id AS ResultEventDBID,
+                f.agegroup_db_id AS ResultAgeGroupDBID,
+                f.place AS ResultPlace, -- Adicionado a colocação do resultado
+                f.swim_time AS ResultSwimTime -- Adicionado o tempo do resultado
+            FROM ResultFlat f -- Tabela desnormalizada (sem joins)
         """
         filters = []
         params = []
@@ -155,16 +150,16 @@ class FilterDataTab(QWidget):
         athlete_license = self.combo_athlete.currentData(); meet_id = self.combo_meet.currentData()
         event_desc = self.combo_event.currentText(); course_desc = self.combo_course.currentText()
         birth_year = self.combo_birth_year.currentText()
-        if athlete_license is not None: filters.append("am.license = ?"); params.append(athlete_license)
-        if meet_id is not None: filters.append("m.meet_id = ?"); params.append(meet_id)
-        if event_desc != ALL_FILTER: filters.append("e.prova_desc = ?"); params.append(event_desc)
-        if course_desc != ALL_FILTER: filters.append("m.pool_size_desc = ?"); params.append(course_desc)
-        if birth_year != ALL_FILTER: filters.append("SUBSTR(am.birthdate, 1, 4) = ?"); params.append(birth_year)
+        if athlete_license is not None: filters.append("f.license = ?"); params.append(athlete_license)
+        if meet_id is not None: filters.append("f.meet_id = ?"); params.append(meet_id)
+        if event_desc != ALL_FILTER: filters.append("f.prova_desc = ?"); params.append(event_desc)
+        if course_desc != ALL_FILTER: filters.append("f.pool_size_desc = ?"); params.append(course_desc)
+        if birth_year != ALL_FILTER: filters.append("f.birth_year = ?"); params.append(int(birth_year))
 
         # Montar a query final
         query_string = base_query
         if filters: query_string += " WHERE " + " AND ".join(filters)
-        query_string += " ORDER BY m.start_date DESC, Atleta, e.number" # Mantém a ordenação
+        query_string += " ORDER BY f.start_date DESC, Atleta, f.event_number" # Mantém a ordenação
 
         return query_string, params
     # --- FIM DA MODIFICAÇÃO ---
@@ -180,7 +175,7 @@ class FilterDataTab(QWidget):
         original_headers = [] # Para guardar os cabeçalhos da query principal
 
         try:
-            conn = get_db_connection(self.db_path)
+            conn = get_read_connection(self.db_path)
             if not conn:
                 QMessageBox.critical(self, "Erro DB", f"Não foi possível conectar: {self.db_path}")
                 self._clear_table(); return
@@ -216,16 +211,14 @@ class FilterDataTab(QWidget):
 
                 if meet_ids_in_results:
                     # Busca todos os Top3 para os meets relevantes
-                    placeholders = ', '.join('?' * len(meet_ids_in_results))
-                    top3_query = f"""
+                    top3_query = """
                         SELECT meet_id, event_db_id, agegroup_db_id, place, swim_time
                         FROM Top3Result
-                        WHERE meet_id IN ({placeholders})
+                        WHERE meet_id IN ({ids})
                         ORDER BY place
                     """
                     print(f"Executando Query Top3 para meets: {meet_ids_in_results}")
-                    cursor.execute(top3_query, meet_ids_in_results)
-                    top3_data = cursor.fetchall()
+                    top3_data = fetch_by_ids(conn, top3_query, meet_ids_in_results)
                     print(f"Query Top3 retornou: {len(top3_data)} linhas")
 
                     # Constrói o dicionário de lookup
@@ -308,9 +301,6 @@ class FilterDataTab(QWidget):
              import traceback
              print(traceback.format_exc()) # Imprime traceback detalhado no console
              self._clear_table()
-        finally:
-            if conn:
-                conn.close()
     # --- FIM DA MODIFICAÇÃO ---
 
     # refresh_data: Sem alterações necessárias aqui
@@ -3,7 +3,7 @@ import os
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
                                QListWidget, QPlainTextEdit, QProgressBar,
                                QFileDialog, QMessageBox, QLabel,
-                               QLineEdit, QSpacerItem, QSizePolicy) # Adicionado QLineEdit, QSpacerItem, QSizePolicy
+                               QLineEdit, QSpacerItem, QSizePolicy, QCheckBox) # Adicionado QLineEdit, QSpacerItem, QSizePolicy
 from PySide6.QtCore import QThread, Signal, Slot # Importa QThread e Slot
 
 # Importa a classe do importador
@@ -61,6 +61,18 @@ class ImportTab(QWidget):
         self.start_button.clicked.connect(self.start_import)
         self.start_button.setEnabled(False) # Desabilitado até selecionar arquivos
         import_controls_layout.addWidget(self.start_button)
+        self.check_bulk_mode = QCheckBox("Carga em lote (mais rápido para muitos arquivos)")
+        self.check_bulk_mode.setToolTip("Grava todos os arquivos em uma única transação, com WAL e sincronização de disco reduzida.\n"
+                                        "Um arquivo com erro é desfeito sozinho; os demais continuam.")
+        import_controls_layout.addWidget(self.check_bulk_mode)
+        self.check_merge_mode = QCheckBox("Mesclar arquivos corrigidos")
+        self.check_merge_mode.setToolTip("Competições já importadas são comparadas com o arquivo e apenas os resultados,\n"
+                                         "parciais, pódios e categorias alterados são atualizados (ex: LENEX corrigido após recursos).")
+        import_controls_layout.addWidget(self.check_merge_mode)
+        self.check_packed_splits = QCheckBox("Parciais compactadas")
+        self.check_packed_splits.setToolTip("Grava as parciais de cada resultado em uma única linha (array binário de tempos acumulados)\n"
+                                            "em vez de uma linha por parcial. Reduz o tamanho do banco e acelera a leitura das parciais.")
+        import_controls_layout.addWidget(self.check_packed_splits)
         import_controls_layout.addStretch()
         layout.addLayout(import_controls_layout)
 
@@ -130,7 +142,8 @@ class ImportTab(QWidget):
 
         # --- Configuração da Thread ---
         self.importer_thread = QThread(self) # Cria a thread (pai é a aba)
-        self.importer = LenexImporter(self.db_path, current_target_club) # Passa o nome do clube atual
+        self.importer = LenexImporter(self.db_path, current_target_club, bulk_mode=self.check_bulk_mode.isChecked(), merge_mode=self.check_merge_mode.isChecked(),
+                                      packed_splits=self.check_packed_splits.isChecked()) # Passa o nome do clube atual
         self.importer.set_files(self.selected_files) # Passa os arquivos para o worker
 
         self.importer.moveToThread(self.importer_thread) # Move o worker para a thread
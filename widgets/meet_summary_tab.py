@@ -2,17 +2,13 @@
 import sys
 import os
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, # Adicionado QLabel
-                               QComboBox, QTableWidget, QTableWidgetItem,
-                               QAbstractItemView, QMessageBox, QSpacerItem,
+                               QComboBox, QMessageBox, QSpacerItem,
                                 QSizePolicy, QTextEdit, QPushButton, QDialog, QCheckBox, # Adicionado QDialog e QCheckBox
                                QFileDialog, QScrollArea) # Adicionado QScrollArea
 from PySide6.QtCore import Slot, Qt
-from PySide6.QtGui import QFont, QPixmap # Adicionado QPixmap
 import sqlite3
 from collections import defaultdict, Counter
 import re
-import statistics
-import math
 import io # Adicionado para buffer de imagem
 from datetime import datetime # Garante que o import está aqui
 import numpy as np # Adicionado para gráfico de radar
@@ -78,35 +74,20 @@ script_dir = os.path.dirname(os.path.abspath(__file__)); parent_dir = os.path.di
 if parent_dir not in sys.path: sys.path.append(parent_dir)
 
 # Importa funções do core.database
-from core.database import (get_db_connection, fetch_all_meets_for_edit,
-                           fetch_results_for_meet_summary, fetch_top3_for_meet,
-                           fetch_splits_for_meet)
+from core.database import (get_read_connection, fetch_all_meets_for_edit,
+                           fetch_results_for_meet_summary, fetch_top3_for_meet, fetch_split_arrays_for_meet)
+# Conversão/formatação de tempos compartilhada (utils/helpers.py) e cálculo de voltas em lote
+from utils.helpers import time_to_seconds, times_to_seconds, format_time_diff
+from core.pacing import compute_pacing, format_lap_stat
+from core.query_cache import get_or_compute
+from core.plotting import sparkline_png_buffer
+from core.query_jobs import QueryJobRunner
+from widgets.results_table import ResultsTableView
+from widgets.busy_indicator import BusyIndicator
 
 # Constante SELECT_PROMPT
 SELECT_PROMPT = "--- Selecione uma Competição ---"
 
-# --- Funções Auxiliares (time_to_seconds, format_time_diff - sem alterações) ---
-def time_to_seconds(time_str):
-    # ... (código como antes) ...
-    if not time_str: return None; time_str = time_str.strip()
-    match_hr = re.match(r'(\d{1,2}):(\d{2}):(\d{2})\.(\d{1,2})$', time_str)
-    match_min = re.match(r'(\d{1,2}):(\d{2})\.(\d{1,2})$', time_str)
-    match_sec = re.match(r'(\d{1,2})\.(\d{1,2})$', time_str)
-    match_sec_only = re.match(r'(\d+)$', time_str)
-    try:
-        if match_hr: h = int(match_hr.group(1)); m = int(match_hr.group(2)); s = int(match_hr.group(3)); c = int(match_hr.group(4).ljust(2, '0')); return h * 3600 + m * 60 + s + c / 100.0
-        elif match_min: m = int(match_min.group(1)); s = int(match_min.group(2)); c = int(match_min.group(3).ljust(2, '0')); return m * 60 + s + c / 100.0
-        elif match_sec: s = int(match_sec.group(1)); c = int(match_sec.group(2).ljust(2, '0')); return s + c / 100.0
-        elif match_sec_only: return float(match_sec_only.group(1))
-        else: return None
-    except (ValueError, TypeError): return None
-
-def format_time_diff(diff_seconds):
-    # ... (código como antes) ...
-    if diff_seconds is None: return "N/A"
-    if abs(diff_seconds) < 0.001: return "0.00s"
-    sign = "+" if diff_seconds >= 0 else "-"; return f"{sign}{abs(diff_seconds):.2f}s"
-# --- Fim das Funções Auxiliares ---
 
 # --- NOVA CLASSE PARA POP-UP DO GRÁFICO ---
 class GraphPopupDialog(QDialog):
@@ -143,6 +124,10 @@ class MeetSummaryTab(QWidget):
         self.combo_select_meet.addItem(SELECT_PROMPT, userData=None); self.combo_select_meet.currentIndexChanged.connect(self._on_meet_selected)
         select_layout.addWidget(self.combo_select_meet, 1)
         self.main_layout.addLayout(select_layout)
+        # Resumo calculado em segundo plano (a janela não trava); trocar a competição cancela o cálculo em andamento
+        self.query_runner = QueryJobRunner(self.db_path, self)
+        self.busy_indicator = BusyIndicator("Gerando resumo da competição..."); self.busy_indicator.attach(self.query_runner)
+        self.main_layout.addWidget(self.busy_indicator)
 
         summary_grid = QGridLayout(); summary_grid.setContentsMargins(10, 10, 10, 10); summary_grid.setSpacing(15)
         summary_grid.addWidget(QLabel("<b>Medalhas Totais (Clube):</b>"), 0, 0, Qt.AlignmentFlag.AlignTop)
@@ -158,8 +143,9 @@ class MeetSummaryTab(QWidget):
         summary_grid.setColumnStretch(1, 1); summary_grid.setColumnStretch(3, 2); 
         # self.main_layout.addLayout(summary_grid) # Movido para dentro do scroll
         
-        self.table_athletes = QTableWidget(); self.table_athletes.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers); self.table_athletes.setAlternatingRowColors(True)
-        self.table_athletes.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows); self.table_athletes.setSortingEnabled(True)
+        # Tabela virtualizada (modelo por colunas + proxy de ordenação) com "Ritmo"
+        self.table_athletes = ResultsTableView(["Atleta", "AnoNasc", "Prova", "Colocação", "Tempo", "Média Lap", "DP Lap", "Ritmo", "Parciais",
+                                                "vs Top3", "vs Top2", "vs Top1"])
         # self.main_layout.addWidget(QLabel("<b>Detalhes dos Atletas na Competição:</b>")); self.main_layout.addWidget(self.table_athletes, 1) # Movido para dentro do scroll
         
         # --- Container Widget para o conteúdo rolável ---
@@ -308,7 +294,7 @@ class MeetSummaryTab(QWidget):
     def _populate_meet_combo(self):
         conn = None
         try:
-            conn = get_db_connection(self.db_path); meets = fetch_all_meets_for_edit(conn)
+            conn = get_read_connection(self.db_path); meets = fetch_all_meets_for_edit(conn)
             self.combo_select_meet.blockSignals(True); previous_id = self.combo_select_meet.currentData()
             self.combo_select_meet.clear(); self.combo_select_meet.addItem(SELECT_PROMPT, userData=None)
             for meet_id, name, city, date in meets: display_text = f"{name or 'Sem Nome'} ({city or 'Sem Cidade'}) - {date or 'Sem Data'}"; self.combo_select_meet.addItem(display_text, userData=meet_id)
@@ -316,265 +302,131 @@ class MeetSummaryTab(QWidget):
             self.combo_select_meet.setCurrentIndex(idx_to_restore if idx_to_restore != -1 else 0); self.combo_select_meet.blockSignals(False)
             if self.combo_select_meet.currentIndex() > 0: self._on_meet_selected(self.combo_select_meet.currentIndex())
         except Exception as e: QMessageBox.warning(self, "Erro", f"Erro ao carregar competições:\n{e}")
-        finally:
-            if conn: conn.close()
 
     @Slot(int)
     def _on_meet_selected(self, index):
         self.current_meet_id = self.combo_select_meet.itemData(index); self.last_meet_name = self.combo_select_meet.itemText(index)
-        if self.current_meet_id is None: self._clear_summary(); self.btn_export_pdf.setEnabled(False); self.btn_export_csv.setEnabled(False); return
+        if self.current_meet_id is None: self.query_runner.cancel(); self._clear_summary(); self.btn_export_pdf.setEnabled(False); self.btn_export_csv.setEnabled(False); return
         print(f"MeetSummaryTab: Selecionado Meet ID: {self.current_meet_id}")
-        summary_generated = self._generate_and_display_summary()
-        if summary_generated:
-            self._populate_event_graph_combo() # Popula combo de eventos para gráfico
-            self._populate_scatter_event_combo() # Popula combo de eventos para scatter
-        
-        # Habilita botões de exportação se resumo foi gerado e libs ok
-        pdf_export_enabled = summary_generated and REPORTLAB_AVAILABLE and MATPLOTLIB_AVAILABLE
-        csv_export_enabled = summary_generated # CSV só precisa que o resumo tenha sido gerado
-        
-        self.btn_export_pdf.setEnabled(pdf_export_enabled)
-        self.btn_export_csv.setEnabled(csv_export_enabled) # <<< Habilita o botão CSV aqui
-
+        self.btn_export_pdf.setEnabled(False); self.btn_export_csv.setEnabled(False) # Até o novo resumo chegar
+        self._generate_and_display_summary()
 
     def _generate_and_display_summary(self):
-        """Busca dados, processa (incluindo média/DP por VOLTA, status na colocação) e exibe o resumo."""
+        """Agenda o resumo processado da competição (em segundo plano, em cache até o banco mudar); exibido em _display_summary."""
         if self.current_meet_id is None: return
-        self.last_summary_data = None; conn = None
-        try:
-            conn = get_db_connection(self.db_path)
-            if not conn: QMessageBox.critical(self, "Erro DB", f"Não foi possível conectar: {self.db_path}"); return
+        self.last_summary_data = None
+        self.query_runner.submit(self._load_meet_summary, self.current_meet_id, on_result=self._display_summary, on_error=self._show_summary_error)
 
-            # 1. Buscar dados
-            headers, results_data = fetch_results_for_meet_summary(conn, self.current_meet_id)
-            top3_raw_data = fetch_top3_for_meet(conn, self.current_meet_id)
-            splits_raw_data = fetch_splits_for_meet(conn, self.current_meet_id)
+    def _load_meet_summary(self, meet_id):
+        return get_or_compute('meet_summary', self.db_path, (meet_id,), lambda: self._compute_meet_summary(meet_id))
 
-            if not headers: self._clear_summary(); return
+    def _display_summary(self, summary):
+        """Exibe o resumo recebido e habilita gráficos/exportações."""
+        if summary is None: self._clear_summary(); self.btn_export_pdf.setEnabled(False); return
 
-            # Encontrar índices
-            try:
-                result_id_idx = headers.index('result_id_lenex'); athlete_idx = headers.index('Atleta'); birth_idx = headers.index('AnoNasc'); event_idx = headers.index('Prova'); place_idx = headers.index('Colocacao'); time_idx = headers.index('Tempo'); status_idx = headers.index('Status'); event_db_id_idx = headers.index('event_db_id'); agegroup_db_id_idx = headers.index('agegroup_db_id')
-            except ValueError as e: QMessageBox.critical(self, "Erro Interno", f"Coluna não encontrada: {e}"); self._clear_summary(); return
-
-            # 2. Processar Dados
-            gold_count = 0; silver_count = 0; bronze_count = 0
-            athletes_per_event = Counter(); medals_per_event = defaultdict(lambda: defaultdict(int))
-            athlete_table_data = []; top3_lookup = defaultdict(dict)
-
-            # Construir lookup do Top3
-            for t3_event, t3_ag, t3_place, t3_time in top3_raw_data: top3_lookup[(t3_event, t3_ag)][t3_place] = t3_time
-
-            # Processar Parciais (tempos acumulados em segundos)
-            splits_lookup = defaultdict(list)
-            for split_res_id, _, split_time_str in splits_raw_data:
-                split_sec = time_to_seconds(split_time_str)
-                if split_sec is not None: splits_lookup[split_res_id].append(split_sec)
-
-            # Iterar sobre os resultados do clube
-            for row_idx, row in enumerate(results_data):
-                result_id = row[result_id_idx]; place = row[place_idx]; status = row[status_idx]; event_desc = row[event_idx]; event_db_id = row[event_db_id_idx]; ag_db_id = row[agegroup_db_id_idx]; athlete_time_str = row[time_idx]; athlete_name = row[athlete_idx]
-
-                # Determinar valor da Colocação/Status
-                display_colocacao = "N/A"; is_valid_result = status is None or status.upper() == 'OK' or status.upper() == 'OFFICIAL'
-                if not is_valid_result and status: display_colocacao = status.upper()
-                elif place is not None: display_colocacao = str(place)
-
-                # Contagens
-                if is_valid_result:
-                    if place == 1: gold_count += 1
-                    elif place == 2: silver_count += 1
-                    elif place == 3: bronze_count += 1
-                if event_desc: athletes_per_event[event_desc] += 1
-                if is_valid_result and event_desc and place in [1, 2, 3]: medals_per_event[event_desc][place] += 1
-
-                # Lookup Top3 e cálculo de diferenças
-                top3_times_for_event = top3_lookup.get((event_db_id, ag_db_id), {}); top1_time_str = top3_times_for_event.get(1); top2_time_str = top3_times_for_event.get(2); top3_time_str = top3_times_for_event.get(3)
-                athlete_secs = time_to_seconds(athlete_time_str); diff1_str = "N/A"; diff2_str = "N/A"; diff3_str = "N/A"
-                if athlete_secs is not None:
-                    top1_secs = time_to_seconds(top1_time_str); top2_secs = time_to_seconds(top2_time_str); top3_secs = time_to_seconds(top3_time_str)
-                    if top1_secs is not None: diff1_str = format_time_diff(athlete_secs - top1_secs)
-                    if top2_secs is not None: diff2_str = format_time_diff(athlete_secs - top2_secs)
-                    if top3_secs is not None: diff3_str = format_time_diff(athlete_secs - top3_secs)
-
-                # Calcular TEMPOS DE VOLTA, MÉDIA e DP
-                cumulative_splits_sec = splits_lookup.get(result_id, [])
-                lap_times_sec = [] # <<< Armazenar tempos de volta aqui
-                media_lap_str = "N/A"; dp_lap_str = "N/A"
-                last_cumulative_split = 0.0
-
-                if cumulative_splits_sec:
-                    previous_split_sec = 0.0
-                    for current_split_sec in cumulative_splits_sec:
-                        lap_time = current_split_sec - previous_split_sec
-                        if lap_time >= 0: lap_times_sec.append(lap_time)
-                        previous_split_sec = current_split_sec
-                    last_cumulative_split = previous_split_sec
-
-                if athlete_secs is not None and last_cumulative_split >= 0 and cumulative_splits_sec:
-                    last_lap_time = athlete_secs - last_cumulative_split
-                    if last_lap_time >= 0: lap_times_sec.append(last_lap_time)
-                elif not cumulative_splits_sec and athlete_secs is not None:
-                     lap_times_sec.append(athlete_secs)
-
-                if lap_times_sec:
-                    try: media = statistics.mean(lap_times_sec); media_lap_str = f"{media:.2f}"
-                    except statistics.StatisticsError: media_lap_str = "N/A"
-                    if len(lap_times_sec) >= 2:
-                        try: 
-                            stdev = statistics.stdev(lap_times_sec);
-                            if not math.isnan(stdev): dp_lap_str = f"{stdev:.2f}"
-                            else: dp_lap_str = "0.00"
-                        except statistics.StatisticsError: 
-                            dp_lap_str = "N/A"
-                    elif len(lap_times_sec) == 1: dp_lap_str = "0.00"
-
-                # Adiciona os dados ao dicionário (com Lap Times)
-                athlete_table_data.append({
-                    "Atleta": athlete_name, "AnoNasc": row[birth_idx], "Prova": event_desc,
-                    "Colocação": display_colocacao,
-                    "Tempo": athlete_time_str or "N/A",
-                    "Média Lap": media_lap_str,
-                    "DP Lap": dp_lap_str,
-                    "Lap Times": lap_times_sec, # <<< Armazena a lista de tempos
-                    "vs Top3": diff3_str, "vs Top2": diff2_str, "vs Top1": diff1_str
-                })
-
-            # 3. Atualizar a UI
-            self.lbl_medals_gold.setText(f"Ouro: {gold_count}"); self.lbl_medals_silver.setText(f"Prata: {silver_count}"); self.lbl_medals_bronze.setText(f"Bronze: {bronze_count}")
-            athletes_event_str = "\n".join([f"{count} - {event}" for event, count in athletes_per_event.most_common()]); self.txt_athletes_per_event.setPlainText(athletes_event_str or "Nenhum atleta encontrado.")
-            medals_event_str = "";
-            for event, medals in sorted(medals_per_event.items()): g = medals.get(1, 0); s = medals.get(2, 0); b = medals.get(3, 0);
-            if g > 0 or s > 0 or b > 0: medals_event_str += f"{event}: {g} Ouro, {s} Prata, {b} Bronze\n"
-            self.txt_medals_per_event.setPlainText(medals_event_str or "Nenhuma medalha encontrada.")
-            
-            # --- VERIFIQUE/RESTAURE ESTA SEÇÃO ---
-            medals_event_str = "";
-            for event, medals in sorted(medals_per_event.items()):
-                g = medals.get(1, 0); s = medals.get(2, 0); b = medals.get(3, 0);
-                if g > 0 or s > 0 or b > 0:
-                     medals_event_str += f"{event}: {g} Ouro, {s} Prata, {b} Bronze\n"
-            # Certifique-se que a linha abaixo existe e está correta:
-            self.txt_medals_per_event.setPlainText(medals_event_str or "Nenhuma medalha encontrada.")
-            # --- FIM DA VERIFICAÇÃO ---
-            
-            self._update_athlete_table(athlete_table_data) # Chama o método atualizado
-
-            # Guarda os dados processados para exportação
-            self.last_summary_data = {"gold": gold_count, "silver": silver_count, "bronze": bronze_count, "athletes_per_event_str": athletes_event_str or "Nenhum atleta encontrado.", "medals_per_event_str": medals_event_str or "Nenhuma medalha encontrada.", "athlete_details": athlete_table_data}
-            return True # Indica sucesso
-
-        except sqlite3.Error as e: QMessageBox.critical(self, "Erro DB", f"Erro ao gerar resumo:\n{e}"); self._clear_summary()
-        except Exception as e: QMessageBox.critical(self, "Erro", f"Erro inesperado ao gerar resumo:\n{e}"); import traceback; print(traceback.format_exc()); self._clear_summary()
-        finally:
-            if conn: conn.close()
-        
-        return False # Indica falha
+        # Atualizar a UI
+        self.lbl_medals_gold.setText(f"Ouro: {summary['gold']}"); self.lbl_medals_silver.setText(f"Prata: {summary['silver']}"); self.lbl_medals_bronze.setText(f"Bronze: {summary['bronze']}")
+        self.txt_athletes_per_event.setPlainText(summary['athletes_per_event_str'])
+        self.txt_medals_per_event.setPlainText(summary['medals_per_event_str'])
+        self._update_athlete_table(summary['athlete_details']) # Chama o método atualizado
+
+        # Guarda os dados processados para exportação
+        self.last_summary_data = summary
+        self._populate_event_graph_combo() # Popula combo de eventos para gráfico
+        self._populate_scatter_event_combo() # Popula combo de eventos para scatter
+
+        # Habilita botões de exportação (PDF depende das libs; CSV só precisa do resumo)
+        self.btn_export_pdf.setEnabled(REPORTLAB_AVAILABLE and MATPLOTLIB_AVAILABLE)
+        self.btn_export_csv.setEnabled(True)
+
+    def _show_summary_error(self, error, tb):
+        if isinstance(error, sqlite3.Error): QMessageBox.critical(self, "Erro DB", f"Erro ao gerar resumo:\n{error}")
+        else: QMessageBox.critical(self, "Erro", f"Erro inesperado ao gerar resumo:\n{error}")
+        self._clear_summary(); self.btn_export_pdf.setEnabled(False)
+
+    def _compute_meet_summary(self, meet_id):
+        """Busca e processa os dados do resumo (média/DP por VOLTA, status na colocação). None se não houver dados."""
+        conn = get_read_connection(self.db_path)
+        if not conn: raise sqlite3.Error(f"Não foi possível conectar: {self.db_path}")
 
-    # --- NOVA FUNÇÃO: Gerar Sparkline (copiada de view_data_tab) ---
-    def _generate_sparkline_pixmap(self, lap_times, width_px=80, height_px=20):
-        """Gera um QPixmap de um sparkline para os tempos de volta."""
-        if not MATPLOTLIB_AVAILABLE or not lap_times:
-            return None
+        # 1. Buscar dados
+        headers, results_data = fetch_results_for_meet_summary(conn, meet_id)
+        top3_raw_data = fetch_top3_for_meet(conn, meet_id)
+        split_ids, _, split_secs = fetch_split_arrays_for_meet(conn, meet_id, as_seconds=True) # SplitCM + SplitPacked
+
+        if not headers: return None
+
+        # Encontrar índices
         try:
-            fig, ax = plt.subplots(figsize=(width_px / 72, height_px / 72), dpi=72)
-            fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
-            ax.plot(range(len(lap_times)), lap_times, color='blue', linewidth=1.0)
-            if len(lap_times) > 0:
-                mean_time = statistics.mean(lap_times)
-                ax.axhline(mean_time, color='red', linestyle='--', linewidth=0.5)
-            ax.axis('off')
-            buf = io.BytesIO()
-            fig.savefig(buf, format='png', transparent=True)
-            buf.seek(0)
-            pixmap = QPixmap()
-            pixmap.loadFromData(buf.read())
-            plt.close(fig)
-            return pixmap
-        except Exception as e:
-            print(f"Erro ao gerar sparkline: {e}")
-            try:
-                if 'fig' in locals() and fig: plt.close(fig)
-            except: pass
-            return None
-    # --- FIM DA NOVA FUNÇÃO ---
+            result_id_idx = headers.index('result_id_lenex'); athlete_idx = headers.index('Atleta'); birth_idx = headers.index('AnoNasc'); event_idx = headers.index('Prova'); place_idx = headers.index('Colocacao'); time_idx = headers.index('Tempo'); status_idx = headers.index('Status'); event_db_id_idx = headers.index('event_db_id'); agegroup_db_id_idx = headers.index('agegroup_db_id')
+        except ValueError as e: raise ValueError(f"Coluna não encontrada: {e}")
+
+        # 2. Processar Dados
+        gold_count = 0; silver_count = 0; bronze_count = 0
+        athletes_per_event = Counter(); medals_per_event = defaultdict(lambda: defaultdict(int))
+        athlete_table_data = []; top3_lookup = defaultdict(dict)
+
+        # Construir lookup do Top3
+        for t3_event, t3_ag, t3_place, t3_time in top3_raw_data: top3_lookup[(t3_event, t3_ag)][t3_place] = t3_time
+
+        # Voltas/média/DP de todos os resultados de uma vez (parciais acumuladas em segundos)
+        pacing = compute_pacing([row[result_id_idx] for row in results_data], times_to_seconds([row[time_idx] for row in results_data]), split_ids, split_secs)
+
+        # Iterar sobre os resultados do clube
+        for row_idx, row in enumerate(results_data):
+            place = row[place_idx]; status = row[status_idx]; event_desc = row[event_idx]; event_db_id = row[event_db_id_idx]; ag_db_id = row[agegroup_db_id_idx]; athlete_time_str = row[time_idx]; athlete_name = row[athlete_idx]
+
+            # Determinar valor da Colocação/Status
+            display_colocacao = "N/A"; is_valid_result = status is None or status.upper() == 'OK' or status.upper() == 'OFFICIAL'
+            if not is_valid_result and status: display_colocacao = status.upper()
+            elif place is not None: display_colocacao = str(place)
+
+            # Contagens
+            if is_valid_result:
+                if place == 1: gold_count += 1
+                elif place == 2: silver_count += 1
+                elif place == 3: bronze_count += 1
+            if event_desc: athletes_per_event[event_desc] += 1
+            if is_valid_result and event_desc and place in [1, 2, 3]: medals_per_event[event_desc][place] += 1
+
+            # Lookup Top3 e cálculo de diferenças
+            top3_times_for_event = top3_lookup.get((event_db_id, ag_db_id), {}); top1_time_str = top3_times_for_event.get(1); top2_time_str = top3_times_for_event.get(2); top3_time_str = top3_times_for_event.get(3)
+            athlete_secs = time_to_seconds(athlete_time_str); diff1_str = "N/A"; diff2_str = "N/A"; diff3_str = "N/A"
+            if athlete_secs is not None:
+                top1_secs = time_to_seconds(top1_time_str); top2_secs = time_to_seconds(top2_time_str); top3_secs = time_to_seconds(top3_time_str)
+                if top1_secs is not None: diff1_str = format_time_diff(athlete_secs - top1_secs)
+                if top2_secs is not None: diff2_str = format_time_diff(athlete_secs - top2_secs)
+                if top3_secs is not None: diff3_str = format_time_diff(athlete_secs - top3_secs)
+
+            # Calcular TEMPOS DE VOLTA, MÉDIA e DP
+            lap_times_sec = pacing.laps(row_idx); media_lap_str = format_lap_stat(pacing.mean[row_idx]); dp_lap_str = format_lap_stat(pacing.stdev[row_idx])
+
+            # Adiciona os dados ao dicionário (com Lap Times)
+            athlete_table_data.append({
+                "Atleta": athlete_name, "AnoNasc": row[birth_idx], "Prova": event_desc,
+                "Colocação": display_colocacao,
+                "Tempo": athlete_time_str or "N/A",
+                "Média Lap": media_lap_str,
+                "DP Lap": dp_lap_str,
+                "Lap Times": lap_times_sec, # <<< Armazena a lista de tempos
+                "vs Top3": diff3_str, "vs Top2": diff2_str, "vs Top1": diff1_str
+            })
+
+        athletes_event_str = "\n".join([f"{count} - {event}" for event, count in athletes_per_event.most_common()])
+        medals_event_str = ""
+        for event, medals in sorted(medals_per_event.items()):
+            g = medals.get(1, 0); s = medals.get(2, 0); b = medals.get(3, 0)
+            if g > 0 or s > 0 or b > 0:
+                medals_event_str += f"{event}: {g} Ouro, {s} Prata, {b} Bronze\n"
+        return {"gold": gold_count, "silver": silver_count, "bronze": bronze_count, "athletes_per_event_str": athletes_event_str or "Nenhum atleta encontrado.", "medals_per_event_str": medals_event_str or "Nenhuma medalha encontrada.", "athlete_details": athlete_table_data}
 
     def _update_athlete_table(self, table_data):
-        """Popula a tabela de detalhes dos atletas, incluindo sparkline."""
-        self.table_athletes.setRowCount(0);
-        if not table_data: return
-        # Cabeçalhos com "Ritmo"
-        headers = ["Atleta", "AnoNasc", "Prova", "Colocação", "Tempo",
-                   "Média Lap", "DP Lap", "Ritmo", "Parciais", # <<< Novos Cabeçalhos
-                   "vs Top3", "vs Top2", "vs Top1"]
-        self.table_athletes.setColumnCount(len(headers)); self.table_athletes.setHorizontalHeaderLabels(headers)
-        self.table_athletes.setRowCount(len(table_data)); bold_font = QFont(); bold_font.setBold(True)
-
-        # Mapeamento de cabeçalho para chave do dicionário
-        # Mapeia "Ritmo" e "Parciais" para a mesma fonte de dados "Lap Times"
-        header_to_key_map = {h: h for h in headers}
-        header_to_key_map["Ritmo"] = "Lap Times"
-        header_to_key_map["Parciais"] = "Lap Times" # <<< ADICIONAR ESTA LINHA
-
-        for row_idx, row_dict in enumerate(table_data):
-            col_idx = 0; athlete_place_str = row_dict.get("Colocação", "")
-            for key in headers:
-                dict_key = header_to_key_map[key]
-                value = row_dict.get(dict_key, "")
-
-                # --- Lógica para Sparkline ---
-                if key == "Ritmo":
-                    self.table_athletes.setCellWidget(row_idx, col_idx, None) # Limpa célula
-                    lap_times = value # Lista de tempos
-                    pixmap = self._generate_sparkline_pixmap(lap_times)
-                    if pixmap:
-                        label = QLabel()
-                        label.setPixmap(pixmap)
-                        label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-                        self.table_athletes.setCellWidget(row_idx, col_idx, label)
-                    else:
-                        item = QTableWidgetItem("N/A")
-                        item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                        self.table_athletes.setItem(row_idx, col_idx, item)
-                # --- Lógica para Parciais (Texto) ---
-                elif key == "Parciais":
-                    self.table_athletes.setCellWidget(row_idx, col_idx, None) # Limpa célula
-                    lap_times = value # Lista de tempos
-                    if lap_times:
-                        # Formata a lista como string: "30.12, 32.50, ..."
-                        parciais_str = "; ".join([f"{t:.2f}" for t in lap_times])
-                        item = QTableWidgetItem(parciais_str)
-                    else:
-                        item = QTableWidgetItem("N/A")
-                    self.table_athletes.setItem(row_idx, col_idx, item)
-                # --- Fim da Lógica Sparkline ---
-                else:
-                    # Outras colunas
-                    self.table_athletes.setCellWidget(row_idx, col_idx, None) # Limpa célula
-                    item = QTableWidgetItem(str(value))
-                    # Formatação
-                    if key == "vs Top1" and athlete_place_str == "1": item.setFont(bold_font)
-                    elif key == "vs Top2" and athlete_place_str == "2": item.setFont(bold_font)
-                    elif key == "vs Top3" and athlete_place_str == "3": item.setFont(bold_font)
-                    if key == "Colocação" and not str(value).isdigit() and str(value) != "N/A": item.setForeground(Qt.GlobalColor.red)
-                    self.table_athletes.setItem(row_idx, col_idx, item)
-
-                col_idx += 1
-
-        self.table_athletes.resizeColumnsToContents()
-        # Ajustar largura da coluna Sparkline
-        try:
-            sparkline_col_index = headers.index("Ritmo")
-            self.table_athletes.setColumnWidth(sparkline_col_index, 90)
-            # Ajustar largura da coluna Parciais também
-            parciais_col_index = headers.index("Parciais")
-            # Pode precisar de mais largura dependendo do número de parciais
-            self.table_athletes.setColumnWidth(parciais_col_index, 120)
-        except ValueError: pass
+        """Exibe os detalhes dos atletas; células geradas só para as linhas visíveis (Ritmo desenhado pelo delegate)."""
+        self.table_athletes.set_rows(table_data or [])
 
     def _clear_summary(self):
         self.lbl_medals_gold.setText("Ouro: 0"); self.lbl_medals_silver.setText("Prata: 0"); self.lbl_medals_bronze.setText("Bronze: 0")
-        self.txt_athletes_per_event.clear(); self.txt_medals_per_event.clear(); self.table_athletes.setRowCount(0); self.table_athletes.setColumnCount(0)
+        self.txt_athletes_per_event.clear(); self.txt_medals_per_event.clear(); self.table_athletes.clear()
         self.last_summary_data = None; self.last_meet_name = ""
         # Limpa também a seção do gráfico de evento
         self.combo_event_graph.clear(); self.combo_event_graph.addItem("--- Selecione Prova ---"); self.combo_event_graph.setEnabled(False)
@@ -590,31 +442,11 @@ class MeetSummaryTab(QWidget):
     def refresh_data(self):
         print("MeetSummaryTab: Recebido sinal para refresh_data."); self._populate_meet_combo()
 
-    # --- NOVA FUNÇÃO: Gerar Sparkline para PDF ---
+    # --- Sparkline para PDF (cache compartilhado em core.plotting) ---
     def _generate_sparkline_pdf_image(self, lap_times, width_px=80, height_px=20):
         """Gera dados de imagem PNG de um sparkline para o PDF."""
-        if not MATPLOTLIB_AVAILABLE or not lap_times:
-            return None
-        try:
-            fig, ax = plt.subplots(figsize=(width_px / 72, height_px / 72), dpi=72)
-            fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
-            ax.plot(range(len(lap_times)), lap_times, color='blue', linewidth=2)
-            if len(lap_times) > 0:
-                mean_time = statistics.mean(lap_times)
-                ax.axhline(mean_time, color='red', linestyle='--', linewidth=1.5)
-            ax.axis('off')
-            buf = io.BytesIO()
-            fig.savefig(buf, format='png', transparent=True)
-            plt.close(fig)
-            buf.seek(0)
-            return buf # Retorna o buffer BytesIO
-        except Exception as e:
-            print(f"Erro ao gerar sparkline para PDF: {e}")
-            try:
-                if 'fig' in locals() and fig: plt.close(fig)
-            except: pass
-            return None
-    # --- FIM DA NOVA FUNÇÃO ---
+        return sparkline_png_buffer(lap_times, width_px, height_px, line_width=2, mean_line_width=1.5)
+    # --- FIM Sparkline para PDF ---
 
     # --- NOVAS FUNÇÕES PARA GRÁFICO DE EVENTO ---
     def _populate_event_graph_combo(self):
@@ -0,0 +1,335 @@
+# NadosApp/widgets/results_table.py
+"""Tabela de resultados compartilhada pelas abas (Visualizar Dados, Resumo Competição, Relatório Atleta/Estilo).
+
+Substitui a QTableWidget com um QTableWidgetItem/QLabel por célula:
+
+- ResultsTableModel: guarda os dicts processados da aba em arrays por coluna; o texto, a fonte e a cor de
+  uma célula só são gerados quando a view pede aquela célula (linhas visíveis).
+- SortedRowsProxy: ordenação por clique no cabeçalho via uma permutação calculada com NumPy sobre chaves
+  numéricas pré-calculadas por coluna (tempos/diferenças em segundos, ano/colocação como inteiros,
+  Ritmo/Parciais pela média das voltas, texto pelo posto alfabético). Valores ausentes ('N/A') ficam no final.
+- SparklineDelegate: desenha o sparkline da coluna Ritmo com QPainter a partir da lista de voltas, no
+  próprio paint da célula (sem figura do matplotlib, PNG ou QLabel por linha).
+- ResultsTableView: a QTableView já configurada como as tabelas antigas; `set_rows(dicts)` troca os dados.
+  No carregamento em páginas, `append_rows(dicts)` acrescenta cada página no final e `finish_rows()` reaplica a
+  ordenação escolhida durante o carregamento (as páginas que chegaram depois dela ficaram no fim).
+
+    self.table_widget = ResultsTableView(["Atleta", "Prova", "Tempo", "Ritmo", "Parciais"])
+    self.table_widget.set_rows(self.current_table_data)
+"""
+import os
+import sys
+
+import numpy as np
+from PySide6.QtCore import Qt, QAbstractTableModel, QAbstractProxyModel, QModelIndex, QPointF, QRectF, QSize
+from PySide6.QtGui import QFont, QColor, QPainter, QPen, QPolygonF
+from PySide6.QtWidgets import QTableView, QAbstractItemView, QStyledItemDelegate, QStyleOptionViewItem, QStyle, QApplication
+
+# Adiciona o diretório pai
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(script_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from utils.helpers import time_to_seconds
+
+SPARKLINE_COLUMN = "Ritmo"    # Coluna desenhada a partir da lista de voltas
+SPLITS_COLUMN = "Parciais"    # Lista de voltas como texto ("30.12; 32.50")
+# Cabeçalho -> chave do dict da linha (as demais colunas usam o próprio cabeçalho)
+HEADER_KEYS = {SPARKLINE_COLUMN: "Lap Times", SPLITS_COLUMN: "Lap Times"}
+# Diferença em negrito quando o atleta ficou naquela colocação
+BOLD_PLACE_COLUMNS = {"vs Top1": "1", "vs Top2": "2", "vs Top3": "3"}
+# Tipo da chave de ordenação por cabeçalho (o padrão é 'text')
+SORT_KINDS = {
+    "Tempo": 'time', "Média Lap": 'time', "DP Lap": 'time',
+    "vs Top1": 'time', "vs Top2": 'time', "vs Top3": 'time', "Dif. 1º": 'time', "Dif. 2º": 'time', "Dif. 3º": 'time',
+    "AnoNasc": 'int', "Colocação": 'int',
+    SPARKLINE_COLUMN: 'laps', SPLITS_COLUMN: 'laps',
+}
+MISSING_TEXTS = frozenset(("", "N/A", "None"))
+FIXED_COLUMN_WIDTHS = {SPARKLINE_COLUMN: 90, SPLITS_COLUMN: 120}
+RESIZE_SAMPLE_ROWS = 200 # Linhas consideradas no ajuste de largura das colunas (a antiga medição percorria todas)
+LAP_TIMES_ROLE = Qt.ItemDataRole.UserRole + 1 # Lista de voltas (segundos) da linha, lida pelo SparklineDelegate
+SPARKLINE_SIZE = (80, 20)  # Largura/altura (px) do sparkline, as mesmas das imagens do matplotlib
+SPARKLINE_MARGIN = 0.05    # Folga em cada borda, como as margens padrão dos eixos do matplotlib
+
+
+def format_laps(lap_times):
+    """Voltas como texto, como na coluna Parciais: '30.12; 32.50' ou 'N/A'."""
+    if not lap_times: return "N/A"
+    return "; ".join(f"{t:.2f}" for t in lap_times)
+
+
+def _signed_seconds(value):
+    """Tempo ('1:02.30') ou diferença ('+1.23s', '-0.50s') em segundos; NaN se não for um tempo."""
+    text = str(value).strip().rstrip('s'); sign = 1.0
+    if text[:1] in ('+', '-'): sign = -1.0 if text[0] == '-' else 1.0; text = text[1:]
+    seconds = time_to_seconds(text)
+    return sign * seconds if seconds is not None else np.nan
+
+
+def _numeric_key(kind, value):
+    if kind == 'time': return _signed_seconds(value)
+    if kind == 'int':
+        try: return float(int(value))
+        except (ValueError, TypeError): return np.nan
+    if kind == 'laps': return sum(value) / len(value) if value else np.nan
+    return 0.0
+
+
+def column_sort_keys(header, values):
+    """(ausente, chave numérica, posto do texto) de uma coluna, para np.lexsort.
+
+    Na mesma coluna, valores numéricos vêm antes dos textos (ex.: colocação 1, 2, ... e depois 'DSQ')."""
+    kind = SORT_KINDS.get(header, 'text'); n = len(values)
+    texts = [format_laps(v) if isinstance(v, (list, tuple)) else str(v) for v in values]
+    missing = np.fromiter((t in MISSING_TEXTS for t in texts), dtype=bool, count=n)
+    primary = np.fromiter((_numeric_key(kind, v) for v in values), dtype=np.float64, count=n)
+    primary[np.isnan(primary)] = np.inf
+    if n: _, secondary = np.unique(np.array([t.lower() for t in texts]), return_inverse=True)
+    else: secondary = np.empty(0, dtype=np.int64)
+    return missing, primary, secondary.astype(np.float64)
+
+
+class ResultsTableModel(QAbstractTableModel):
+    """Modelo somente leitura sobre a lista de dicts processados de uma aba, guardada por coluna."""
+    def __init__(self, headers, parent=None):
+        super().__init__(parent)
+        self.headers = list(headers)
+        self._keys = [HEADER_KEYS.get(h, h) for h in self.headers]
+        self._place_col = self.headers.index("Colocação") if "Colocação" in self.headers else None
+        self._bold_font = QFont(); self._bold_font.setBold(True)
+        self._red = QColor(Qt.GlobalColor.red)
+        self._rows = []; self._columns = [[] for _ in self.headers]
+        self._sort_keys = {}
+
+    def set_rows(self, rows):
+        """Troca todos os dados (lista de dicts com as chaves dos cabeçalhos)."""
+        self.beginResetModel()
+        self._rows = list(rows)
+        self._columns = [[row.get(key, "") for row in self._rows] for key in self._keys]
+        self._sort_keys = {}
+        self.endResetModel()
+
+    def append_rows(self, rows):
+        """Acrescenta linhas no final (carregamento em páginas); as chaves de ordenação são recalculadas na próxima ordenação."""
+        rows = list(rows)
+        if not rows: return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self._rows.extend(rows)
+        for column, key in zip(self._columns, self._keys): column.extend(row.get(key, "") for row in rows)
+        self._sort_keys = {}
+        self.endInsertRows()
+
+    def rows(self):
+        return self._rows
+
+    def row_dict(self, row):
+        return self._rows[row]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole and 0 <= section < len(self.headers):
+            return self.headers[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid(): return None
+        row = index.row(); col = index.column(); header = self.headers[col]; value = self._columns[col][row]
+        if role == Qt.ItemDataRole.DisplayRole:
+            if header == SPARKLINE_COLUMN: return None if value else "N/A" # Sem voltas: texto no lugar do gráfico
+            if header == SPLITS_COLUMN: return format_laps(value)
+            return str(value)
+        if header == SPARKLINE_COLUMN:
+            if role == LAP_TIMES_ROLE: return value
+            if role == Qt.ItemDataRole.TextAlignmentRole: return Qt.AlignmentFlag.AlignCenter
+            return None
+        if role == Qt.ItemDataRole.FontRole and header in BOLD_PLACE_COLUMNS and self._place_col is not None:
+            return self._bold_font if str(self._columns[self._place_col][row]) == BOLD_PLACE_COLUMNS[header] else None
+        if role == Qt.ItemDataRole.ForegroundRole and col == self._place_col:
+            text = str(value); return self._red if not text.isdigit() and text != "N/A" else None
+        return None
+
+    def sort_permutation(self, column, order):
+        """Linhas do modelo na ordem da coluna (chaves calculadas uma vez por coluna e reaproveitadas)."""
+        keys = self._sort_keys.get(column)
+        if keys is None: keys = self._sort_keys[column] = column_sort_keys(self.headers[column], self._columns[column])
+        missing, primary, secondary = keys
+        if order == Qt.SortOrder.DescendingOrder: return np.lexsort((-secondary, -primary, missing))
+        return np.lexsort((secondary, primary, missing))
+
+
+class SortedRowsProxy(QAbstractProxyModel):
+    """Proxy de ordenação por permutação de linhas (sem comparações linha a linha em Python)."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._order = None; self._inverse = None # None = ordem do modelo (a da consulta)
+        self._sort_column = -1; self._sort_order = Qt.SortOrder.AscendingOrder
+
+    def setSourceModel(self, model):
+        super().setSourceModel(model)
+        model.modelAboutToBeReset.connect(self.beginResetModel)
+        model.modelReset.connect(self._on_source_reset)
+        model.rowsAboutToBeInserted.connect(self._on_source_rows_about_to_be_inserted)
+        model.rowsInserted.connect(self._on_source_rows_inserted)
+
+    def _on_source_reset(self):
+        self._order = None; self._inverse = None; self._sort_column = -1
+        self.endResetModel()
+
+    def _on_source_rows_about_to_be_inserted(self, parent, first, last):
+        # O modelo só acrescenta no final (append_rows): as linhas novas entram no fim da view mesmo com ordenação
+        count = self.rowCount(); self.beginInsertRows(QModelIndex(), count, count + last - first)
+
+    def _on_source_rows_inserted(self, parent, first, last):
+        if self._order is not None:
+            new_rows = np.arange(first, last + 1, dtype=self._order.dtype)
+            self._inverse = np.concatenate((self._inverse, np.arange(len(self._order), len(self._order) + len(new_rows), dtype=self._inverse.dtype)))
+            self._order = np.concatenate((self._order, new_rows))
+        self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() or self.sourceModel() is None else self.sourceModel().rowCount()
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() or self.sourceModel() is None else self.sourceModel().columnCount()
+
+    def index(self, row, column, parent=QModelIndex()):
+        if parent.isValid() or not (0 <= row < self.rowCount() and 0 <= column < self.columnCount()): return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=QModelIndex()):
+        return QModelIndex()
+
+    def source_row(self, row):
+        return int(self._order[row]) if self._order is not None else row
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid() or self.sourceModel() is None: return QModelIndex()
+        return self.sourceModel().index(self.source_row(proxy_index.row()), proxy_index.column())
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid(): return QModelIndex()
+        row = source_index.row()
+        return self.index(int(self._inverse[row]) if self._inverse is not None else row, source_index.column())
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        return self.sourceModel().headerData(section, orientation, role) if self.sourceModel() is not None else None
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        source = self.sourceModel()
+        if source is None: return
+        if column == self._sort_column and order == self._sort_order: return # sortByColumn chama sort() duas vezes
+        self.layoutAboutToBeChanged.emit()
+        old_indexes = self.persistentIndexList(); old_sources = [self.mapToSource(i) for i in old_indexes] # Mantém a seleção
+        if column < 0 or column >= source.columnCount() or source.rowCount() == 0:
+            self._order = None; self._inverse = None
+        else:
+            self._order = source.sort_permutation(column, order)
+            self._inverse = np.empty_like(self._order); self._inverse[self._order] = np.arange(len(self._order))
+        self._sort_column = column; self._sort_order = order
+        self.changePersistentIndexList(old_indexes, [self.mapFromSource(i) for i in old_sources])
+        self.layoutChanged.emit()
+
+    def refresh_sort(self):
+        """Reaplica a ordenação atual (depois de linhas acrescentadas no final)."""
+        if self._sort_column < 0: return
+        column, order = self._sort_column, self._sort_order
+        self._sort_column = -1; self.sort(column, order)
+
+    def rows_in_view_order(self):
+        """Dicts das linhas na ordem exibida."""
+        source = self.sourceModel()
+        return [source.row_dict(self.source_row(r)) for r in range(self.rowCount())]
+
+
+def sparkline_points(lap_times, rect):
+    """Pontos da linha das voltas e o y da média dentro de `rect` (QRectF), com a escala do gráfico antigo:
+    eixos ajustados aos dados com SPARKLINE_MARGIN de folga e volta mais lenta em cima."""
+    n = len(lap_times); lo = min(lap_times); hi = max(lap_times); mean = sum(lap_times) / n
+    if hi - lo <= 0: lo -= 1.0; hi += 1.0 # Voltas iguais: linha no meio
+    pad = (hi - lo) * SPARKLINE_MARGIN; lo -= pad; hi += pad
+    x_pad = (n - 1) * SPARKLINE_MARGIN; x_span = (n - 1) + 2 * x_pad
+    def to_y(value): return rect.bottom() - (value - lo) / (hi - lo) * rect.height()
+    points = [QPointF(rect.left() + ((i + x_pad) / x_span if x_span else 0.5) * rect.width(), to_y(t)) for i, t in enumerate(lap_times)]
+    return points, to_y(mean)
+
+
+class SparklineDelegate(QStyledItemDelegate):
+    """Sparkline das voltas (linha azul + média tracejada em vermelho) desenhado direto no paint da célula."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._line_pen = QPen(QColor(Qt.GlobalColor.blue), 0.8)
+        self._mean_pen = QPen(QColor(Qt.GlobalColor.red), 0.5, Qt.PenStyle.DashLine)
+
+    def paint(self, painter, option, index):
+        lap_times = index.data(LAP_TIMES_ROLE)
+        if not lap_times: super().paint(painter, option, index); return # "N/A"
+        opt = QStyleOptionViewItem(option); self.initStyleOption(opt, index)
+        style = opt.widget.style() if opt.widget else QApplication.style()
+        style.drawPrimitive(QStyle.PrimitiveElement.PE_PanelItemViewItem, opt, painter, opt.widget) # Fundo/seleção
+        width = min(SPARKLINE_SIZE[0], option.rect.width() - 2); height = min(SPARKLINE_SIZE[1], option.rect.height() - 2)
+        if width <= 2 or height <= 2: return
+        rect = QRectF(0, 0, width, height); rect.moveCenter(QRectF(option.rect).center())
+        points, mean_y = sparkline_points(lap_times, rect)
+        painter.save(); painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        if len(points) > 1: painter.setPen(self._line_pen); painter.drawPolyline(QPolygonF(points))
+        painter.setPen(self._mean_pen); painter.drawLine(QPointF(rect.left(), mean_y), QPointF(rect.right(), mean_y))
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        if index.data(LAP_TIMES_ROLE): return QSize(*SPARKLINE_SIZE)
+        return super().sizeHint(option, index)
+
+
+class ResultsTableView(QTableView):
+    """QTableView somente leitura com ResultsTableModel + SortedRowsProxy (+ SparklineDelegate na coluna Ritmo)."""
+    def __init__(self, headers, parent=None):
+        super().__init__(parent)
+        self.results_model = ResultsTableModel(headers, self)
+        self.sort_proxy = SortedRowsProxy(self); self.sort_proxy.setSourceModel(self.results_model)
+        self.setModel(self.sort_proxy)
+        self.sparkline_delegate = SparklineDelegate(self)
+        if SPARKLINE_COLUMN in self.headers: self.setItemDelegateForColumn(self.headers.index(SPARKLINE_COLUMN), self.sparkline_delegate)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setAlternatingRowColors(True)
+        self.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.horizontalHeader().setResizeContentsPrecision(RESIZE_SAMPLE_ROWS)
+        self.setSortingEnabled(True)
+
+    @property
+    def headers(self):
+        return self.results_model.headers
+
+    def set_rows(self, rows):
+        """Exibe `rows` na ordem recebida (o indicador de ordenação é limpo) e ajusta as larguras."""
+        self.results_model.set_rows(rows)
+        self.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        if rows: self.resize_columns()
+
+    def append_rows(self, rows):
+        """Acrescenta uma página de linhas no final (a primeira página faz o papel de set_rows)."""
+        if not self.results_model.rowCount(): self.set_rows(rows); return
+        self.results_model.append_rows(rows)
+
+    def finish_rows(self):
+        """Fim do carregamento em páginas: reordena se o usuário escolheu uma coluna durante o carregamento."""
+        self.sort_proxy.refresh_sort()
+
+    def clear(self):
+        self.set_rows([])
+
+    def resize_columns(self):
+        """Larguras pelo conteúdo de uma amostra das linhas; Ritmo/Parciais com largura fixa."""
+        for col, header in enumerate(self.headers):
+            if header in FIXED_COLUMN_WIDTHS: self.setColumnWidth(col, FIXED_COLUMN_WIDTHS[header])
+            else: self.resizeColumnToContents(col)
+
+    def rows_in_view_order(self):
+        return self.sort_proxy.rows_in_view_order()
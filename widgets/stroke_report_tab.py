@@ -3,20 +3,16 @@ import sys
 import os
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QGridLayout, QLabel,
                                QComboBox, QPushButton, QMessageBox, QSpacerItem,
-                               QSizePolicy, QFileDialog, QHBoxLayout, QTableWidget, QProgressDialog,
-                               QCheckBox, QTableWidgetItem, QAbstractItemView,
+                               QSizePolicy, QFileDialog, QHBoxLayout, QProgressDialog,
+                               QCheckBox,
                                QScrollArea, QDialog)
 from PySide6.QtCore import Slot, Qt, QMetaObject, Q_ARG, QThread, Signal, QObject
-from PySide6.QtGui import QFont, QPixmap
 import sqlite3
 from collections import defaultdict
 import re
-import statistics
-import math
 import io
 import threading # Mantido caso precise de threads no futuro, mas Gemini removido
 from datetime import datetime
-import math # Adicionado para DP
 import numpy as np # Adicionado para gráficos de barras
 
 # --- Matplotlib Imports ---
@@ -84,48 +80,24 @@ if parent_dir not in sys.path:
     sys.path.append(parent_dir)
 
 # Importa funções do core.database
-from core.database import (get_db_connection, fetch_top3_for_meet,
-                           fetch_splits_for_meet) # Mantém por enquanto, pode ser útil
+from core.database import (get_read_connection, close_read_connections, fetch_top3_for_meet,
+                           fetch_splits_for_meet, fetch_split_arrays, # Mantém por enquanto, pode ser útil
+                           STROKE_CODES, INDIVIDUAL_STROKE_EVENTS_SQL, fetch_stroke_event_descs, fetch_birth_years)
+# Conversão/formatação de tempos compartilhada (utils/helpers.py) e cálculo de voltas em lote
+from utils.helpers import time_to_seconds, times_to_seconds, format_time_diff, format_seconds_to_time_str
+from core.pacing import compute_pacing, format_lap_stat
+from core.id_lookup import fetch_by_ids
+from core.query_cache import get_or_compute
+from core.plotting import sparkline_png_buffer
+from core.query_jobs import QueryJobRunner
+from widgets.results_table import ResultsTableView
+from widgets.busy_indicator import BusyIndicator
 
 # Constantes
 SELECT_PROMPT = "--- Selecione ---"
 ALL_DISTANCES = "Todas as Distâncias"
 ALL_FILTER = "Todos" # Para gênero/ano
 
-# --- Funções Auxiliares (copiadas) ---
-def time_to_seconds(time_str):
-    if not time_str: return None; time_str = str(time_str).strip()
-    match_hr = re.match(r'(\d{1,2}):(\d{2}):(\d{2})\.(\d{1,2})$', time_str)
-    match_min = re.match(r'(\d{1,2}):(\d{2})\.(\d{1,2})$', time_str)
-    match_sec = re.match(r'(\d{1,2})\.(\d{1,2})$', time_str)
-    match_sec_only = re.match(r'(\d+)$', time_str)
-    try:
-        if match_hr: h = int(match_hr.group(1)); m = int(match_hr.group(2)); s = int(match_hr.group(3)); c = int(match_hr.group(4).ljust(2, '0')); return h * 3600 + m * 60 + s + c / 100.0
-        elif match_min: m = int(match_min.group(1)); s = int(match_min.group(2)); c = int(match_min.group(3).ljust(2, '0')); return m * 60 + s + c / 100.0
-        elif match_sec: s = int(match_sec.group(1)); c = int(match_sec.group(2).ljust(2, '0')); return s + c / 100.0
-        elif match_sec_only: return float(match_sec_only.group(1))
-        else: return None
-    except (ValueError, TypeError): return None
-
-def format_time_diff(diff_seconds):
-    if diff_seconds is None: return "N/A"
-    if abs(diff_seconds) < 0.001: return "0.00s"
-    sign = "+" if diff_seconds >= 0 else "-"; return f"{sign}{abs(diff_seconds):.2f}s"
-
-def format_seconds_to_time_str(total_seconds):
-    """Converte segundos (float) para uma string de tempo MM:SS.ss ou HH:MM:SS.ss."""
-    if total_seconds is None or not isinstance(total_seconds, (int, float)) or total_seconds < 0:
-        return "N/A"
-    
-    hours = int(total_seconds // 3600)
-    minutes = int((total_seconds % 3600) // 60)
-    seconds = int(total_seconds % 60)
-    centiseconds = int((total_seconds * 100) % 100)
-
-    if hours > 0: return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{centiseconds:02d}"
-    else: return f"{minutes:02d}:{seconds:02d}.{centiseconds:02d}"
-
-
 def extract_stroke_from_desc(prova_desc):
     """Tenta extrair o Estilo da descrição da prova."""
     if not isinstance(prova_desc, str): return None
@@ -161,53 +133,10 @@ class GraphPopupDialog(QDialog):
         self.setLayout(layout)
         # self.setAttribute(Qt.WA_DeleteOnClose) # <<< REMOVIDO - Pode causar erro com Matplotlib
 
-# --- Funções Sparkline (Copiadas de athlete_report_tab.py) ---
-def _generate_sparkline_pixmap(lap_times, width_px=80, height_px=20):
-    """Gera um QPixmap de um sparkline para os tempos de volta."""
-    if not MATPLOTLIB_AVAILABLE or not lap_times:
-        return None
-    fig = None # Define fig como None inicialmente
-    try:
-        fig, ax = plt.subplots(figsize=(width_px / 72, height_px / 72), dpi=72)
-        fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
-        ax.plot(range(len(lap_times)), lap_times, color='blue', linewidth=0.8)
-        if len(lap_times) > 0:
-            mean_time = statistics.mean(lap_times)
-            ax.axhline(mean_time, color='red', linestyle='--', linewidth=0.5)
-        ax.axis('off'); buf = io.BytesIO()
-        fig.savefig(buf, format='png', transparent=True); buf.seek(0)
-        pixmap = QPixmap(); pixmap.loadFromData(buf.read());
-        return pixmap
-    except Exception as e:
-        print(f"Erro ao gerar sparkline: {e}"); return None
-    finally:
-        if fig: plt.close(fig) # Fecha a figura se ela foi criada
-
+# --- Sparkline para o PDF (na tabela o Ritmo é desenhado pelo SparklineDelegate) ---
 def _generate_sparkline_pdf_image(lap_times, width_px=80, height_px=20):
-    """Gera dados de imagem PNG de um sparkline para o PDF."""
-    if not MATPLOTLIB_AVAILABLE or not lap_times:
-        return None
-    fig = None
-    try:
-        # Usa Agg temporariamente para garantir backend não interativo
-        current_backend = matplotlib.get_backend()
-        matplotlib.use('Agg')
-        fig, ax = plt.subplots(figsize=(width_px / 72, height_px / 72), dpi=72)
-        fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
-        ax.plot(range(len(lap_times)), lap_times, color='blue', linewidth=1.5) # Linha mais grossa para PDF
-        if len(lap_times) > 0:
-            mean_time = statistics.mean(lap_times)
-            ax.axhline(mean_time, color='red', linestyle='--', linewidth=1.0) # Linha média mais grossa
-        ax.axis('off'); buf = io.BytesIO()
-        fig.savefig(buf, format='png', transparent=True); buf.seek(0)
-        matplotlib.use(current_backend) # Restaura backend original
-        return buf # Retorna o buffer BytesIO
-    except Exception as e:
-        print(f"Erro ao gerar sparkline PDF: {e}"); return None
-    finally:
-        if fig: plt.close(fig) # Fecha a figura se ela foi criada
-        # Garante restauração do backend mesmo com erro
-        if 'current_backend' in locals(): matplotlib.use(current_backend)
+    """Gera dados de imagem PNG de um sparkline para o PDF (cache compartilhado em core.plotting)."""
+    return sparkline_png_buffer(lap_times, width_px, height_px, line_width=1.5, mean_line_width=1.0)
 # --- Fim Funções Sparkline ---
 
 class StrokeReportTab(QWidget):
@@ -263,6 +192,12 @@ class StrokeReportTab(QWidget):
         filter_layout.addWidget(self.btn_view_stroke_data, 4, 0, 1, 4)
 
         self.main_layout.addWidget(filter_group)
+        # Busca em segundo plano (a janela não trava); mudar um filtro cancela a busca em andamento
+        self.query_runner = QueryJobRunner(self.db_path, self)
+        self.busy_indicator = BusyIndicator("Buscando dados do estilo..."); self.busy_indicator.attach(self.query_runner)
+        self.main_layout.addWidget(self.busy_indicator)
+        for combo in (self.combo_distance_event, self.combo_gender, self.combo_birth_year_start, self.combo_birth_year_end):
+            combo.currentIndexChanged.connect(self.query_runner.cancel)
 
         # Conecta a seleção do estilo à habilitação do botão e busca de distâncias
         self.combo_stroke.currentIndexChanged.connect(self._on_stroke_selected)
@@ -274,11 +209,9 @@ class StrokeReportTab(QWidget):
         scroll_content_layout = QVBoxLayout(scroll_content_widget)
 
         # --- Tabela de Resultados ---
-        self.table_widget = QTableWidget()
-        self.table_widget.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
-        self.table_widget.setAlternatingRowColors(True)
-        self.table_widget.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
-        self.table_widget.setSortingEnabled(True)
+        # Cabeçalhos focados na comparação de atletas
+        self.table_widget = ResultsTableView(["Atleta", "AnoNasc", "Cidade", "Data", "Prova", "Piscina", "Colocação", "Tempo",
+                                              "Média Lap", "DP Lap", "Dif. 3º", "Dif. 2º", "Dif. 1º", "Ritmo", "Parciais"])
         self.table_widget.setMinimumHeight(300)
         scroll_content_layout.addWidget(QLabel("<b>Resultados Detalhados por Atleta:</b>"))
         scroll_content_layout.addWidget(self.table_widget)
@@ -464,8 +397,7 @@ class StrokeReportTab(QWidget):
         self.combo_stroke.clear()
         self.combo_stroke.addItem(SELECT_PROMPT, userData=None)
         # Adiciona os estilos principais
-        strokes = ['Livre', 'Costas', 'Peito', 'Borboleta', 'Medley']
-        for stroke in strokes:
+        for stroke in STROKE_CODES:
             self.combo_stroke.addItem(stroke, userData=stroke)
         self.combo_stroke.setCurrentIndex(0)
         self.combo_stroke.blockSignals(False)
@@ -474,11 +406,9 @@ class StrokeReportTab(QWidget):
         """Popula os ComboBoxes de ano de nascimento."""
         conn = None
         try:
-            conn = get_db_connection(self.db_path)
+            conn = get_read_connection(self.db_path)
             if not conn: return
-            cursor = conn.cursor()
-            cursor.execute("SELECT DISTINCT SUBSTR(birthdate, 1, 4) FROM AthleteMaster WHERE birthdate IS NOT NULL AND LENGTH(birthdate) >= 4 ORDER BY SUBSTR(birthdate, 1, 4) DESC")
-            years = [year[0] for year in cursor.fetchall() if year[0]]
+            years = fetch_birth_years(conn) # Índice de AthleteMaster.birth_year
 
             self.combo_birth_year_start.blockSignals(True)
             self.combo_birth_year_end.blockSignals(True)
@@ -494,12 +424,11 @@ class StrokeReportTab(QWidget):
             self.combo_birth_year_end.blockSignals(False)
         except sqlite3.Error as e:
             QMessageBox.warning(self, "Erro Filtros", f"Erro ao popular anos de nascimento:\n{e}")
-        finally:
-            if conn: conn.close()
 
     @Slot(int)
     def _on_stroke_selected(self, index):
         """Chamado quando um estilo é selecionado. Popula o filtro de distância/prova."""
+        self.query_runner.cancel() # Busca do estilo anterior (se houver) não é mais exibida
         stroke_name = self.combo_stroke.itemData(index)
         self.selected_stroke_name = self.combo_stroke.itemText(index)
 
@@ -517,40 +446,15 @@ class StrokeReportTab(QWidget):
         # Popula provas (distâncias) que existem para o estilo selecionado
         conn = None
         try:
-            conn = get_db_connection(self.db_path)
+            conn = get_read_connection(self.db_path)
             if not conn: return
-            cursor = conn.cursor()
-            # --- Lógica de filtro mais específica (similar a _fetch_data_for_stroke) ---
-            where_clauses = []
-            params = []
-            # Adiciona OR para variações comuns (ex: Livre/Free, Costas/Back/Dorso, Peito/Breast, Borboleta/Fly)
-            # Garante que NÃO seja revezamento
-            not_relay_clause = "UPPER(prova_desc) NOT LIKE ?"
-            params_relay = ["%REVEZAMENTO%"]
-
-            if stroke_name == 'Livre': where_clauses.append(f"((UPPER(prova_desc) LIKE ? OR UPPER(prova_desc) LIKE ? OR UPPER(prova_desc) LIKE ?) AND {not_relay_clause})") ; params.extend(["%LIVRE%", "%FREE%", "%CRAWL%"])
-            elif stroke_name == 'Costas': where_clauses.append(f"((UPPER(prova_desc) LIKE ? OR UPPER(prova_desc) LIKE ? OR UPPER(prova_desc) LIKE ?) AND {not_relay_clause})") ; params.extend(["%COSTAS%", "%BACK%", "%DORSO%"])
-            elif stroke_name == 'Peito': where_clauses.append(f"((UPPER(prova_desc) LIKE ? OR UPPER(prova_desc) LIKE ?) AND {not_relay_clause})") ; params.extend(["%PEITO%", "%BREAST%"])
-            elif stroke_name == 'Borboleta': where_clauses.append(f"((UPPER(prova_desc) LIKE ? OR UPPER(prova_desc) LIKE ?) AND {not_relay_clause})") ; params.extend(["%BORBO%", "%FLY%"])
-            elif stroke_name == 'Medley': where_clauses.append(f"((UPPER(prova_desc) LIKE ?) AND {not_relay_clause})") ; params.extend(["%MEDLEY%"])
-            else: # Caso inesperado, retorna vazio
+            stroke_code = STROKE_CODES.get(stroke_name)
+            if stroke_code is None: # Caso inesperado, retorna vazio
                 self.combo_distance_event.blockSignals(False); return
-
-            # Adiciona o parâmetro do revezamento ao final
-            params.extend(params_relay)
-            # --- Fim da lógica específica ---
-
-            # Monta a query
-            cursor.execute("""
-                SELECT DISTINCT prova_desc
-                FROM Event
-                WHERE prova_desc IS NOT NULL AND ({})
-                ORDER BY prova_desc
-            """.format(" AND ".join(where_clauses)), params)
-            # --- Fim da modificação da query ---
-            events = cursor.fetchall()
+            # Provas individuais do estilo por Event.stroke (índice idx_event_stroke; revezamentos têm relay_count > 1)
+            events = fetch_stroke_event_descs(conn, stroke_code)
             if events:
-                for (event_desc,) in events:
+                for event_desc in events:
                     # Adiciona a descrição completa da prova (ex: "50m Livre")
                     self.combo_distance_event.addItem(event_desc.strip(), userData=event_desc.strip())
                 self.combo_distance_event.setEnabled(True)
@@ -560,7 +464,6 @@ class StrokeReportTab(QWidget):
 
         except sqlite3.Error as e: QMessageBox.warning(self, "Erro Filtros", f"Erro ao buscar provas do estilo:\n{e}")
         finally:
-            if conn: conn.close()
             self.combo_distance_event.blockSignals(False)
 
     # --- Métodos de Busca e Exibição de Dados ---
@@ -574,11 +477,16 @@ class StrokeReportTab(QWidget):
         end_year_filter = self.combo_birth_year_end.currentText()
 
         if stroke_name is None: return
+        self.query_runner.submit(self._load_stroke_data, stroke_name, distance_event_filter, gender_filter, start_year_filter, end_year_filter,
+                                 on_result=self._show_stroke_data, on_error=self._show_query_error)
 
-        processed_data = self._fetch_data_for_stroke(
-            stroke_name, distance_event_filter, gender_filter, start_year_filter, end_year_filter
-        )
+    def _show_query_error(self, error, tb):
+        if isinstance(error, sqlite3.Error): QMessageBox.critical(self, "Erro de Consulta", f"Erro ao buscar dados do estilo:\n{error}")
+        else: QMessageBox.critical(self, "Erro Inesperado", f"Ocorreu um erro inesperado ao buscar dados:\n{error}")
+        self._show_stroke_data(None)
 
+    def _show_stroke_data(self, processed_data):
+        """Exibe os dados buscados do estilo e habilita gráficos/relatório conforme as bibliotecas disponíveis."""
         self.current_stroke_data = processed_data if processed_data is not None else []
         self._update_stroke_table()
         self._populate_evolution_graph_combo() # Popula combo de provas para gráfico
@@ -600,31 +508,44 @@ class StrokeReportTab(QWidget):
 
 
     def _fetch_data_for_stroke(self, stroke_name, distance_event_filter, gender_filter, start_year_filter, end_year_filter):
-        """Busca dados filtrados por estilo, distância opcional, gênero e ano."""
+        """Busca dados filtrados por estilo, distância opcional, gênero e ano. Retorna a lista de dicts ou None em caso de erro."""
+        try:
+            return self._load_stroke_data(stroke_name, distance_event_filter, gender_filter, start_year_filter, end_year_filter)
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "Erro de Consulta", f"Erro ao buscar dados do estilo:\n{e}")
+            return None
+        except Exception as e:
+            QMessageBox.critical(self, "Erro Inesperado", f"Ocorreu um erro inesperado ao buscar dados:\n{e}")
+            import traceback; print(traceback.format_exc())
+            return None
+
+    def _load_stroke_data(self, stroke_name, distance_event_filter, gender_filter, start_year_filter, end_year_filter):
+        """Dados processados do estilo, em cache até o banco mudar (também roda no QueryJobRunner: sem acesso a widgets)."""
+        return get_or_compute('stroke_report', self.db_path, (stroke_name, distance_event_filter, gender_filter, start_year_filter, end_year_filter),
+                              lambda: self._query_data_for_stroke(stroke_name, distance_event_filter, gender_filter, start_year_filter, end_year_filter))
+
+    def _query_data_for_stroke(self, stroke_name, distance_event_filter, gender_filter, start_year_filter, end_year_filter):
+        """Consulta e processa os resultados do estilo (erros de consulta são levantados para quem chamou)."""
         # Query base para buscar resultados de múltiplos atletas
         base_query = """
             SELECT
-                am.first_name || ' ' || am.last_name AS Atleta,
-                am.license, -- Necessário para agrupar ou identificar unicamente
-                SUBSTR(am.birthdate, 1, 4) AS AnoNasc,
-                e.distance AS Distancia,
-                e.prova_desc AS Prova,
-                m.pool_size_desc AS Piscina,
-                r.swim_time AS Tempo,
-                r.place AS Colocacao,
-                r.status AS Status,
-                m.name AS NomeCompeticao,
-                m.city AS CidadeCompeticao,
-                m.start_date AS Data,
-                r.meet_id,
-                r.result_id_lenex,
-                r.event_db_id,
-                r.agegroup_db_id
-            FROM ResultCM r
-            JOIN AthleteMeetLink aml ON r.link_id = aml.link_id
-            JOIN AthleteMaster am ON aml.license = am.license
-            JOIN Meet m ON r.meet_id = m.meet_id
-            JOIN Event e ON r.event_db_id = e.event_db_id
+                f.athlete_name AS Atleta,
+                f.license, -- Necessário para agrupar ou identificar unicamente
+                CAST(f.birth_year AS TEXT) AS AnoNasc,
+                f.distance AS Distancia,
+                f.prova_desc AS Prova,
+                f.pool_size_desc AS Piscina,
+                f.swim_time AS Tempo,
+                f.place AS Colocacao,
+                f.status AS Status,
+                f.meet_name AS NomeCompeticao,
+                f.meet_city AS CidadeCompeticao,
+                f.start_date AS Data,
+                f.meet_id,
+                f.result_id_lenex,
+                f.event_db_id,
+                f.agegroup_db_id
+            FROM ResultFlat f
         """
         filters = []
         params = []
@@ -632,187 +553,120 @@ class StrokeReportTab(QWidget):
         # 1. Filtro de Prova/Estilo
         if distance_event_filter != ALL_DISTANCES:
             # Se uma prova específica foi selecionada, filtra por ela diretamente.
-            filters.append("e.prova_desc = ?")
+            filters.append("f.prova_desc = ?")
             params.append(distance_event_filter)
         else:
-            # Se "Todas as Distâncias" foi selecionado, aplica o filtro de estilo abrangente.
-            # Usa a mesma lógica de _on_stroke_selected para consistência.
-            style_where_clauses = []
-            style_params = []
-            not_relay_clause = "UPPER(e.prova_desc) NOT LIKE ?"
-            params_relay = ["%REVEZAMENTO%"]
-
-            if stroke_name == 'Livre': style_where_clauses.append(f"((UPPER(e.prova_desc) LIKE ? OR UPPER(e.prova_desc) LIKE ? OR UPPER(e.prova_desc) LIKE ?) AND {not_relay_clause})") ; style_params.extend(["%LIVRE%", "%FREE%", "%CRAWL%"])
-            elif stroke_name == 'Costas': style_where_clauses.append(f"((UPPER(e.prova_desc) LIKE ? OR UPPER(e.prova_desc) LIKE ? OR UPPER(e.prova_desc) LIKE ?) AND {not_relay_clause})") ; style_params.extend(["%COSTAS%", "%BACK%", "%DORSO%"])
-            elif stroke_name == 'Peito': style_where_clauses.append(f"((UPPER(prova_desc) LIKE ? OR UPPER(prova_desc) LIKE ?) AND {not_relay_clause})") ; style_params.extend(["%PEITO%", "%BREAST%"])
-            elif stroke_name == 'Borboleta': style_where_clauses.append(f"((UPPER(e.prova_desc) LIKE ? OR UPPER(e.prova_desc) LIKE ?) AND {not_relay_clause})") ; style_params.extend(["%BORBO%", "%FLY%"])
-            elif stroke_name == 'Medley': style_where_clauses.append(f"((UPPER(e.prova_desc) LIKE ?) AND {not_relay_clause})") ; style_params.extend(["%MEDLEY%"])
-            style_params.extend(params_relay)
-            if style_where_clauses: filters.append("({})".format(" AND ".join(style_where_clauses))) ; params.extend(style_params)
+            # Se "Todas as Distâncias" foi selecionado, filtra pelas provas individuais do estilo:
+            # busca em Event pelo código do estilo (índice) e ResultFlat pelo índice de event_db_id.
+            stroke_code = STROKE_CODES.get(stroke_name)
+            if stroke_code is not None: filters.append(f"f.event_db_id IN ({INDIVIDUAL_STROKE_EVENTS_SQL})") ; params.append(stroke_code)
 
         # 3. Filtro de Gênero (opcional)
         if gender_filter != ALL_FILTER:
             gender_code = 'M' if gender_filter == "Masculino" else 'F'
-            filters.append("am.gender = ?")
+            filters.append("f.gender = ?")
             params.append(gender_code)
 
         # 4. Filtro de Ano de Nascimento (opcional)
         if start_year_filter != ALL_FILTER:
-            filters.append("CAST(SUBSTR(am.birthdate, 1, 4) AS INTEGER) >= ?")
+            filters.append("f.birth_year >= ?")
             params.append(int(start_year_filter))
         if end_year_filter != ALL_FILTER:
-            filters.append("CAST(SUBSTR(am.birthdate, 1, 4) AS INTEGER) <= ?")
+            filters.append("f.birth_year <= ?")
             params.append(int(end_year_filter))
 
         # 5. Filtro de Status/Tempo Válido
-        filters.append("(r.status IS NULL OR r.status IN ('OK', 'OFFICIAL'))")
-        filters.append("r.swim_time IS NOT NULL")
+        filters.append("(f.status IS NULL OR f.status IN ('OK', 'OFFICIAL'))")
+        filters.append("f.swim_time IS NOT NULL")
 
         # Monta a query final
         query_string = base_query
         if filters:
             query_string += " WHERE " + " AND ".join(filters)
         # Ordena por data para gráficos de evolução, depois por tempo
-        query_string += " ORDER BY m.start_date DESC, r.swim_time ASC"
+        query_string += " ORDER BY f.start_date DESC, f.swim_time ASC"
 
         conn = None
         processed_data = []
-        try:
-            conn = get_db_connection(self.db_path)
-            if not conn: raise sqlite3.Error("Falha na conexão com o banco de dados.")
-            cursor = conn.cursor()
-
-            print(f"StrokeReportTab: Executing Query: {query_string}")
-            print(f"StrokeReportTab: With Params: {params}")
-            cursor.execute(query_string, params)
-
-            query_headers = [description[0] for description in cursor.description]
-            results_data = cursor.fetchall()
-            print(f"StrokeReportTab: Query retornou: {len(results_data)} linhas")
-
-            # Encontrar índices (simplificado, assume que existem)
-            athlete_idx = query_headers.index('Atleta'); license_idx = query_headers.index('license'); birth_idx = query_headers.index('AnoNasc'); dist_idx = query_headers.index('Distancia'); event_idx = query_headers.index('Prova'); pool_idx = query_headers.index('Piscina'); time_idx = query_headers.index('Tempo'); place_idx = query_headers.index('Colocacao'); status_idx = query_headers.index('Status'); city_idx = query_headers.index('CidadeCompeticao'); date_idx = query_headers.index('Data'); meet_id_idx = query_headers.index('meet_id'); result_id_idx = query_headers.index('result_id_lenex'); event_db_id_idx = query_headers.index('event_db_id'); agegroup_db_id_idx = query_headers.index('agegroup_db_id') # Adicionado agegroup_db_id_idx
-
-            # --- Buscar Dados Adicionais (Top3 e Splits) Fora do Loop ---
-            meet_ids_in_results = list(set(row[meet_id_idx] for row in results_data))
-            result_ids_in_results = list(set(row[result_id_idx] for row in results_data))
-            top3_lookup = defaultdict(dict) # Chave: (meet_id, event_db_id, agegroup_db_id) -> {place: time_sec}
-            splits_lookup = defaultdict(list) # Chave: result_id_lenex -> [(split_num, split_time_str)]
-
-            if meet_ids_in_results:
-                # Busca Top3 diretamente via SQL (similar a outras abas)
-                placeholders_top3 = ', '.join('?' * len(meet_ids_in_results))
-                top3_query = f"SELECT meet_id, event_db_id, agegroup_db_id, place, swim_time FROM Top3Result WHERE meet_id IN ({placeholders_top3})"
-                cursor.execute(top3_query, meet_ids_in_results)
-                for t3_meet, t3_event, t3_ag, t3_place, t3_time_str in cursor.fetchall():
-                    top3_lookup[(t3_meet, t3_event, t3_ag)][t3_place] = time_to_seconds(t3_time_str) # Guarda tempo em segundos
-
-            if result_ids_in_results:
-                # Busca parciais diretamente via SQL
-                placeholders = ', '.join('?' * len(result_ids_in_results)); splits_query = f"SELECT result_id_lenex, distance, swim_time FROM SplitCM WHERE result_id_lenex IN ({placeholders}) ORDER BY result_id_lenex, distance"
-                cursor.execute(splits_query, result_ids_in_results)
-                for split_res_id, split_dist, split_time_str in cursor.fetchall():
-                     # Converte o tempo da parcial para segundos
-                     split_sec = time_to_seconds(split_time_str)
-                     if split_sec is not None:
-                         splits_lookup[split_res_id].append(split_sec) # <<< ARMAZENA O TEMPO EM SEGUNDOS (float)
-            # --- Fim da Busca Adicional ---
-
-            # Processar Resultados (sem lookup de Top3/Splits por enquanto)
-            for row in results_data:
-                athlete_time_str = row[time_idx]
-                athlete_secs = time_to_seconds(athlete_time_str)
-                place = row[place_idx]; status = row[status_idx]; athlete_name = row[athlete_idx] # Pega nome
-                display_colocacao = "N/A"; is_valid_result = status is None or status.upper() == 'OK' or status.upper() == 'OFFICIAL'
-                if not is_valid_result and status: display_colocacao = status.upper()
-                elif place is not None: display_colocacao = str(place)
-
-                # --- Usar Dados Adicionais do Lookup ---
-                meet_id = row[meet_id_idx]
-                result_id = row[result_id_idx]
-                event_db_id = row[event_db_id_idx]
-                agegroup_db_id = row[agegroup_db_id_idx] # Pega agegroup_db_id
-                distance = row[dist_idx]
-
-                # Parciais CUMULATIVAS do lookup
-                cumulative_splits_sec = splits_lookup.get(result_id, [])
-
-                # Calcular TEMPOS DE VOLTA, MÉDIA e DP (lógica de athlete_report_tab)
-                lap_times_sec = []
-                media_lap_str = "N/A"; dp_lap_str = "N/A"
-                last_cumulative_split = 0.0
-                if cumulative_splits_sec:
-                    previous_split_sec = 0.0
-                    for current_split_sec in cumulative_splits_sec:
-                        lap_time = current_split_sec - previous_split_sec
-                        if lap_time >= 0: lap_times_sec.append(lap_time) # Adiciona apenas voltas válidas
-                        previous_split_sec = current_split_sec
-                    last_cumulative_split = previous_split_sec
-                # Calcula última volta (se houver tempo final e parciais)
-                if athlete_secs is not None and last_cumulative_split >= 0 and cumulative_splits_sec:
-                    last_lap_time = athlete_secs - last_cumulative_split
-                    if last_lap_time >= 0: lap_times_sec.append(last_lap_time)
-                # Caso especial: prova sem parciais (ex: 50m)
-                elif not cumulative_splits_sec and athlete_secs is not None:
-                     lap_times_sec.append(athlete_secs) # A única "volta" é o tempo total
-
-                if lap_times_sec:
-                    try: media = statistics.mean(lap_times_sec); media_lap_str = f"{media:.2f}"
-                    except statistics.StatisticsError: media_lap_str = "N/A"
-                    if len(lap_times_sec) >= 2:
-                        try: stdev = statistics.stdev(lap_times_sec); dp_lap_str = f"{stdev:.2f}" if not math.isnan(stdev) else "0.00"
-                        except statistics.StatisticsError: dp_lap_str = "N/A"
-                    elif len(lap_times_sec) == 1: dp_lap_str = "0.00" # DP é 0 para uma única volta
-
-                # Top 3 do lookup (usando a chave completa)
-                top3_times_sec_dict = top3_lookup.get((meet_id, event_db_id, agegroup_db_id), {})
-                diff1 = format_time_diff(athlete_secs - top3_times_sec_dict.get(1)) if athlete_secs and top3_times_sec_dict.get(1) else "N/A"
-                diff2 = format_time_diff(athlete_secs - top3_times_sec_dict.get(2)) if athlete_secs and top3_times_sec_dict.get(2) else "N/A"
-                diff3 = format_time_diff(athlete_secs - top3_times_sec_dict.get(3)) if athlete_secs and top3_times_sec_dict.get(3) else "N/A"
-
-                processed_data.append({
-                    "Atleta": row[athlete_idx],
-                    "License": row[license_idx], # Guarda licença para gráficos
-                    "AnoNasc": row[birth_idx],
-                    "Prova": row[event_idx],
-                    "Cidade": row[city_idx],
-                    "Data": row[date_idx],
-                    "Piscina": row[pool_idx],
-                    "Colocação": display_colocacao,
-                    "Tempo": athlete_time_str or "N/A",
-                    "Tempo_Sec": athlete_secs,
-                    "Status": status,
-                    "Média Lap": media_lap_str, # <<< ADICIONADO
-                    "DP Lap": dp_lap_str,       # <<< ADICIONADO
-                    "Lap Times": lap_times_sec, # <<< ADICIONADO (lista para sparkline/parciais)
-                    "Dif. 1º": diff1, # <<< ADICIONADO
-                    "Dif. 2º": diff2, # <<< ADICIONADO
-                    "Dif. 3º": diff3, # <<< ADICIONADO
-                })
-            return processed_data
-
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "Erro de Consulta", f"Erro ao buscar dados do estilo:\n{e}")
-            return None
-        except Exception as e:
-            QMessageBox.critical(self, "Erro Inesperado", f"Ocorreu um erro inesperado ao buscar dados:\n{e}")
-            import traceback; print(traceback.format_exc())
-            return None
-        finally:
-            if conn: conn.close()
+        conn = get_read_connection(self.db_path)
+        if not conn: raise sqlite3.Error("Falha na conexão com o banco de dados.")
+        cursor = conn.cursor()
+
+        print(f"StrokeReportTab: Executing Query: {query_string}")
+        print(f"StrokeReportTab: With Params: {params}")
+        cursor.execute(query_string, params)
+
+        query_headers = [description[0] for description in cursor.description]
+        results_data = cursor.fetchall()
+        print(f"StrokeReportTab: Query retornou: {len(results_data)} linhas")
+
+        # Encontrar índices (simplificado, assume que existem)
+        athlete_idx = query_headers.index('Atleta'); license_idx = query_headers.index('license'); birth_idx = query_headers.index('AnoNasc'); dist_idx = query_headers.index('Distancia'); event_idx = query_headers.index('Prova'); pool_idx = query_headers.index('Piscina'); time_idx = query_headers.index('Tempo'); place_idx = query_headers.index('Colocacao'); status_idx = query_headers.index('Status'); city_idx = query_headers.index('CidadeCompeticao'); date_idx = query_headers.index('Data'); meet_id_idx = query_headers.index('meet_id'); result_id_idx = query_headers.index('result_id_lenex'); event_db_id_idx = query_headers.index('event_db_id'); agegroup_db_id_idx = query_headers.index('agegroup_db_id') # Adicionado agegroup_db_id_idx
+
+        # --- Buscar Dados Adicionais (Top3 e Splits) Fora do Loop ---
+        meet_ids_in_results = list(set(row[meet_id_idx] for row in results_data))
+        result_ids_in_results = list(set(row[result_id_idx] for row in results_data))
+        top3_lookup = defaultdict(dict) # Chave: (meet_id, event_db_id, agegroup_db_id) -> {place: time_sec}
+
+        if meet_ids_in_results:
+            # Busca Top3 diretamente via SQL (similar a outras abas)
+            top3_rows = fetch_by_ids(conn, "SELECT meet_id, event_db_id, agegroup_db_id, place, swim_time FROM Top3Result WHERE meet_id IN ({ids})", meet_ids_in_results)
+            for t3_meet, t3_event, t3_ag, t3_place, t3_time_str in top3_rows:
+                top3_lookup[(t3_meet, t3_event, t3_ag)][t3_place] = time_to_seconds(t3_time_str) # Guarda tempo em segundos
+
+        # Parciais (SplitCM + SplitPacked) como arrays e voltas/média/DP de todos os resultados de uma vez
+        split_ids, _, split_secs = fetch_split_arrays(conn, result_ids_in_results, as_seconds=True)
+        pacing = compute_pacing([row[result_id_idx] for row in results_data], times_to_seconds([row[time_idx] for row in results_data]), split_ids, split_secs)
+        # --- Fim da Busca Adicional ---
+
+        # Processar Resultados (sem lookup de Top3/Splits por enquanto)
+        for row_idx, row in enumerate(results_data):
+            athlete_time_str = row[time_idx]
+            athlete_secs = time_to_seconds(athlete_time_str)
+            place = row[place_idx]; status = row[status_idx]; athlete_name = row[athlete_idx] # Pega nome
+            display_colocacao = "N/A"; is_valid_result = status is None or status.upper() == 'OK' or status.upper() == 'OFFICIAL'
+            if not is_valid_result and status: display_colocacao = status.upper()
+            elif place is not None: display_colocacao = str(place)
+
+            # --- Usar Dados Adicionais do Lookup ---
+            meet_id = row[meet_id_idx]
+            event_db_id = row[event_db_id_idx]
+            agegroup_db_id = row[agegroup_db_id_idx] # Pega agegroup_db_id
+            distance = row[dist_idx]
+
+            # Tempos de volta, média e DP (calculados em lote por compute_pacing)
+            lap_times_sec = pacing.laps(row_idx); media_lap_str = format_lap_stat(pacing.mean[row_idx]); dp_lap_str = format_lap_stat(pacing.stdev[row_idx])
+
+            # Top 3 do lookup (usando a chave completa)
+            top3_times_sec_dict = top3_lookup.get((meet_id, event_db_id, agegroup_db_id), {})
+            diff1 = format_time_diff(athlete_secs - top3_times_sec_dict.get(1)) if athlete_secs and top3_times_sec_dict.get(1) else "N/A"
+            diff2 = format_time_diff(athlete_secs - top3_times_sec_dict.get(2)) if athlete_secs and top3_times_sec_dict.get(2) else "N/A"
+            diff3 = format_time_diff(athlete_secs - top3_times_sec_dict.get(3)) if athlete_secs and top3_times_sec_dict.get(3) else "N/A"
+
+            processed_data.append({
+                "Atleta": row[athlete_idx],
+                "License": row[license_idx], # Guarda licença para gráficos
+                "AnoNasc": row[birth_idx],
+                "Prova": row[event_idx],
+                "Cidade": row[city_idx],
+                "Data": row[date_idx],
+                "Piscina": row[pool_idx],
+                "Colocação": display_colocacao,
+                "Tempo": athlete_time_str or "N/A",
+                "Tempo_Sec": athlete_secs,
+                "Status": status,
+                "Média Lap": media_lap_str, # <<< ADICIONADO
+                "DP Lap": dp_lap_str,       # <<< ADICIONADO
+                "Lap Times": lap_times_sec, # <<< ADICIONADO (lista para sparkline/parciais)
+                "Dif. 1º": diff1, # <<< ADICIONADO
+                "Dif. 2º": diff2, # <<< ADICIONADO
+                "Dif. 3º": diff3, # <<< ADICIONADO
+            })
+        return processed_data
 
     def _update_stroke_table(self):
-        """Popula a QTableWidget com os dados processados do estilo."""
-        self.table_widget.setRowCount(0);
-        if not self.current_stroke_data: return
-
-        # Cabeçalhos focados na comparação de atletas
-        display_headers = ["Atleta", "AnoNasc", "Cidade", "Data", "Prova", "Piscina", "Colocação", "Tempo",
-                           "Média Lap", "DP Lap", "Dif. 3º", "Dif. 2º", "Dif. 1º", "Ritmo", "Parciais"]
-
-
-        self.table_widget.setColumnCount(len(display_headers))
-        self.table_widget.setHorizontalHeaderLabels(display_headers)
+        """Exibe os dados processados do estilo; células geradas só para as linhas visíveis (Ritmo desenhado pelo delegate)."""
+        if not self.current_stroke_data: self.table_widget.clear(); return
 
         # Ordena os dados pelo tempo em segundos (melhor primeiro) para exibição inicial
         # Cria uma cópia para não modificar self.current_stroke_data que pode estar ordenado por data
@@ -822,50 +676,7 @@ class StrokeReportTab(QWidget):
         )
         # Adiciona os que não tem tempo válido no final
         display_data.extend([d for d in self.current_stroke_data if d.get('Tempo_Sec') is None])
-
-        self.table_widget.setRowCount(len(display_data))
-        self.table_widget.setSortingEnabled(False) # <<< DESABILITA ORDENAÇÃO TEMPORARIAMENTE
-
-        bold_font = QFont(); bold_font.setBold(True) # Para vs TopX
-
-        # Mapeamento de cabeçalho para chave do dicionário
-        header_to_key_map = {h: h for h in display_headers}
-        header_to_key_map["Ritmo"] = "Lap Times" # Coluna "Ritmo" usa dados de "Lap Times"
-        header_to_key_map["Parciais"] = "Lap Times" # Coluna "Parciais" também usa "Lap Times"
-        # Mapeamentos para diferenças (já corretos no dicionário)
-        # header_to_key_map["Dif. 1º"] = "Dif. 1º" ...
-
-        for row_idx, row_dict in enumerate(display_data):
-            col_idx = 0; athlete_place_str = row_dict.get("Colocação", "") # Pega colocação para formatar vs TopX
-            for col_idx, key in enumerate(display_headers):
-                dict_key = header_to_key_map[key] # Pega a chave correta
-                value = row_dict.get(dict_key, "") # Busca pelo valor usando a chave
-
-                if key == "Ritmo":
-                    self.table_widget.setCellWidget(row_idx, col_idx, None) # Limpa célula
-                    lap_times = value # Lista de tempos
-                    pixmap = _generate_sparkline_pixmap(lap_times) # Chama a função auxiliar
-                    if pixmap:
-                        label = QLabel(); label.setPixmap(pixmap); label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-                        self.table_widget.setCellWidget(row_idx, col_idx, label)
-                    else:
-                        item = QTableWidgetItem("N/A"); item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                        self.table_widget.setItem(row_idx, col_idx, item)
-                elif key == "Parciais":
-                    self.table_widget.setCellWidget(row_idx, col_idx, None) # Limpa célula
-                    lap_times = value # Lista de tempos
-                    parciais_str = format_splits(lap_times) # Chama a função auxiliar modificada
-                    item = QTableWidgetItem(parciais_str)
-                    self.table_widget.setItem(row_idx, col_idx, item)
-                else: # Outras colunas
-                    self.table_widget.setCellWidget(row_idx, col_idx, None) # Limpa célula
-                    item = QTableWidgetItem(str(value))
-                    if key == "Colocação" and not str(value).isdigit() and str(value) != "N/A": item.setForeground(Qt.GlobalColor.red) # Formatação específica
-                    self.table_widget.setItem(row_idx, col_idx, item) # <<< MOVIDO PARA DENTRO DO ELSE
-                # self.table_widget.setItem(row_idx, col_idx, item) # <<< REMOVER ESTA LINHA REDUNDANTE
-
-        self.table_widget.setSortingEnabled(True) # <<< REABILITA ORDENAÇÃO
-        self.table_widget.resizeColumnsToContents()
+        self.table_widget.set_rows(display_data)
 
     def _populate_evolution_graph_combo(self):
         """Popula o ComboBox com as provas específicas (estilo+distância) dos dados carregados."""
@@ -1373,8 +1184,7 @@ class StrokeReportTab(QWidget):
     # --- Método de Refresh ---
     def _clear_ui_elements(self):
         """Limpa a tabela e desabilita controles de gráfico/relatório."""
-        self.table_widget.setRowCount(0)
-        self.table_widget.setColumnCount(0)
+        self.table_widget.clear()
         self.current_stroke_data = []
         self.combo_evolution_event.clear()
         self.combo_evolution_event.addItem("--- Selecione Prova ---", userData=None)
@@ -1772,13 +1582,15 @@ class AllStrokesReportWorker(QObject):
 
     def run(self):
         """Executa a lógica de geração do relatório completo por estilos."""
-        all_strokes = ['Livre', 'Costas', 'Peito', 'Borboleta', 'Medley'] # Lista fixa de estilos
+        all_strokes = list(STROKE_CODES) # Lista fixa de estilos
         try:
             success, message = self._build_complete_report(all_strokes)
             self.finished.emit(success, message)
         except Exception as e:
             import traceback; print(traceback.format_exc())
             self.finished.emit(False, f"Erro inesperado no worker:\n{e}")
+        finally:
+            close_read_connections() # Conexões de leitura abertas nesta thread do relatório
 
     def _build_complete_report(self, all_strokes):
         """Constrói o PDF completo iterando pelos estilos."""
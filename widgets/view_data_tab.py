@@ -2,29 +2,13 @@
 import sys
 import os
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QGridLayout, QLabel, # Adicionado QLabel
-                               QComboBox, QPushButton, QTableWidget, QTableWidgetItem,
-                               QAbstractItemView, QMessageBox, QSpacerItem, QSizePolicy,
+                               QComboBox, QPushButton,
+                               QMessageBox, QSpacerItem, QSizePolicy,
                                QFileDialog, QHBoxLayout) # Adicionado QFileDialog, QHBoxLayout
-from PySide6.QtCore import Slot, Qt
-from PySide6.QtGui import QFont, QPixmap # Adicionado QPixmap
+from PySide6.QtCore import Slot
 import sqlite3
 from collections import defaultdict, Counter
 import re
-import statistics
-import math
-import io # Adicionado para buffer de imagem
-
-# Tentar importar matplotlib
-try:
-    import matplotlib
-    matplotlib.use('Agg') # Usar backend não interativo para evitar problemas de UI
-    import matplotlib.pyplot as plt
-    MATPLOTLIB_AVAILABLE = True
-except ImportError:
-    MATPLOTLIB_AVAILABLE = False
-    print("AVISO: Matplotlib não encontrado. Sparklines não estarão disponíveis.")
-    # Definir plt como None para verificações posteriores
-    plt = None
 
 # Imports do ReportLab (similar ao meet_summary_tab)
 try:
@@ -54,34 +38,25 @@ if parent_dir not in sys.path:
     sys.path.append(parent_dir)
 
 # Importa funções do core.database
-from core.database import (get_db_connection, fetch_top3_for_meet,
-                           fetch_splits_for_meet)
+from core.database import (get_read_connection, fetch_top3_for_meet,
+                           fetch_splits_for_meet, fetch_split_arrays, fetch_birth_years)
+# Conversão/formatação de tempos compartilhada (utils/helpers.py) e cálculo de voltas em lote
+from utils.helpers import time_to_seconds, times_to_seconds, format_time_diff
+from core.pacing import compute_pacing, format_lap_stat
+from core.id_lookup import fetch_by_ids
+from core.plotting import sparkline_png_buffer, MATPLOTLIB_AVAILABLE # Sparklines dos PDFs (matplotlib opcional)
+from core.query_jobs import QueryJobRunner, emit_partial
+from widgets.results_table import ResultsTableView
+from widgets.busy_indicator import BusyIndicator
 
 # Constante para a opção "Todos"
 ALL_FILTER = "Todos"
+# Carregamento em páginas (fetchmany): a primeira página pequena para a tabela aparecer logo.
+# Com o SELECT principal ainda aberto na conexão, o Top 3 e as parciais de cada página usam sempre a busca em
+# blocos (strategy='chunks'): a tabela temporária não pode ser removida com uma consulta pendente.
+FIRST_PAGE_ROWS = 500
+PAGE_ROWS = 4000
 
-# --- Funções Auxiliares (time_to_seconds, format_time_diff - sem alterações) ---
-def time_to_seconds(time_str):
-    # ... (código como antes) ...
-    if not time_str: return None; time_str = time_str.strip()
-    match_hr = re.match(r'(\d{1,2}):(\d{2}):(\d{2})\.(\d{1,2})$', time_str)
-    match_min = re.match(r'(\d{1,2}):(\d{2})\.(\d{1,2})$', time_str)
-    match_sec = re.match(r'(\d{1,2})\.(\d{1,2})$', time_str)
-    match_sec_only = re.match(r'(\d+)$', time_str)
-    try:
-        if match_hr: h = int(match_hr.group(1)); m = int(match_hr.group(2)); s = int(match_hr.group(3)); c = int(match_hr.group(4).ljust(2, '0')); return h * 3600 + m * 60 + s + c / 100.0
-        elif match_min: m = int(match_min.group(1)); s = int(match_min.group(2)); c = int(match_min.group(3).ljust(2, '0')); return m * 60 + s + c / 100.0
-        elif match_sec: s = int(match_sec.group(1)); c = int(match_sec.group(2).ljust(2, '0')); return s + c / 100.0
-        elif match_sec_only: return float(match_sec_only.group(1))
-        else: return None
-    except (ValueError, TypeError): return None
-
-def format_time_diff(diff_seconds):
-    # ... (código como antes) ...
-    if diff_seconds is None: return "N/A"
-    if abs(diff_seconds) < 0.001: return "0.00s"
-    sign = "+" if diff_seconds >= 0 else "-"; return f"{sign}{abs(diff_seconds):.2f}s"
-# --- Fim das Funções Auxiliares ---
 
 
 class ViewDataTab(QWidget):
@@ -103,8 +78,15 @@ class ViewDataTab(QWidget):
         filter_layout.addWidget(lbl_birth_year, 2, 0); filter_layout.addWidget(self.combo_birth_year, 2, 1)
         filter_layout.addItem(QSpacerItem(20, 10, QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Minimum), 2, 2, 1, 2)
         filter_layout.addWidget(self.btn_apply_filter, 3, 0, 1, 4); self.main_layout.addWidget(filter_group)
-        self.table_widget = QTableWidget(); self.table_widget.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
-        self.table_widget.setAlternatingRowColors(True); self.table_widget.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows);
+        # Consulta em segundo plano (a janela não trava); mudar um filtro cancela a consulta em andamento
+        self.query_runner = QueryJobRunner(self.db_path, self)
+        self.busy_indicator = BusyIndicator(); self.busy_indicator.attach(self.query_runner); self.main_layout.addWidget(self.busy_indicator)
+        for combo in (self.combo_athlete, self.combo_meet, self.combo_event, self.combo_course, self.combo_birth_year):
+            combo.currentIndexChanged.connect(self._cancel_query)
+        # Tabela virtualizada (modelo por colunas + proxy de ordenação); Cidade e Data no final
+        display_headers = ["Atleta", "AnoNasc", "Prova", "Colocação", "Tempo", "Média Lap", "DP Lap", "Ritmo", "Parciais",
+                           "vs Top3", "vs Top2", "vs Top1", "Cidade", "Data"]
+        self.table_widget = ResultsTableView(display_headers)
 
         # --- Botão Exportar PDF ---
         export_layout = QHBoxLayout()
@@ -119,7 +101,8 @@ class ViewDataTab(QWidget):
             self.btn_export_pdf.setToolTip("\n".join(tooltip))
         export_layout.addStretch(); export_layout.addWidget(self.btn_export_pdf); export_layout.addStretch()
 
-        self.table_widget.setSortingEnabled(True); self.main_layout.addWidget(QLabel("Resultados Filtrados:"))
+        self.lbl_results = QLabel("Resultados Filtrados:"); self._expected_rows = 0; self._results_complete = True
+        self.main_layout.addWidget(self.lbl_results)
         self.main_layout.addWidget(self.table_widget)
         self.main_layout.addLayout(export_layout) # Adiciona layout do botão abaixo da tabela
         self.setLayout(self.main_layout); self._populate_filters()
@@ -127,7 +110,7 @@ class ViewDataTab(QWidget):
     def _populate_filters(self):
         conn = None
         try:
-            conn = get_db_connection(self.db_path);
+            conn = get_read_connection(self.db_path);
             if not conn: QMessageBox.critical(self, "Erro DB", f"Erro ao conectar: {self.db_path}"); return
             cursor = conn.cursor()
             combos = [self.combo_athlete, self.combo_meet, self.combo_event, self.combo_course, self.combo_birth_year]
@@ -152,342 +135,154 @@ class ViewDataTab(QWidget):
             for (course_desc,) in cursor.fetchall():
                 if course_desc: self.combo_course.addItem(course_desc.strip())
             self.combo_course.blockSignals(False)
-            cursor.execute("SELECT DISTINCT SUBSTR(birthdate, 1, 4) FROM AthleteMaster WHERE birthdate IS NOT NULL AND LENGTH(birthdate) >= 4 ORDER BY SUBSTR(birthdate, 1, 4) DESC")
+            years = fetch_birth_years(conn) # Índice de AthleteMaster.birth_year
             self.combo_birth_year.blockSignals(True);
-            for (year,) in cursor.fetchall():
+            for year in years:
                 if year: self.combo_birth_year.addItem(year)
             self.combo_birth_year.blockSignals(False)
         except sqlite3.Error as e: QMessageBox.warning(self, "Erro Filtros", f"Erro ao popular filtros:\n{e}")
-        finally:
-            if conn: conn.close()
 
     def _build_query_and_params(self):
         base_query = """
             SELECT
-                am.first_name || ' ' || am.last_name AS Atleta, SUBSTR(am.birthdate, 1, 4) AS AnoNasc,
-                e.prova_desc AS Prova, m.pool_size_desc AS Piscina, r.swim_time AS Tempo,
-                r.place AS Colocacao, r.status AS Status, m.name AS NomeCompeticao,
-                m.city AS CidadeCompeticao, m.start_date AS Data, r.meet_id,
-                r.result_id_lenex, r.event_db_id, r.agegroup_db_id
-            FROM ResultCM r
-            JOIN AthleteMeetLink aml ON r.link_id = aml.link_id
-            JOIN AthleteMaster am ON aml.license = am.license
-            JOIN Meet m ON r.meet_id = m.meet_id
-            JOIN Event e ON r.event_db_id = e.event_db_id
+                f.athlete_name AS Atleta, CAST(f.birth_year AS TEXT) AS AnoNasc,
+                f.prova_desc AS Prova, f.pool_size_desc AS Piscina, f.swim_time AS Tempo,
+                f.place AS Colocacao, f.status AS Status, f.meet_name AS NomeCompeticao,
+                f.meet_city AS CidadeCompeticao, f.start_date AS Data, f.meet_id,
+                f.result_id_lenex, f.event_db_id, f.agegroup_db_id
+            FROM ResultFlat f
         """
         filters = []; params = []
         athlete_license = self.combo_athlete.currentData(); meet_id = self.combo_meet.currentData()
         event_desc = self.combo_event.currentText(); course_desc = self.combo_course.currentText()
         birth_year = self.combo_birth_year.currentText()
-        if athlete_license is not None: filters.append("am.license = ?"); params.append(athlete_license)
-        if meet_id is not None: filters.append("m.meet_id = ?"); params.append(meet_id)
-        if event_desc != ALL_FILTER: filters.append("e.prova_desc = ?"); params.append(event_desc)
-        if course_desc != ALL_FILTER: filters.append("m.pool_size_desc = ?"); params.append(course_desc)
-        if birth_year != ALL_FILTER: filters.append("SUBSTR(am.birthdate, 1, 4) = ?"); params.append(birth_year)
-        query_string = base_query
-        if filters: query_string += " WHERE " + " AND ".join(filters)
-        query_string += " ORDER BY m.start_date DESC, Atleta, e.number"
-        return query_string, params
-
-    # --- NOVA FUNÇÃO: Gerar Sparkline ---
-    def _generate_sparkline_pixmap(self, lap_times, width_px=80, height_px=20):
-        """Gera um QPixmap de um sparkline para os tempos de volta."""
-        if not MATPLOTLIB_AVAILABLE or not lap_times:
-            return None
-
-        try:
-            # Criar figura pequena e sem bordas/padding
-            fig, ax = plt.subplots(figsize=(width_px / 72, height_px / 72), dpi=72) # Ajustar DPI se necessário
-            fig.subplots_adjust(left=0, right=1, top=1, bottom=0) # Remove padding
-
-            # Plotar os tempos de volta
-            ax.plot(range(len(lap_times)), lap_times, color='blue', linewidth=0.8)
-
-            # Opcional: Adicionar linha da média
-            if len(lap_times) > 0:
-                mean_time = statistics.mean(lap_times)
-                ax.axhline(mean_time, color='red', linestyle='--', linewidth=0.5)
-
-            # Remover eixos e bordas
-            ax.axis('off')
-
-            # Salvar em buffer
-            buf = io.BytesIO()
-            fig.savefig(buf, format='png', transparent=True) # Fundo transparente
-            buf.seek(0)
-
-            # Criar QPixmap
-            pixmap = QPixmap()
-            pixmap.loadFromData(buf.read())
-
-            plt.close(fig) # Fechar figura para liberar memória
-            return pixmap
-
-        except Exception as e:
-            print(f"Erro ao gerar sparkline: {e}")
-            # Tentar fechar a figura em caso de erro
-            try:
-                if 'fig' in locals() and fig:
-                    plt.close(fig)
-            except: pass # Ignora erros ao fechar
-            return None
-    # --- FIM DA NOVA FUNÇÃO ---
-
-    # --- NOVA FUNÇÃO: Gerar Sparkline para PDF (copiada de meet_summary_tab) ---
+        if athlete_license is not None: filters.append("f.license = ?"); params.append(athlete_license)
+        if meet_id is not None: filters.append("f.meet_id = ?"); params.append(meet_id)
+        if event_desc != ALL_FILTER: filters.append("f.prova_desc = ?"); params.append(event_desc)
+        if course_desc != ALL_FILTER: filters.append("f.pool_size_desc = ?"); params.append(course_desc)
+        if birth_year != ALL_FILTER: filters.append("f.birth_year = ?"); params.append(int(birth_year))
+        where_clause = (" WHERE " + " AND ".join(filters)) if filters else ""
+        query_string = base_query + where_clause + " ORDER BY f.start_date DESC, Atleta, f.event_number"
+        count_string = "SELECT COUNT(*) FROM ResultFlat f" + where_clause # Total mostrado antes da primeira página
+        return query_string, count_string, params
+
+    # --- Sparkline para PDF (cache compartilhado em core.plotting) ---
     def _generate_sparkline_pdf_image(self, lap_times, width_px=80, height_px=20):
         """Gera dados de imagem PNG de um sparkline para o PDF."""
-        if not MATPLOTLIB_AVAILABLE or not lap_times:
-            return None
-        try:
-            fig, ax = plt.subplots(figsize=(width_px / 72, height_px / 72), dpi=72)
-            fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
-            ax.plot(range(len(lap_times)), lap_times, color='blue', linewidth=1.5) # Linha um pouco mais grossa para PDF
-            if len(lap_times) > 0:
-                mean_time = statistics.mean(lap_times)
-                ax.axhline(mean_time, color='red', linestyle='--', linewidth=1.0) # Linha média um pouco mais grossa
-            ax.axis('off')
-            buf = io.BytesIO()
-            fig.savefig(buf, format='png', transparent=True)
-            plt.close(fig)
-            buf.seek(0)
-            return buf # Retorna o buffer BytesIO
-        except Exception as e:
-            print(f"Erro ao gerar sparkline para PDF: {e}")
-            try:
-                if 'fig' in locals() and fig: plt.close(fig)
-            except: pass
-            return None
-    # --- FIM DA NOVA FUNÇÃO ---
-
-    # --- NOVA FUNÇÃO AUXILIAR: Obter valor comparável para ordenação ---
-    def _get_sort_value(self, item, key):
-        """Retorna um valor comparável para ordenação a partir do dicionário e chave."""
-        value = item.get(key)
-
-        # Lida com None ou N/A - coloca no final por padrão
-        if value is None: return float('inf')
-        if isinstance(value, str) and value == "N/A": return float('inf')
-
-        # Colunas de Tempo/Numéricas que podem ser string 'N/A' ou tempo formatado
-        if key in ["Tempo", "Média Lap", "DP Lap", "vs Top1", "vs Top2", "vs Top3"]:
-            if isinstance(value, (int, float)): return value # Já numérico
-            if isinstance(value, str):
-                # Tenta converter tempo para segundos, tratando o 's' opcional
-                seconds = time_to_seconds(value.rstrip('s'))
-                return seconds if seconds is not None else float('inf') # Converteu? Usa. Senão, final.
-            return float('inf') # Tipo inesperado, coloca no final
-
-        # Coluna AnoNasc
-        elif key == "AnoNasc":
-            try: return int(value)
-            except (ValueError, TypeError): return float('inf') # Não numérico, coloca no final
-
-        # Coluna Colocação (pode ser número ou string como 'DSQ')
-        elif key == "Colocação":
-            try: return int(value) # Tenta converter para int
-            except (ValueError, TypeError): return str(value).lower() # Se falhar, trata como string minúscula
-
-        # Default: Trata como string minúscula
-        return str(value).lower()
-    # --- FIM DA FUNÇÃO AUXILIAR ---
+        return sparkline_png_buffer(lap_times, width_px, height_px, line_width=1.5, mean_line_width=1.0)
+    # --- FIM Sparkline para PDF ---
 
     @Slot()
     def _apply_filters(self):
-        """Executa a query filtrada, calcula dados (incluindo sparkline) e atualiza a tabela."""
-        query_string, params = self._build_query_and_params()
-        conn = None
-        self.current_table_data = [] # Limpa dados antigos antes de aplicar
+        """Agenda a query filtrada em segundo plano; as linhas chegam em páginas (_on_results_page) até _on_results_done."""
+        query_string, count_string, params = self._build_query_and_params()
+        self.btn_export_pdf.setEnabled(False) # Desabilita exportação até os novos dados chegarem
+        self.query_runner.submit(self._query_results, query_string, count_string, params,
+                                 on_partial=self._on_results_page, on_result=self._on_results_done, on_error=self._show_query_error)
 
+    @Slot()
+    def _cancel_query(self):
+        """Filtro alterado durante a consulta: cancela; a tabela fica com o que já tinha chegado."""
+        if not self.query_runner.cancel(): return
+        if not self._results_complete: self.lbl_results.setText(f"Resultados Filtrados: {len(self.current_table_data)} de {self._expected_rows} (carregamento interrompido)")
+        self.btn_export_pdf.setEnabled(self._results_complete and bool(self.current_table_data) and REPORTLAB_AVAILABLE and MATPLOTLIB_AVAILABLE)
+
+    def _query_results(self, query_string, count_string, params):
+        """Executa a query filtrada e entrega as linhas processadas em páginas via emit_partial (roda no QueryJobRunner:
+        sem acesso a widgets). Primeiro ('total', n), depois ('rows', [dicts]) por página. Retorna o total de linhas."""
+        conn = get_read_connection(self.db_path)
+        if not conn: raise sqlite3.Error(f"Erro ao conectar: {self.db_path}")
+        emit_partial(('total', conn.execute(count_string, params).fetchone()[0]))
+
+        cursor = conn.cursor()
+        print(f"ViewDataTab: Executando Query Principal: {query_string}")
+        print(f"ViewDataTab: Com Parâmetros: {params}")
+        cursor.execute(query_string, params)
+        query_headers = [description[0] for description in cursor.description]
+
+        top3_lookup = defaultdict(dict); top3_meets = set(); n_rows = 0
+        page = cursor.fetchmany(FIRST_PAGE_ROWS)
+        while page:
+            processed_page = self._process_results_page(conn, query_headers, page, top3_lookup, top3_meets)
+            n_rows += len(processed_page); emit_partial(('rows', processed_page)) # Cancelado: para aqui
+            page = cursor.fetchmany(PAGE_ROWS)
+        print(f"ViewDataTab: Query Principal retornou: {n_rows} linhas")
+        return n_rows
+
+    def _process_results_page(self, conn, query_headers, results_data, top3_lookup, top3_meets):
+        """Calcula os dados da tabela para uma página de linhas (Top 3 das competições novas, parciais, voltas/média/DP)."""
+        processed_data = []
+        # Encontrar índices
         try:
-            conn = get_db_connection(self.db_path)
-            if not conn: QMessageBox.critical(self, "Erro DB", f"Erro ao conectar: {self.db_path}"); self._clear_table(); return
-
-            cursor = conn.cursor()
-            print(f"ViewDataTab: Executando Query Principal: {query_string}")
-            print(f"ViewDataTab: Com Parâmetros: {params}")
-            cursor.execute(query_string, params)
-
-            query_headers = [description[0] for description in cursor.description]
-            results_data = cursor.fetchall()
-            print(f"ViewDataTab: Query Principal retornou: {len(results_data)} linhas")
-
-            if not results_data: self._clear_table(); self.btn_export_pdf.setEnabled(False); return # Desabilita exportação se não há dados
-
-            # Encontrar índices
-            try:
-                result_id_idx = query_headers.index('result_id_lenex'); athlete_idx = query_headers.index('Atleta'); birth_idx = query_headers.index('AnoNasc'); event_idx = query_headers.index('Prova'); place_idx = query_headers.index('Colocacao'); time_idx = query_headers.index('Tempo'); status_idx = query_headers.index('Status'); event_db_id_idx = query_headers.index('event_db_id'); agegroup_db_id_idx = query_headers.index('agegroup_db_id'); meet_id_idx = query_headers.index('meet_id'); city_idx = query_headers.index('CidadeCompeticao'); date_idx = query_headers.index('Data') # Adicionado city_idx e date_idx
-            except ValueError as e: QMessageBox.critical(self, "Erro Interno", f"Coluna não encontrada na query: {e}"); self._clear_table(); return
-
-            # Buscar Dados Adicionais (Top3 e Parciais)
-            meet_ids_in_results = list(set(row[meet_id_idx] for row in results_data)); result_ids_in_results = list(set(row[result_id_idx] for row in results_data))
-            top3_lookup = defaultdict(dict); splits_lookup = defaultdict(list)
-            if meet_ids_in_results:
-                placeholders = ', '.join('?' * len(meet_ids_in_results)); top3_query = f"SELECT event_db_id, agegroup_db_id, place, swim_time FROM Top3Result WHERE meet_id IN ({placeholders})"
-                cursor.execute(top3_query, meet_ids_in_results)
-                for t3_event, t3_ag, t3_place, t3_time in cursor.fetchall(): top3_lookup[(t3_event, t3_ag)][t3_place] = t3_time
-            if result_ids_in_results:
-                placeholders = ', '.join('?' * len(result_ids_in_results)); splits_query = f"SELECT result_id_lenex, distance, swim_time FROM SplitCM WHERE result_id_lenex IN ({placeholders}) ORDER BY result_id_lenex, distance"
-                cursor.execute(splits_query, result_ids_in_results)
-                for split_res_id, _, split_time_str in cursor.fetchall():
-                    split_sec = time_to_seconds(split_time_str)
-                    if split_sec is not None: splits_lookup[split_res_id].append(split_sec)
-
-            # --- Processar Resultados e Calcular ---
-            for row in results_data:
-                result_id = row[result_id_idx]; place = row[place_idx]; status = row[status_idx]; event_db_id = row[event_db_id_idx]; ag_db_id = row[agegroup_db_id_idx]; athlete_time_str = row[time_idx]
-                city = row[city_idx]; date = row[date_idx] # Pega cidade e data
-                # Calcular display_colocacao
-                display_colocacao = "N/A"; is_valid_result = status is None or status.upper() == 'OK' or status.upper() == 'OFFICIAL'
-                if not is_valid_result and status: display_colocacao = status.upper()
-                elif place is not None: display_colocacao = str(place)
-
-                # Calcular diferenças vs Top3
-                top3_times_for_event = top3_lookup.get((event_db_id, ag_db_id), {}); top1_time_str = top3_times_for_event.get(1); top2_time_str = top3_times_for_event.get(2); top3_time_str = top3_times_for_event.get(3)
-                athlete_secs = time_to_seconds(athlete_time_str); diff1_str = "N/A"; diff2_str = "N/A"; diff3_str = "N/A"
-                if athlete_secs is not None:
-                    top1_secs = time_to_seconds(top1_time_str); top2_secs = time_to_seconds(top2_time_str); top3_secs = time_to_seconds(top3_time_str)
-                    if top1_secs is not None: diff1_str = format_time_diff(athlete_secs - top1_secs)
-                    if top2_secs is not None: diff2_str = format_time_diff(athlete_secs - top2_secs)
-                    if top3_secs is not None: diff3_str = format_time_diff(athlete_secs - top3_secs)
-
-                # Calcular TEMPOS DE VOLTA, MÉDIA e DP
-                cumulative_splits_sec = splits_lookup.get(result_id, [])
-                lap_times_sec = [] # <<< Armazenar tempos de volta aqui
-                media_lap_str = "N/A"; dp_lap_str = "N/A"
-                last_cumulative_split = 0.0
-
-                if cumulative_splits_sec:
-                    previous_split_sec = 0.0
-                    for current_split_sec in cumulative_splits_sec:
-                        lap_time = current_split_sec - previous_split_sec
-                        if lap_time >= 0: lap_times_sec.append(lap_time)
-                        previous_split_sec = current_split_sec
-                    last_cumulative_split = previous_split_sec
-
-                if athlete_secs is not None and last_cumulative_split >= 0 and cumulative_splits_sec:
-                    last_lap_time = athlete_secs - last_cumulative_split
-                    if last_lap_time >= 0: lap_times_sec.append(last_lap_time)
-                elif not cumulative_splits_sec and athlete_secs is not None:
-                     lap_times_sec.append(athlete_secs)
-
-                if lap_times_sec:
-                    try: media = statistics.mean(lap_times_sec); media_lap_str = f"{media:.2f}"
-                    except statistics.StatisticsError: media_lap_str = "N/A"
-                    if len(lap_times_sec) >= 2:
-                        try:
-                            stdev = statistics.stdev(lap_times_sec);
-                            if not math.isnan(stdev): dp_lap_str = f"{stdev:.2f}"
-                            else: dp_lap_str = "0.00"
-                        except statistics.StatisticsError:
-                            dp_lap_str = "N/A"
-                    elif len(lap_times_sec) == 1: dp_lap_str = "0.00"
-
-                # Montar dicionário para a linha da tabela final (com Lap Times)
-                self.current_table_data.append({ # Adiciona ao atributo da instância
-                    "Atleta": row[athlete_idx], "AnoNasc": row[birth_idx],
-                    "Prova": row[event_idx], "Cidade": city, "Data": date, # Adicionado Cidade e Data
-                    "Colocação": display_colocacao, "Tempo": athlete_time_str or "N/A",
-                    "Média Lap": media_lap_str, "DP Lap": dp_lap_str,
-                    "Lap Times": lap_times_sec, # <<< Armazena a lista de tempos
-                    "vs Top3": diff3_str, "vs Top2": diff2_str, "vs Top1": diff1_str
-                })
-            # --- Fim do Processamento ---
-
-            # --- Popular Tabela ---
-            # Define os cabeçalhos finais (com Ritmo Sparkline)
-            # Move "Cidade" e "Data" para o final
-            display_headers = ["Atleta", "AnoNasc", "Prova", "Colocação", "Tempo",
-                               "Média Lap", "DP Lap", "Ritmo", "Parciais", # <<< Novos Cabeçalhos
-                               "vs Top3", "vs Top2", "vs Top1", "Cidade", "Data"] # <<< Movido para o final
-
-            # Limpa APENAS a exibição da tabela, sem limpar self.current_table_data aqui
-            self.table_widget.setRowCount(0)
-            self.table_widget.setColumnCount(0)
-            self.btn_export_pdf.setEnabled(False) # Desabilita exportação temporariamente
-
-            self.table_widget.setColumnCount(len(display_headers))
-            self.table_widget.setHorizontalHeaderLabels(display_headers); self.table_widget.setRowCount(len(self.current_table_data))
-            bold_font = QFont(); bold_font.setBold(True)
-
-            # Mapeamento de cabeçalho para chave do dicionário
-            header_to_key_map = {h: h for h in display_headers} # Inicializa
-            header_to_key_map["Cidade"] = "Cidade" # Mapeia o cabeçalho "Cidade"
-            header_to_key_map["Data"] = "Data"     # Mapeia o cabeçalho "Data"
-            header_to_key_map["Ritmo"] = "Lap Times" # Coluna "Ritmo" usa dados de "Lap Times"
-            header_to_key_map["Parciais"] = "Lap Times" # Coluna "Parciais" também usa "Lap Times"
-
-            for row_idx, row_dict in enumerate(self.current_table_data):
-                col_idx = 0; athlete_place_str = row_dict.get("Colocação", "")
-                for key in display_headers: # Itera sobre os cabeçalhos de exibição
-                    dict_key = header_to_key_map[key] # Pega a chave correta
-                    value = row_dict.get(dict_key, "") # Busca pelo valor usando a chave
-
-                    # --- Lógica para Sparkline ---
-                    if key == "Ritmo":
-                        # Remove widget antigo, se houver
-                        self.table_widget.setCellWidget(row_idx, col_idx, None)
-                        lap_times = value # O valor aqui é a lista lap_times_sec
-                        pixmap = self._generate_sparkline_pixmap(lap_times)
-                        if pixmap:
-                            label = QLabel()
-                            label.setPixmap(pixmap)
-                            label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-                            self.table_widget.setCellWidget(row_idx, col_idx, label)
-                        else:
-                            # Se não gerou pixmap, coloca N/A como texto
-                            item = QTableWidgetItem("N/A")
-                            item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                            self.table_widget.setItem(row_idx, col_idx, item)
-                    # --- Lógica para Parciais (Texto) ---
-                    elif key == "Parciais":
-                        self.table_widget.setCellWidget(row_idx, col_idx, None) # Limpa célula
-                        lap_times = value # Lista de tempos
-                        if lap_times:
-                            # Formata a lista como string: "30.12, 32.50, ..."
-                            parciais_str = "; ".join([f"{t:.2f}" for t in lap_times])
-                            item = QTableWidgetItem(parciais_str)
-                        else:
-                            item = QTableWidgetItem("N/A")
-                        self.table_widget.setItem(row_idx, col_idx, item)
-                    # --- Fim da Lógica Sparkline ---
-                    else:
-                        # Para outras colunas, usa QTableWidgetItem
-                        # Remove widget antigo, se houver (caso a coluna mude de tipo)
-                        self.table_widget.setCellWidget(row_idx, col_idx, None)
-                        item = QTableWidgetItem(str(value))
-                        # Aplica formatação
-                        if key == "vs Top1" and athlete_place_str == "1": item.setFont(bold_font)
-                        elif key == "vs Top2" and athlete_place_str == "2": item.setFont(bold_font)
-                        elif key == "vs Top3" and athlete_place_str == "3": item.setFont(bold_font)
-                        if key == "Colocação" and not str(value).isdigit() and str(value) != "N/A": item.setForeground(Qt.GlobalColor.red)
-                        self.table_widget.setItem(row_idx, col_idx, item)
-
-                    col_idx += 1
-            # --- Fim da População ---
-
-            self.table_widget.resizeColumnsToContents()
-            # Ajustar largura da coluna Sparkline manualmente se necessário
-            try:
-                sparkline_col_index = display_headers.index("Ritmo")
-                self.table_widget.setColumnWidth(sparkline_col_index, 90) # Ajustar largura
-                # Ajustar largura da coluna Parciais também
-                parciais_col_index = display_headers.index("Parciais")
-                self.table_widget.setColumnWidth(parciais_col_index, 120) # Ajustar largura
-            except ValueError:
-                pass # Coluna não encontrada
-
-            # Habilita botão de exportar se as libs estiverem ok
-            if self.current_table_data: # Só habilita se realmente populou algo
-                self.btn_export_pdf.setEnabled(REPORTLAB_AVAILABLE and MATPLOTLIB_AVAILABLE)
-
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "Erro de Consulta", f"Erro ao executar consulta/processamento:\n{e}")
-            self._clear_table(); self.btn_export_pdf.setEnabled(False); self.current_table_data = []
-        except Exception as e:
-            QMessageBox.critical(self, "Erro Inesperado", f"Ocorreu um erro inesperado ao aplicar filtros:\n{e}")
-            import traceback; print(traceback.format_exc()); self._clear_table(); self.btn_export_pdf.setEnabled(False); self.current_table_data = []
-        finally:
-            if conn: conn.close()
+            result_id_idx = query_headers.index('result_id_lenex'); athlete_idx = query_headers.index('Atleta'); birth_idx = query_headers.index('AnoNasc'); event_idx = query_headers.index('Prova'); place_idx = query_headers.index('Colocacao'); time_idx = query_headers.index('Tempo'); status_idx = query_headers.index('Status'); event_db_id_idx = query_headers.index('event_db_id'); agegroup_db_id_idx = query_headers.index('agegroup_db_id'); meet_id_idx = query_headers.index('meet_id'); city_idx = query_headers.index('CidadeCompeticao'); date_idx = query_headers.index('Data') # Adicionado city_idx e date_idx
+        except ValueError as e: raise ValueError(f"Coluna não encontrada na query: {e}")
+
+        # Buscar Dados Adicionais (Top3 das competições ainda não vistas e Parciais da página)
+        new_meet_ids = list(set(row[meet_id_idx] for row in results_data) - top3_meets); result_ids_in_results = list(set(row[result_id_idx] for row in results_data))
+        if new_meet_ids:
+            top3_rows = fetch_by_ids(conn, "SELECT event_db_id, agegroup_db_id, place, swim_time FROM Top3Result WHERE meet_id IN ({ids})", new_meet_ids, strategy='chunks')
+            for t3_event, t3_ag, t3_place, t3_time in top3_rows: top3_lookup[(t3_event, t3_ag)][t3_place] = t3_time
+            top3_meets.update(new_meet_ids)
+        split_ids, _, split_secs = fetch_split_arrays(conn, result_ids_in_results, as_seconds=True, strategy='chunks') # SplitCM + SplitPacked
+
+        # Voltas/média/DP de todos os resultados da página de uma vez (parciais acumuladas em segundos)
+        pacing = compute_pacing([row[result_id_idx] for row in results_data], times_to_seconds([row[time_idx] for row in results_data]), split_ids, split_secs)
+
+        # --- Processar Resultados e Calcular ---
+        for row_idx, row in enumerate(results_data):
+            place = row[place_idx]; status = row[status_idx]; event_db_id = row[event_db_id_idx]; ag_db_id = row[agegroup_db_id_idx]; athlete_time_str = row[time_idx]
+            city = row[city_idx]; date = row[date_idx] # Pega cidade e data
+            # Calcular display_colocacao
+            display_colocacao = "N/A"; is_valid_result = status is None or status.upper() == 'OK' or status.upper() == 'OFFICIAL'
+            if not is_valid_result and status: display_colocacao = status.upper()
+            elif place is not None: display_colocacao = str(place)
+
+            # Calcular diferenças vs Top3
+            top3_times_for_event = top3_lookup.get((event_db_id, ag_db_id), {}); top1_time_str = top3_times_for_event.get(1); top2_time_str = top3_times_for_event.get(2); top3_time_str = top3_times_for_event.get(3)
+            athlete_secs = time_to_seconds(athlete_time_str); diff1_str = "N/A"; diff2_str = "N/A"; diff3_str = "N/A"
+            if athlete_secs is not None:
+                top1_secs = time_to_seconds(top1_time_str); top2_secs = time_to_seconds(top2_time_str); top3_secs = time_to_seconds(top3_time_str)
+                if top1_secs is not None: diff1_str = format_time_diff(athlete_secs - top1_secs)
+                if top2_secs is not None: diff2_str = format_time_diff(athlete_secs - top2_secs)
+                if top3_secs is not None: diff3_str = format_time_diff(athlete_secs - top3_secs)
+
+            # Calcular TEMPOS DE VOLTA, MÉDIA e DP
+            lap_times_sec = pacing.laps(row_idx); media_lap_str = format_lap_stat(pacing.mean[row_idx]); dp_lap_str = format_lap_stat(pacing.stdev[row_idx])
+
+            # Montar dicionário para a linha da tabela final (com Lap Times)
+            processed_data.append({
+                "Atleta": row[athlete_idx], "AnoNasc": row[birth_idx],
+                "Prova": row[event_idx], "Cidade": city, "Data": date, # Adicionado Cidade e Data
+                "Colocação": display_colocacao, "Tempo": athlete_time_str or "N/A",
+                "Média Lap": media_lap_str, "DP Lap": dp_lap_str,
+                "Lap Times": lap_times_sec, # <<< Armazena a lista de tempos
+                "vs Top3": diff3_str, "vs Top2": diff2_str, "vs Top1": diff1_str
+            })
+        # --- Fim do Processamento ---
+        return processed_data
+
+    def _on_results_page(self, partial):
+        """Total de linhas (antes da primeira página) ou uma página processada, acrescentada à tabela."""
+        kind, value = partial
+        if kind == 'total':
+            self._clear_table(); self._expected_rows = value; self._results_complete = False
+        else:
+            self.current_table_data.extend(value); self.table_widget.append_rows(value)
+        self.lbl_results.setText(f"Resultados Filtrados: carregando {len(self.current_table_data)} de {self._expected_rows}...")
+
+    def _on_results_done(self, n_rows):
+        """Todas as páginas chegaram: reaplica a ordenação escolhida durante o carregamento e libera a exportação."""
+        self._results_complete = True
+        self.table_widget.finish_rows()
+        self.lbl_results.setText(f"Resultados Filtrados: {len(self.current_table_data)}")
+        # Habilita botão de exportar se há dados e as libs estiverem ok
+        self.btn_export_pdf.setEnabled(bool(self.current_table_data) and REPORTLAB_AVAILABLE and MATPLOTLIB_AVAILABLE)
+
+    def _show_query_error(self, error, tb):
+        if isinstance(error, sqlite3.Error): QMessageBox.critical(self, "Erro de Consulta", f"Erro ao executar consulta/processamento:\n{error}")
+        else: QMessageBox.critical(self, "Erro Inesperado", f"Ocorreu um erro inesperado ao aplicar filtros:\n{error}")
+        self._clear_table(); self.btn_export_pdf.setEnabled(False); self.current_table_data = []
+        self._results_complete = True; self.lbl_results.setText("Resultados Filtrados:")
 
     @Slot()
     def _export_to_pdf(self):
@@ -503,36 +298,13 @@ class ViewDataTab(QWidget):
             QMessageBox.warning(self, "Nenhum Dado", "Não há dados filtrados para exportar. Aplique os filtros primeiro.")
             return
 
-        # --- Obter Informação de Ordenação da Tabela ---
-        header = self.table_widget.horizontalHeader()
-        sort_col_index = header.sortIndicatorSection()
-        sort_order = header.sortIndicatorOrder()
-        sort_dict_key = None
-        key_func = None
-
-        # Mapeamento de cabeçalho para chave do dicionário (necessário aqui para encontrar a chave de ordenação)
+        # Mapeamento de cabeçalho do PDF para chave do dicionário
         pdf_headers = ["Atleta", "Nasc", "Prova", "Col", "Tempo", "Média Lap", "DP Lap", "Ritmo", "Parciais", "vs T3", "vs T2", "vs T1", "Cidade", "Data"] # Adicionado "Parciais"
         header_to_key_map_pdf = { # Mapeamento para chaves do dicionário self.current_table_data
             "Atleta": "Atleta", "Nasc": "AnoNasc", "Prova": "Prova", "Col": "Colocação", "Tempo": "Tempo",
             "Média Lap": "Média Lap", "DP Lap": "DP Lap", "Ritmo": "Lap Times", "vs T3": "vs Top3",
             "vs T2": "vs Top2", "vs T1": "vs Top1", "Cidade": "Cidade", "Data": "Data", "Parciais": "Lap Times" # Adicionado "Parciais"
         }
-        # Mapeamento reverso (índice da coluna visual -> chave do dicionário)
-        current_display_headers = [self.table_widget.horizontalHeaderItem(i).text() for i in range(self.table_widget.columnCount())]
-        header_to_key_map_display = {h: h for h in current_display_headers}
-        header_to_key_map_display["Ritmo"] = "Lap Times" # Ajuste para coluna Ritmo
-        header_to_key_map_display["Cidade"] = "Cidade"
-        header_to_key_map_display["Data"] = "Data"
-        header_to_key_map_display["Parciais"] = "Lap Times" # Ajuste para coluna Parciais
-
-        if sort_col_index != -1 and 0 <= sort_col_index < len(current_display_headers):
-            sort_header_text = current_display_headers[sort_col_index]
-            sort_dict_key = header_to_key_map_display.get(sort_header_text)
-            if sort_dict_key == "Lap Times": # Não ordenar pela lista de parciais diretamente
-                sort_dict_key = None
-            elif sort_dict_key:
-                key_func = lambda item: self._get_sort_value(item, sort_dict_key)
-        # --- Fim da Obtenção de Ordenação ---
 
         # --- Gerar Nome de Arquivo Descritivo ---
         athlete_filter = self.combo_athlete.currentText()
@@ -563,17 +335,8 @@ class ViewDataTab(QWidget):
             return
 
         try:
-            # --- Ordenar os dados ANTES de gerar o PDF ---
-            pdf_data = list(self.current_table_data) # Cria uma cópia para ordenar
-            if key_func:
-                reverse_sort = (sort_order == Qt.DescendingOrder)
-                try:
-                    pdf_data.sort(key=key_func, reverse=reverse_sort)
-                    print(f"PDF Export: Ordenando por '{sort_dict_key}', reverso={reverse_sort}")
-                except Exception as e:
-                    # Informa sobre erro na ordenação, mas continua com dados não ordenados
-                    print(f"PDF Export: Erro durante a ordenação por chave '{sort_dict_key}': {e}. Exportando sem ordenação específica.")
-            # --- Fim da Ordenação ---
+            # Mesma ordem da tabela (ordenação do cabeçalho feita pelo proxy)
+            pdf_data = self.table_widget.rows_in_view_order()
 
             # Usa landscape(A4) para orientação horizontal
             page_width, page_height = landscape(A4)
@@ -719,6 +482,6 @@ class ViewDataTab(QWidget):
         self._apply_filters()
 
     def _clear_table(self):
-        self.table_widget.setRowCount(0); self.table_widget.setColumnCount(0);
+        self.table_widget.clear()
         self.current_table_data = [] # Limpa os dados guardados
         self.btn_export_pdf.setEnabled(False) # Desabilita exportação ao limpar